@@ -20,7 +20,18 @@ import glob
 import os
 import numpy as np
 from urllib.parse import quote
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
+from db_utils import obter_engine, conexao_raw
+from depuracao_utils import capturar_snapshot
+from esquemas import ITENS_PEDIDO
+from leitura_utils import LeitorCSV, LeitorExcel
+from normalizacao_utils import contar_excedentes, remover_pontos, truncar_colunas
+from parquet_utils import ZonaParquet
+from espera_utils import Esperas
+from sessao_utils import CacheSessao
+from download_utils import criar_gerenciador
+from exportacao_utils import baixar_exportacao, exportacao_http_ativa
+from coercao_utils import converter_colunas_inteiras
 from sqlalchemy.types import String
 from sqlalchemy.types import Integer
 from sqlalchemy.types import Float
@@ -64,11 +75,17 @@ import glob
 import os
 import logging
 import pandas as pd
+from types import MappingProxyType
 from typing import Dict, List, Optional, Tuple, Union
 
 class TratarDados:
     """Classe para tratamento de dados de vendas a partir de arquivos XLS, XLSX, CSV ou TXT."""
     
+    # Quantidade de campos de cada linha do export em texto (separado por '|')
+    CAMPOS_ARQUIVO_TEXTO = 17
+    # Linhas inválidas só são logadas (None = sem limite)
+    LIMITE_LINHAS_INVALIDAS = None
+
     # Mapeamento de colunas esperadas e seus limites
     COLUNAS_ESPERADAS = {
         'Código Produto': ('CodigoProduto', 10),
@@ -88,17 +105,26 @@ class TratarDados:
         'Situação pedido': ('SituacaoPedido', 30),
         'Nome Modelo Comercial': ('NomeModeloComercial', 1000)
     }
+
+    # Coluna de destino -> tamanho máximo, montado uma vez na definição da classe
+    LIMITES_COLUNAS = MappingProxyType({novo: limite for novo, limite in COLUNAS_ESPERADAS.values() if limite})
     
-    def __init__(self, caminho_padrao: Optional[str] = None):
+    def __init__(self, caminho_padrao: Optional[str] = None, arquivo: Optional[str] = None):
         """
         Inicializa a classe com o caminho padrão ou usa o caminho padrão do sistema.
         
         Args:
             caminho_padrao: Caminho opcional para buscar os arquivos. Se None, usa o padrão.
+            arquivo: Arquivo exato a processar (ex.: PegarGoogle.arquivo_baixado); dispensa a busca pelo mais recente.
         """
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        caminho = caminho_padrao or os.path.join(base_dir, 'downloads', 'BuscarPedidosItensAnalitico_*.xls')
-        self._encontrar_arquivo_mais_recente(caminho)
+        if arquivo:
+            self.file = arquivo
+            logging.info(f"Arquivo selecionado para processamento: {self.file}")
+        else:
+            base_dir = os.path.dirname(os.path.abspath(__file__))
+            caminho = caminho_padrao or os.path.join(base_dir, 'downloads', 'BuscarPedidosItensAnalitico_*.xls')
+            self._encontrar_arquivo_mais_recente(caminho)
+        self.zona = ZonaParquet()
     
     def _encontrar_arquivo_mais_recente(self, caminho: str):
         """Encontra o arquivo mais recente no caminho especificado."""
@@ -114,7 +140,7 @@ class TratarDados:
             logging.info(f"Iniciando processamento do arquivo: {self.file}")
             
             # Leitura do arquivo
-            df = self._ler_arquivo()
+            df = self.zona.carregar('itens_analitico', self.file, self._ler_arquivo)
             
             # Validação básica
             self._validar_estrutura_arquivo(df)
@@ -144,39 +170,20 @@ class TratarDados:
         
         if extensao in ['.xls', '.xlsx']:
             logging.info("Lendo arquivo Excel")
-            return pd.read_excel(self.file, dtype=str)
+            return LeitorExcel(self.file).ler()
         
         elif extensao in ['.csv', '.txt']:
             logging.info("Lendo arquivo texto")
-            self._validar_arquivo_texto()
-            return pd.read_csv(
-                self.file, 
-                sep='|', 
-                quotechar='"', 
-                encoding='utf-8', 
-                engine='python', 
-                on_bad_lines='warn', 
-                dtype=str
+            # Validação de layout na mesma passada da leitura (sem reler o arquivo)
+            leitor = LeitorCSV(
+                self.file,
+                campos_esperados=self.CAMPOS_ARQUIVO_TEXTO,
+                limite_invalidas=self.LIMITE_LINHAS_INVALIDAS
             )
+            return leitor.ler()
         
         raise ValueError(f"Formato de arquivo não suportado: {extensao}")
     
-    def _validar_arquivo_texto(self) -> None:
-        """Valida a estrutura do arquivo texto antes da leitura."""
-        linhas_invalidas = []
-        with open(self.file, 'r', encoding='utf-8') as f:
-            for i, line in enumerate(f):
-                parts = line.strip().split('|')
-                if len(parts) != 17:
-                    linhas_invalidas.append((i + 1, len(parts), line.strip()))
-        
-        if linhas_invalidas:
-            logging.warning(f"Linhas inválidas encontradas: {len(linhas_invalidas)}")
-            for linha in linhas_invalidas[:5]:
-                logging.warning(f"Linha {linha[0]}: {linha[1]} colunas - Conteúdo: {linha[2]}")
-            if len(linhas_invalidas) > 5:
-                logging.warning(f"...e mais {len(linhas_invalidas) - 5} linhas com problemas.")
-    
     def _validar_estrutura_arquivo(self, df: pd.DataFrame) -> None:
         """Valida a estrutura básica do DataFrame."""
         if len(df.columns) < 10:
@@ -319,48 +326,21 @@ class TratarDados:
     
     def _processar_numericos(self, df: pd.DataFrame) -> pd.DataFrame:
         """Processa colunas numéricas."""
-        if 'Quantidade' in df.columns:
-            df['Quantidade'] = (
-                pd.to_numeric(df['Quantidade'], errors='coerce')
-                .fillna(0)
-                .astype(int)
-            )
-        return df
+        return converter_colunas_inteiras(df, ['Quantidade'], padrao=0)
     
     def _truncar_colunas(self, df: pd.DataFrame) -> pd.DataFrame:
         """Trunca as colunas de texto conforme os limites definidos."""
-        for col in df.columns:
-            if col in [novo[0] for novo in self.COLUNAS_ESPERADAS.values() if novo[1]]:
-                limite = next(novo[1] for novo in self.COLUNAS_ESPERADAS.values() if novo[0] == col)
-                df[col] = (
-                    df[col]
-                    .fillna('')
-                    .apply(lambda x: str(x).strip()[:limite] if x is not None else '')
-                    .replace('', None)
-                )
-        return df
+        return truncar_colunas(df, self.LIMITES_COLUNAS)
     
     def _remover_pontos_codigos(self, df: pd.DataFrame) -> pd.DataFrame:
         """Remove pontos de códigos e aplica truncamento."""
-        for col in ['CodigoPedido', 'CodigoProduto', 'CodigoPessoa']:
-            if col in df.columns:
-                df[col] = (
-                    df[col]
-                    .fillna('')
-                    .apply(lambda x: x.replace('.', '')[:next(novo[1] for novo in self.COLUNAS_ESPERADAS.values() if novo[0] == col)] if x else '')
-                    .replace('', None)
-                )
-        return df
+        return remover_pontos(df, ['CodigoPedido', 'CodigoProduto', 'CodigoPessoa'], self.LIMITES_COLUNAS)
     
     def _validar_dados(self, df: pd.DataFrame) -> None:
         """Realiza validações finais nos dados."""
         # Verificar valores longos
-        for col in df.columns:
-            if col in [novo[0] for novo in self.COLUNAS_ESPERADAS.values() if novo[1]]:
-                limite = next(novo[1] for novo in self.COLUNAS_ESPERADAS.values() if novo[0] == col)
-                valores_longos = df[col].dropna().apply(lambda x: len(str(x)) > limite)
-                if valores_longos.any():
-                    logging.warning(f"Coluna {col} tem {valores_longos.sum()} valores excedendo o limite de {limite} caracteres")
+        for col, quantidade in contar_excedentes(df, self.LIMITES_COLUNAS).items():
+            logging.warning(f"Coluna {col} tem {quantidade} valores excedendo o limite de {self.LIMITES_COLUNAS[col]} caracteres")
         
         # Verificar valores nulos em colunas importantes
         for col in ['CodigoProduto', 'CodigoPedido', 'Quantidade']:
@@ -372,7 +352,7 @@ logging.basicConfig(level=logging.INFO)
 
 class Banco:
     def __init__(self):
-        self.engine = create_engine(os.getenv('dbUrlConnect'))
+        self.engine = obter_engine('dbUrlConnect')
         try:
             with self.engine.connect() as conn:
                 result = conn.execute(text("SELECT 1"))
@@ -388,29 +368,7 @@ class Banco:
     def criar_tabela(self):
         try:
             with self.engine.begin() as conn:
-                conn.execute(text("""
-                    CREATE TABLE IF NOT EXISTS itens_pedido (
-                        id SERIAL PRIMARY KEY,
-                        codigo_produto VARCHAR(10),
-                        nome_produto TEXT,
-                        cod_est_pai VARCHAR(10),
-                        estrutura_pai TEXT,
-                        cod_est_com VARCHAR(10),
-                        nome_est_com TEXT,
-                        responsavel_est_com VARCHAR(20),
-                        quantidade INTEGER,
-                        codigopedido VARCHAR(20),
-                        codigo_pessoa VARCHAR(20),
-                        nome_pessoa TEXT,
-                        data_pedido TIMESTAMP,
-                        ciclo VARCHAR(10),
-                        subciclo VARCHAR(10),
-                        situacao_pedido VARCHAR(20),
-                        nome_modelo_comercial TEXT,
-                        UNIQUE (codigopedido, codigo_produto),
-                        FOREIGN KEY (codigopedido) REFERENCES pedidos(CodigoPedido)
-                    );
-                """))
+                conn.execute(text(ITENS_PEDIDO.ddl))
                 logging.info("Tabela 'itens_pedido' criada/verificada com sucesso!")
         except Exception as e:
             logging.error(f"Erro ao criar tabela: {e}")
@@ -419,7 +377,8 @@ class Banco:
 
     def inserirItensPedido(self, itens):
         try:
-            itens.to_excel('itens_pedido_ant_ren.xlsx', index=False)
+            # Cópia antes da renomeação, só quando DEBUG_SNAPSHOT estiver ligado
+            capturar_snapshot('itens_pedido_ant_ren', itens)
             
             itens = itens.rename(columns={
                 "CodigoPedido": "codigopedido",
@@ -444,48 +403,35 @@ class Banco:
             if hasattr(itens, 'to_dict'):
                 itens = itens.to_dict('records')
                 
-            colunas = [
-                "codigopedido", "codigo_produto", "nome_produto", "cod_est_pai", "estrutura_pai",
-                "cod_est_com", "nome_est_com", "responsavel_est_com", "quantidade", "codigo_pessoa",
-                    "nome_pessoa", "data_pedido", "ciclo", "subciclo", "situacao_pedido", "nome_modelo_comercial"
-                ]
+            colunas = ITENS_PEDIDO.colunas
 
             values = [tuple(item.get(col, None) for col in colunas) for item in itens]
 
             insert_query = f"""
                 INSERT INTO itens_pedido ({', '.join(colunas)})
                 VALUES ({', '.join(['%s'] * len(colunas))})
-                ON CONFLICT (codigopedido, codigo_produto)
-                    DO UPDATE SET
-                        {', '.join([f"{col} = EXCLUDED.{col}" for col in colunas if col not in ['codigopedido', 'codigo_produto']])}
+                {ITENS_PEDIDO.clausula_conflito(substituir_nulos=True)}
                 """
 
-            conn = self.engine.raw_connection()
-            cursor = conn.cursor()
-            try:
-                psycopg2.extras.execute_batch(cursor, insert_query, values)
-                conn.commit()
-                logging.info("Inserção/atualização de itens de pedido concluída com sucesso.")
-            except Exception as e:
-                conn.rollback()
-                logging.error(f"Erro ao inserir/atualizar itens de pedido: {e}")
-                raise
-            finally:
-                cursor.close()
-                conn.close()
+            with conexao_raw(self.engine) as (conn, cursor):
+                try:
+                    psycopg2.extras.execute_batch(cursor, insert_query, values)
+                    conn.commit()
+                    logging.info("Inserção/atualização de itens de pedido concluída com sucesso.")
+                except Exception as e:
+                    conn.rollback()
+                    logging.error(f"Erro ao inserir/atualizar itens de pedido: {e}")
+                    raise
 
         except Exception as e:
             logging.error(f"Erro ao preparar dados dos itens de pedido: {e}")
             raise
 
     def fechar(self):
-        """Método para fechar a conexão com o banco"""
-        try:
-            if self.engine:
-                self.engine.dispose()
-                logging.info("Conexão com o banco encerrada.")
-        except Exception as e:
-            logging.error(f"Erro ao fechar a conexão com o banco: {e}")
+        """
+        Nada a liberar aqui: o engine é compartilhado (db_utils) com os outros Banco
+        do processo e descartado só no fim da execução, por liberar_engines.
+        """
 
 class PegarGoogle:
     """
@@ -493,14 +439,37 @@ class PegarGoogle:
     realizando login, extração de dados de vendas e download de relatórios.
     """
     
-    def __init__(self):
-        """Inicializa o driver do Chrome com download automático da versão correta."""
+    def __init__(self, navegador=None):
+        """
+        Inicializa o driver do Chrome com download automático da versão correta.
+
+        Args:
+            navegador: PegarGoogle já aberto por outro script (ou o NavegadorRelatorios);
+                se informado, o driver, as esperas, a sessão e os downloads dele são
+                reaproveitados e nenhum Chrome novo é aberto
+        """
         self.driver = None
         self.wait = None
+        self.esperas = None
+        self.sessao = CacheSessao()
+        self.downloads = None
+        self.arquivo_baixado = None
+        self._marca_download = None
+        self._inicio_download = None
         self.data_formatada = None
         self.ciclo_1 = None
         self.ciclo_2 = None
 
+        if navegador is not None:
+            # Reaproveita o navegador já aberto (e logado) em vez de abrir outro Chrome
+            self.driver = navegador.driver
+            self.wait = navegador.wait
+            self.esperas = navegador.esperas
+            self.sessao = navegador.sessao
+            self.downloads = getattr(navegador, 'downloads', None)
+            self._configurar_data_e_ciclos()
+            return
+
         try:
             # Configuração das opções do Chrome
             options = Options()
@@ -527,6 +496,9 @@ class PegarGoogle:
                 options=options
             )
             self.wait = WebDriverWait(self.driver, 30)
+            self.esperas = Esperas(self.driver, timeout=30)
+            self.esperas.instalar_monitor_rede()
+            self.downloads = criar_gerenciador(self.driver, os.path.join(os.getcwd(), "downloads"))
 
             self.driver.maximize_window()
             self._configurar_data_e_ciclos()
@@ -603,19 +575,14 @@ class PegarGoogle:
         
         for tentativa in range(tentativas):
             try:
-                elemento = WebDriverWait(self.driver, timeout).until(
-                    EC.element_to_be_clickable((by, valor))
-                )
-                self.driver.execute_script("arguments[0].scrollIntoView(true);", elemento)
-                time.sleep(0.5)  # Pequena pausa para garantir visibilidade
-                self.driver.execute_script("arguments[0].click();", elemento)
+                self.esperas.clicar(by, valor, timeout=timeout, rolar=True)
                 return True
             except Exception as e:
                 if tentativa == tentativas - 1:  # última tentativa
                     print(f"Erro ao clicar no elemento {valor}: {e}")
                     raise
                 print(f"Tentativa {tentativa + 1} falhou, tentando novamente...")
-                time.sleep(1)
+                self.esperas.documento_pronto(timeout=10, exigir=False)
     
     def _esperar_e_clicar(self, by, valor, timeout=30, tentativas=3):
         """
@@ -632,19 +599,14 @@ class PegarGoogle:
         """
         for tentativa in range(tentativas):
             try:
-                elemento = WebDriverWait(self.driver, timeout).until(
-                    EC.element_to_be_clickable((by, valor))
-                )
-                self.driver.execute_script("arguments[0].scrollIntoView(true);", elemento)
-                time.sleep(0.5)  # Pequena pausa para garantir visibilidade
-                self.driver.execute_script("arguments[0].click();", elemento)
+                self.esperas.clicar(by, valor, timeout=timeout, rolar=True)
                 return True
             except Exception as e:
                 if tentativa == tentativas - 1:  # última tentativa
                     print(f"Erro ao clicar no elemento {valor}: {e}")
                     raise
                 print(f"Tentativa {tentativa + 1} falhou, tentando novamente...")
-                time.sleep(1)
+                self.esperas.documento_pronto(timeout=10, exigir=False)
     
     def _esperar_elemento(self, by, valor, timeout=30, tentativas=3):
         """
@@ -661,15 +623,13 @@ class PegarGoogle:
         """
         for tentativa in range(tentativas):
             try:
-                return self.wait.until(
-                    EC.element_to_be_clickable((by, valor))
-                )
+                return self.esperas.elemento(by, valor, estado='clicavel')
             except Exception as e:
                 if tentativa == tentativas - 1:  # última tentativa
                     print(f"Erro ao esperar elemento {valor}: {e}")
                     raise
                 print(f"Tentativa {tentativa + 1} falhou, tentando novamente...")
-                time.sleep(1)
+                self.esperas.documento_pronto(timeout=10, exigir=False)
     
     def _preencher_campo(self, by, valor, texto, limpar=True):
         """
@@ -693,6 +653,10 @@ class PegarGoogle:
         Returns:
             bool: True se o login foi bem-sucedido
         """
+        # Sessão salva por uma execução anterior: dispensa o login enquanto for válida
+        if self.sessao.restaurar(self.driver, self.esperas):
+            return True
+        
         try:
             usuario = os.getenv('vdUsername')
             senha = os.getenv('vdPassword')
@@ -712,6 +676,7 @@ class PegarGoogle:
             
             # Aguardando login completar
             self._esperar_elemento(By.ID, "menu-cod-1")
+            self.sessao.salvar(self.driver)
             
             print("Login realizado com sucesso!")
             return True
@@ -751,21 +716,25 @@ class PegarGoogle:
             print(f"Erro ao tratar painel: {e}")
             return False
     
-    def pegarVendas(self):
+    def pegarVendas(self, baixar=True):
         """
         Navega pelo sistema para extrair dados de vendas.
         
+        Args:
+            baixar: Se False, só agenda o export (a coleta fica com quem chamou,
+                ex.: exportar_relatorios.py)
+        
         Returns:
             bool: True se a operação foi bem-sucedida
         """
         try:
             # Navegar para o menu de vendas
             self._esperar_e_clicar(By.XPATH, '//*[@id="menu-cod-1"]/a')
-            time.sleep(1)
+            self.esperas.postback_concluido()
             self._esperar_e_clicar(By.XPATH, '//*[@id="submenu-cod-1"]/div/div[1]/ul/li[1]/a')
-            time.sleep(1)
+            self.esperas.postback_concluido()
             self._esperar_e_clicar(By.XPATH, '//*[@id="submenu-cod-1"]/div/div[1]/ul/li[1]/ul/li[4]/a')
-            time.sleep(1)
+            self.esperas.postback_concluido()
             
             # Preencher os filtros de relatório
             # self._esperar_e_clicar(By.XPATH, r'//*[@id="ContentPlaceHolder1_situacaoDropDown_d1"]')
@@ -779,9 +748,9 @@ class PegarGoogle:
             self.driver.find_element('xpath', '//*[@id="ContentPlaceHolder1_seletorBuscaDropDown_d1"]').send_keys("por")
             
             # Preencher datas
-            time.sleep(2)
+            self.esperas.postback_concluido()
             self._preencher_campo(By.XPATH, '//*[@id="ContentPlaceHolder1_dataInicioTextBox_T2"]', self.data_formatada)
-            time.sleep(2)
+            self.esperas.postback_concluido()
             self.wait.until(EC.element_to_be_clickable(('xpath', '//*[@id="ContentPlaceHolder1_dataTerminoTextBox_T2"]')))
             self._preencher_campo(By.XPATH, '//*[@id="ContentPlaceHolder1_dataTerminoTextBox_T2"]', self.data_formatada)
             
@@ -792,7 +761,8 @@ class PegarGoogle:
             
             self.wait.until(EC.element_to_be_clickable(('xpath', '//*[@id="ContentPlaceHolder1_campanhaInicioDropDown_d1"]')))
             self.driver.find_element('xpath', '//*[@id="ContentPlaceHolder1_campanhaInicioDropDown_d1"]').send_keys(self.ciclo_2)
-            time.sleep(3)
+            # A campanha inicial recarrega a lista da final (postback)
+            self.esperas.postback_concluido()
             
             # self.wait.until(EC.element_to_be_clickable(('xpath', '//*[@id="ContentPlaceHolder1_campanhaTerminoDropDown_d1"]')))
             # self._preencher_campo(By.XPATH, '//*[@id="ContentPlaceHolder1_campanhaTerminoDropDown_d1"]', self.ciclo_1)
@@ -800,7 +770,7 @@ class PegarGoogle:
             
             self.wait.until(EC.element_to_be_clickable(('xpath', '//*[@id="ContentPlaceHolder1_campanhaTerminoDropDown_d1"]')))
             self.driver.find_element('xpath', '//*[@id="ContentPlaceHolder1_campanhaTerminoDropDown_d1"]').send_keys(self.ciclo_1)
-            time.sleep(5)
+            self.esperas.postback_concluido()
             # Preencher tipo de item
             self.wait.until(EC.element_to_be_clickable(('xpath', '//*[@id="ContentPlaceHolder1_tipoItemPedidoDropDown_d1"]')))
             self.driver.find_element('xpath', '//*[@id="ContentPlaceHolder1_tipoItemPedidoDropDown_d1"]').send_keys("ve")
@@ -811,7 +781,7 @@ class PegarGoogle:
             )
             tipo_busca.send_keys(Keys.RIGHT)
             tipo_busca.send_keys(Keys.RIGHT)
-            time.sleep(0.5)
+            self.esperas.postback_concluido()
             
             # Configurar tipo de relatório
             self.wait.until(EC.element_to_be_clickable(('xpath', '//*[@id="ContentPlaceHolder1_tipoRelatProdutoDropDown_d1"]')))
@@ -825,7 +795,7 @@ class PegarGoogle:
                 return False
             
             # Aguardar carregamento dos resultados
-            time.sleep(10)
+            self.esperas.postback_concluido(timeout=120)
             
             # Clicar no botão de exportar
             self._esperar_exportar(By.XPATH, '//*[@id="ContentPlaceHolder1_exportarButton2_btn"]')
@@ -842,20 +812,21 @@ class PegarGoogle:
             
             # Configurar a exportação
             self._esperar_e_clicar(By.XPATH, '//*[@id="agendamentoExportacao_exportarPanel"]/div/div/div[2]/div[1]/div/div/div[2]/ul/li[2]/a')
-            time.sleep(2)
+            self.esperas.postback_concluido()
             self._esperar_e_clicar(By.XPATH, '//*[@id="agendamentoExportacao_colunasTab"]/div[1]/div/div/label')
-            time.sleep(2)
+            self.esperas.postback_concluido()
             self._esperar_e_clicar(By.XPATH, '//*[@id="agendamentoExportacao_okButton_B1"]')
             
             # Aguardar botão OK do popup e fechar janela
             self._esperar_e_clicar(By.XPATH, '//*[@id="popupOkButton"]')
-            time.sleep(3)
-            
-            # Realizar download do arquivo
-            self.pegar_downloads()
+            self.esperas.postback_concluido()
             
-            # Esperar download concluído
-            self.esperar_download_concluido()
+            if baixar:
+                # Realizar download do arquivo
+                self.pegar_downloads()
+                
+                # Esperar download concluído
+                self.esperar_download_concluido()
             
             # Fechar janelas extras
             self.fecharJanela()
@@ -882,57 +853,48 @@ class PegarGoogle:
     
     def esperar_download_concluido(self, diretorio="downloads", timeout=300):
         """
-        Espera até que um arquivo seja baixado completamente.
+        Espera o download disparado em pegar_downloads terminar.
+        
+        Com o GerenciadorDownloads (CDP), o Chrome avisa a conclusão e o caminho
+        devolvido é exatamente o do arquivo pedido. Sem CDP, espera um arquivo novo
+        e sem download parcial na pasta.
         
         Args:
-            diretorio: Caminho para o diretório de download
+            diretorio: Caminho para o diretório de download (usado sem CDP)
             timeout: Tempo máximo de espera em segundos
         
         Returns:
             str: Caminho do arquivo baixado ou None se falhar
         """
-        # Garantir que o diretório existe
-        os.makedirs(diretorio, exist_ok=True)
-        
-        inicio = time.time()
-        ultimo_tamanho = {}
-        arquivo_baixado = None
+        if self.arquivo_baixado:
+            # Já baixado por HTTP em pegar_downloads
+            return self.arquivo_baixado
         
         print("Aguardando conclusão do download...")
         
-        while time.time() - inicio < timeout:
-            # Busca por arquivos parcialmente baixados
-            arquivos_parciais = glob.glob(os.path.join(diretorio, "*.crdownload")) + \
-                               glob.glob(os.path.join(diretorio, "*.part")) + \
-                               glob.glob(os.path.join(diretorio, "*.download"))
-            
-            # Se não há arquivos parciais, verifica por novos arquivos completos
-            if not arquivos_parciais:
-                arquivos = glob.glob(os.path.join(diretorio, "*"))
-                if arquivos:
-                    # Pega o arquivo mais recente (assumindo que é o download atual)
-                    arquivo_recente = max(arquivos, key=os.path.getctime)
-                    
-                    # Se o arquivo não mudou de tamanho nos últimos 3 segundos
-                    # assume que o download está completo
-                    tamanho_atual = os.path.getsize(arquivo_recente)
-                    if arquivo_recente in ultimo_tamanho:
-                        if tamanho_atual == ultimo_tamanho[arquivo_recente]:
-                            arquivo_baixado = arquivo_recente
-                            print(f"Download concluído: {os.path.basename(arquivo_baixado)}")
-                            return arquivo_baixado
-                    
-                    ultimo_tamanho[arquivo_recente] = tamanho_atual
-            
-            # Aguarda 1 segundo antes de verificar novamente
-            time.sleep(1)
+        if self.downloads:
+            arquivo_baixado = self.downloads.aguardar(self._marca_download or 0, timeout)
+        else:
+            os.makedirs(diretorio, exist_ok=True)
+            arquivo_baixado = self.esperas.download_concluido(
+                diretorio, self._inicio_download or 0, timeout=timeout, exigir=False
+            )
+            if arquivo_baixado:
+                print(f"Download concluído: {os.path.basename(arquivo_baixado)}")
+            else:
+                print(f"Tempo limite excedido ({timeout}s). Download não concluído.")
         
-        print(f"Tempo limite excedido ({timeout}s). Download não concluído.")
-        return None
+        self.arquivo_baixado = arquivo_baixado
+        return arquivo_baixado
             
     
     def pegar_downloads(self):
-        wait = WebDriverWait(self.driver, 120)
+        # Modo HTTP opcional: fila e download com a sessão do navegador, sem renderizar páginas
+        self.arquivo_baixado = None
+        if exportacao_http_ativa():
+            self.arquivo_baixado = baixar_exportacao(self.driver, os.path.join(os.getcwd(), "downloads"))
+            if self.arquivo_baixado:
+                return
         
         try:
             # Clique em vários elementos conforme necessário
@@ -943,17 +905,16 @@ class PegarGoogle:
             ]
             
             for xpath in elements:
-                element = wait.until(EC.element_to_be_clickable((By.XPATH, xpath)))
-                self.driver.execute_script("arguments[0].click();", element)
-                time.sleep(2)  # Adicione um tempo de espera se necessário
+                self.esperas.clicar(By.XPATH, xpath, postback=True)
             
             # Código específico para clicar no botão de download com tratamento de exceção
             while True:
                 try:
-                    download_button = WebDriverWait(self.driver, 10).until(EC.element_to_be_clickable(('xpath', '//*[@id="ContentPlaceHolder1_exportacoesGrid_baixarButton_0_btn_0"]')))
-                    time.sleep(10)
+                    download_button = self.esperas.elemento(By.XPATH, '//*[@id="ContentPlaceHolder1_exportacoesGrid_baixarButton_0_btn_0"]', estado='clicavel', timeout=10)
+                    # A conclusão do download é acompanhada por esperar_download_concluido
+                    self._inicio_download = time.time()
+                    self._marca_download = self.downloads.marcar() if self.downloads else None
                     self.driver.execute_script("arguments[0].click();", download_button)
-                    time.sleep(10)
                     break  # Sai do loop se conseguir clicar no botão de download
                 except TimeoutException:
                     # Verifica se o botão de alerta está presente
@@ -962,7 +923,7 @@ class PegarGoogle:
                         if alert_button.is_displayed():
                             print("Alerta detectado. Recarregando a página...")
                             self.driver.refresh()  # Recarrega a página
-                            time.sleep(5)  # Aguarda um tempo para a página recarregar
+                            self.esperas.documento_pronto()
                             continue  # Volta para o início do loop
                     except NoSuchElementException:
                         pass  # Se o alerta não for encontrado, continua com a próxima tentativa
@@ -973,15 +934,13 @@ class PegarGoogle:
 
                 # Tentar clicar no botão de atualizar se o botão de download não estiver disponível
                 try:
-                    atualizar = WebDriverWait(self.driver, 10).until(EC.element_to_be_clickable(('xpath', '//*[@id="ContentPlaceHolder1_atualizarButton_btn"]')))
-                    self.driver.execute_script("arguments[0].click();", atualizar)
-                    time.sleep(5)  # Adiciona um pequeno tempo de espera para o botão ser clicado
+                    self.esperas.clicar(By.XPATH, '//*[@id="ContentPlaceHolder1_atualizarButton_btn"]', timeout=10, postback=True)
                 except TimeoutException:
                     pass
         except StaleElementReferenceException:
             print("Elemento foi atualizado ou não está mais na página. Recarregando...")
             self.driver.refresh()  # Recarrega a página
-            time.sleep(5)
+            self.esperas.documento_pronto()
             self.pegar_downloads()  # Tenta novamente
     
     def executar_fluxo_completo(self):
@@ -1017,6 +976,10 @@ class PegarGoogle:
     
     def fechar(self):
         """Fecha o navegador e limpa recursos."""
+        if self.esperas:
+            self.esperas.resumo()
+        if self.downloads:
+            self.downloads.parar()
         try:
             if self.driver:
                 self.driver.quit()
@@ -1032,7 +995,7 @@ if __name__ == "__main__":
         rpa.fechar() 
         break
     banco = Banco()
-    tratar = TratarDados()
+    tratar = TratarDados(arquivo=rpa.arquivo_baixado)
     df = tratar.processar_arquivo_vendas()
     banco.inserirItensPedido(df)
     banco.fechar() 
\ No newline at end of file
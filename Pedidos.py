@@ -1,6 +1,7 @@
 # Generated by Selenium IDE
 import pytest
 import time
+import argparse
 import json
 from selenium import webdriver
 from selenium.webdriver.common.by import By
@@ -21,7 +22,7 @@ import glob
 import os
 import numpy as np
 from urllib.parse import quote
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from sqlalchemy.types import String
 from sqlalchemy.types import Integer
 from sqlalchemy.types import Float
@@ -36,7 +37,20 @@ import csv
 from pandas.api.types import is_scalar
 import psycopg2.extras
 from seleniumbase import Driver
+from espera_utils import Esperas
+from sessao_utils import CacheSessao
+from exportacao_utils import baixar_exportacao, exportacao_http_ativa
 from psycopg2.extras import execute_values
+from copy_utils import copiar_dataframe
+from db_utils import obter_engine, conexao_raw
+from normalizacao_utils import normalizar_texto, valores_para_carga
+from esquemas import PEDIDOS
+from leitura_utils import LeitorCSV
+from hash_utils import calcular_hash_linhas
+from bissecao_utils import executar_com_bissecao, gravar_rejeitados_arquivo
+from lote_utils import ControladorLotes
+from pipeline_utils import PipelineETL
+from parquet_utils import ZonaParquet, aplicar_filtros
 
 # Configuração do sistema de logging
 def setup_logger():
@@ -89,236 +103,202 @@ ciclos_2024 = [
 ]
 
 class TratarDados():
-    def __init__(self):
-        # Caminhos portáveis: primeiro busca na pasta 'downloads' do projeto, depois em 'Downloads' do usuário
-        base_dir = r"C:\Users\Administrator\Desktop"
-        projeto_downloads = os.path.join(base_dir, 'download_path_databse')
-        usuario_downloads = os.path.join(os.path.expanduser('~'), 'download_path_databse')
-
-        padroes = [
-            os.path.join(projeto_downloads, '*.csv'),
-            os.path.join(usuario_downloads, '*.csv'),
-        ]
+    # Cabeçalho do export -> coluna da tabela, e colunas lidas como category; ambos vêm do esquema
+    MAPEAMENTO_COLUNAS = PEDIDOS.mapeamento
+    COLUNAS_CATEGORICAS = PEDIDOS.origens_categoricas
+
+    def __init__(self, arquivo=None):
+        if arquivo:
+            # Arquivo exato (ex.: baixado por exportar_relatorios.py), sem buscar o mais recente
+            self.file = arquivo
+        else:
+            # Caminhos portáveis: primeiro busca na pasta 'downloads' do projeto, depois em 'Downloads' do usuário
+            base_dir = r"C:\Users\Administrator\Desktop"
+            projeto_downloads = os.path.join(base_dir, 'download_path_databse')
+            usuario_downloads = os.path.join(os.path.expanduser('~'), 'download_path_databse')
+
+            padroes = [
+                os.path.join(projeto_downloads, '*.csv'),
+                os.path.join(usuario_downloads, '*.csv'),
+            ]
 
-        list_of_files = []
-        for padrao in padroes:
-            arquivos = glob.glob(padrao)
-            if arquivos:
-                list_of_files.extend(arquivos)
+            list_of_files = []
+            for padrao in padroes:
+                arquivos = glob.glob(padrao)
+                if arquivos:
+                    list_of_files.extend(arquivos)
 
-        if not list_of_files:
-            raise FileNotFoundError("Nenhum arquivo CSV encontrado nas pastas padrão ('downloads' do projeto ou 'Downloads' do usuário).")
+            if not list_of_files:
+                raise FileNotFoundError("Nenhum arquivo CSV encontrado nas pastas padrão ('downloads' do projeto ou 'Downloads' do usuário).")
 
-        self.file = max(list_of_files, key=os.path.getctime)
+            self.file = max(list_of_files, key=os.path.getctime)
+        # Export já convertido para Parquet é relido de lá (só as colunas mapeadas)
+        self.zona = ZonaParquet()
         
+    def _mapa_dtypes(self):
+        """Dtype por coluna de origem: categorias para colunas repetitivas, texto para o resto"""
+        return PEDIDOS.dtypes_leitura
+
+    def _leitor(self):
+        """Leitor do export em pipe (pyarrow em streaming), com descarte contado de linhas inválidas"""
+        return LeitorCSV(self.file, sep='|', encoding='utf-8', dtype=self._mapa_dtypes())
+
+    def _separar_cancelados(self, df):
+        df_cancelados = df[df['SituacaoComercial'] == 'Cancelado']
+        df_sem_cancelados = df[df['SituacaoComercial'] != 'Cancelado']
+        return df_sem_cancelados, df_cancelados
+
     def processar_arquivo_pedidos(self):
 
         try:
             print(self.file )
             logger.info(f"Iniciando processamento do arquivo: {self.file}")
-            df = pd.read_csv(self.file,
-                             sep='|',
-                             encoding='utf-8',
-                             on_bad_lines='skip',
-                             engine='python',
-                             dtype=str)
-
-            logger.info(f"Arquivo lido com sucesso. Total de linhas: {len(df)}")
-
-            # Mapeamento de colunas
-            mapeamento_colunas = {
-                'CodigoPedido': 'CodigoPedido',
-                'Cód Externo Pedido': 'CodExternoPedido',
-                'SituaçãoFiscal': 'SituacaoFiscal',
-                'NotaFiscal': 'NotaFiscal',
-                'Pessoa': 'Pessoa',
-                'NomePessoa': 'NomePessoa',
-                'Papel': 'Papel',
-                'Ordem de Pedido': 'OrdemPedido',
-                'QtdeItens': 'QtdeItens',
-                'QtdeMateriais': 'QtdeMateriais',
-                'ValorPedido': 'ValorPedido',
-                'ValorTotalSemCCR': 'ValorTotalSemCCR',
-                'ValorTabela': 'ValorTabela',
-                'ValorPraticado': 'ValorPraticado',
-                'ValorLiquido': 'ValorLiquido',
-                'ValorProdutosRegulares': 'ValorProdutosRegulares',
-                'ValorPraticadoProdutosRegulares': 'ValorPraticadoProdutosRegulares',
-                'ValorTabelaProdutosRegulares': 'ValorTabelaProdutosRegulares',
-                'MeioCaptacao': 'MeioCaptacao',
-                'Tipo de Entrega': 'TipoEntrega',
-                'SituaçãoComercial': 'SituacaoComercial',
-                'DetalheSituaçãoComercial': 'DetalheSituacaoComercial',
-                'SituacaoIntegracaoExterna': 'SituacaoIntegracaoExterna',
-                'DetalheSituacaoIntExterna': 'DetalheSituacaoIntExterna',
-                'Data Captação': 'DataCaptacao',
-                'HoraPedido': 'HoraPedido',
-                'Data Aprovação': 'DataAprovacao',
-                'Data Marketing': 'DataMarketing',
-                'PrevisãoEntrega': 'PrevisaoEntrega',
-                'DataEntrega': 'DataEntrega',
-                'DataAutorizaçãoFaturamento': 'DataAutorizacaoFaturamento',
-                'Cód Linha de Separação': 'CodLinhaSeparacao',
-                'DataFaturamento': 'DataFaturamento',
-                'Ciclo Captação': 'CicloCaptacao',
-                'SubCiclo': 'SubCiclo',
-                'Ciclo Marketing': 'CicloMarketing',
-                'CicloIndicador': 'CicloIndicador',
-                'CicloCancelamento': 'CicloCancelamento',
-                'CaptacaoRestrita': 'CaptacaoRestrita',
-                'Dia do Ciclo': 'DiaCiclo',
-                'PlanoPagamento': 'PlanoPagamento',
-                'Logradouro': 'Logradouro',
-                'Complemento': 'Complemento',
-                'Bairro': 'Bairro',
-                'Cidade': 'Cidade',
-                'UF': 'UF',
-                'CEP': 'CEP',
-                'Referência': 'Referencia',
-                'LogradouroEntrega': 'LogradouroEntrega',
-                'ComplementoEntregaRetirada': 'ComplementoEntregaRetirada',
-                'BairroEntregaRetirada': 'BairroEntregaRetirada',
-                'CidadeEntregaRetirada': 'CidadeEntregaRetirada',
-                'UFEntregaRetirada': 'UFEntregaRetirada',
-                'CEPEntregaRetirada': 'CEPEntregaRetirada',
-                'ReferênciaEntregaRetirada': 'ReferenciaEntregaRetirada',
-                'Telefone': 'Telefone',
-                'CódModeloComercial': 'CodModeloComercial',
-                'ModeloComercial': 'ModeloComercial',
-                'Cód Estrutura Pai': 'CodEstruturaPai',
-                'EstruturaPai': 'EstruturaPai',
-                'Cód Estrutura': 'CodEstrutura',
-                'Estrutura': 'Estrutura',
-                'Responsável Estrutura': 'ResponsavelEstrutura',
-                'Telefone Responsável': 'TelefoneResponsavel',
-                'Cód Usuário Criação': 'CodUsuarioCriacao',
-                'Usuario de Criação': 'UsuarioCriacao',
-                'Cód Usuário Finalização': 'CodUsuarioFinalizacao',
-                'Usuario de Finalização': 'UsuarioFinalizacao',
-                'Volume': 'Volume',
-                'PesoEstimado': 'PesoEstimado',
-                'PesoReal': 'PesoReal',
-                'Lote de separação': 'LoteSeparacao',
-                'CódCD': 'CodCD',
-                'CanalDistribuicao': 'CanalDistribuicao',
-                'Detalhe Entrega': 'DetalheMeioCaptacao'
-            }
+            entrada = self.zona.procurar('pedidos', self.file)
+            if entrada:
+                df = self.zona.ler(entrada, colunas=list(self.MAPEAMENTO_COLUNAS))
+                self.linhas_descartadas = entrada.get('linhas_descartadas', 0)
+            else:
+                leitor = self._leitor()
+                df = leitor.ler()
+                self.linhas_descartadas = leitor.linhas_descartadas
+                gravador = self.zona.gravador('pedidos', self.file)
+                if self._gravar_landing(gravador, df):
+                    self._concluir_landing(gravador)
 
-            # Renomear colunas existentes
-            colunas_existentes = {k: v for k, v in mapeamento_colunas.items() if k in df.columns}
-            logger.info(f"Colunas existentes após mapeamento: {list(colunas_existentes.values())}")
-            df = df.rename(columns=colunas_existentes)
+            logger.info(f"Arquivo lido com sucesso. Total de linhas: {len(df)} (descartadas: {self.linhas_descartadas})")
 
-            logger.info(f"Colunas após renomear: {list(df.columns)}")
+            df = self._tratar_dataframe(df, layout_arquivo='|'.join(df.columns))
 
-            if 'SituacaoComercial' not in df.columns:
-                logger.warning("Coluna 'SituacaoComercial' NÃO encontrada após renomeação!")
-            else:
-                logger.info("Coluna 'SituacaoComercial' encontrada para processamento.")
-
-            df['CodigoPedido'] = df['CodigoPedido'].astype(str)
-            df['CodUsuarioCriacao'] = df['CodUsuarioCriacao'].astype(str)
-            df['CodUsuarioFinalizacao'] = df['CodUsuarioFinalizacao'].astype(str)
-            df['Pessoa'] = df['Pessoa'].astype(str)
-            df['OrdemPedido'] = df['OrdemPedido'].astype(str)
-            df['SituacaoComercial'] = df['SituacaoComercial'].astype(str)   
-
-            # Filtrar apenas colunas válidas para inserção
-            colunas_validas = [col for col in mapeamento_colunas.values() if col in df.columns]
-            logger.info(f"Colunas válidas para inserção: {colunas_validas}")
-            df = df[colunas_validas]
-
-            # Conversão de tipos
-            colunas_data = [
-                'DataCaptacao', 'DataAprovacao', 'DataMarketing', 'PrevisaoEntrega',
-                'DataEntrega', 'DataAutorizacaoFaturamento', 'DataFaturamento'
-            ]
-            def converter_data(valor):
-                if pd.isna(valor) or valor == '':
-                    return None
-                
-                formatos = ['%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%Y/%m/%d']
-                
-                for formato in formatos:
-                    try:
-                        return pd.to_datetime(valor, format=formato).date()
-                    except:
-                        continue
-                
-                # Se nenhum formato funcionar, tenta conversão automática
-                try:
-                    return pd.to_datetime(valor).date()
-                except:
-                    return None
+            logger.info("Processamento e conversão de dados concluídos com sucesso")
+            
+            return self._separar_cancelados(df)
 
-            # Aplicar a função
-            for col in colunas_data:
-                if col in df.columns:
-                    logger.info(f"Processando coluna {col}")
-                    df[col] = df[col].apply(converter_data)
+        except Exception as e:
+            logger.error(f"Erro ao processar arquivo: {str(e)}")
+            raise
 
-            colunas_time = ['HoraPedido']
-            for col in colunas_time:
-                if col in df.columns:
-                    df[col] = pd.to_datetime(df[col], errors='coerce').dt.time
-                    
-            colunas_float = [
-                'ValorPedido', 'ValorTotalSemCCR', 'ValorTabela', 'ValorPraticado', 'ValorLiquido',
-                'ValorProdutosRegulares', 'ValorPraticadoProdutosRegulares', 'ValorTabelaProdutosRegulares',
-                'Volume', 'PesoEstimado', 'PesoReal'
-            ]
-            for col in colunas_float:
-                if col in df.columns:
-                    df[col] = df[col].str.replace('.', '', regex=False)   # remove separador de milhares, se houver
-                    df[col] = df[col].str.replace(',', '.', regex=False)    
-                    df[col] = pd.to_numeric(df[col], errors='coerce', downcast='float')
-
-            colunas_int = ['QtdeItens', 'QtdeMateriais', 'DiaCiclo', 'Volume']
-            for col in colunas_int:
-                if col in df.columns:
-                    # Substitua valores nulos por 0
-                    df[col] = df[col].fillna(0)
-                    # Primeiro, substitua strings inválidas por None
-                    df[col] = df[col].apply(lambda x: None if (isinstance(x, str) and not x.isdigit()) else x)
-                    # Converta para numérico, forçando erros inválidos para None
-                    df[col] = pd.to_numeric(df[col], errors='coerce')
-                    # Converta para inteiro, mantendo None para valores inválidos
-                    df[col] = df[col].apply(lambda x: int(x) if pd.notna(x) and isinstance(x, (int, float)) else 0)
-            
-            # Substituir NaN, NaT, strings vazias e valores nulos por None para inserção no banco
-            df = df.where(pd.notna(df), None)  # substitui NaN/NaT por None diretamente
-            
-            # Converter NaT para None explicitamente
-            for col in df.columns:
-                if pd.api.types.is_datetime64_any_dtype(df[col]):
-                    df[col] = df[col].apply(lambda x: None if pd.isna(x) else x)
+    def ler_blocos(self, tamanho_chunk=50000, filtros=None):
+        """
+        Gera os blocos brutos do arquivo (sem tratamento), `tamanho_chunk` linhas por vez.
 
-            # Truncar valores de texto que ultrapassam 100 caracteres
-            for col in df.columns:
-                if pd.api.types.is_string_dtype(df[col]):
-                    df[col] = df[col].apply(lambda x: x[:100] if isinstance(x, str) else x)
+        Na primeira leitura o CSV é convertido para a landing zone Parquet enquanto os
+        blocos são gerados; se o mesmo download for processado de novo, os blocos vêm
+        do Parquet, só com as colunas mapeadas e com `filtros` aplicados na leitura
+        (ex.: [('SituaçãoComercial', '==', 'Cancelado')], nomes do cabeçalho do export).
+        """
+        logger.info(f"Iniciando leitura em blocos de {tamanho_chunk} linhas: {self.file}")
+        entrada = self.zona.procurar('pedidos', self.file)
+        if entrada:
+            logger.info(f"Relendo o export da landing zone: {entrada['parquet']}")
+            blocos = self.zona.iterar(entrada, tamanho_chunk, colunas=list(self.MAPEAMENTO_COLUNAS), filtros=filtros)
+            gravador = None
+        else:
+            leitor = self._leitor()
+            blocos = leitor.iterar(tamanho_bloco=tamanho_chunk)
+            gravador = self.zona.gravador('pedidos', self.file)
 
-            # Colunas que devem ser booleanas (ex: valores como "Sim"/"Não")
-            colunas_booleanas = ['CaptacaoRestrita']  # adicione outras se houver
+        total = 0
+        concluido = False
+        try:
+            for numero, df in enumerate(blocos, 1):
+                if gravador and not self._gravar_landing(gravador, df):
+                    gravador = None
+                if filtros and not entrada:
+                    df = aplicar_filtros(df, filtros)
+                total += len(df)
+                logger.info(f"Bloco {numero}: {len(df)} linhas lidas (acumulado: {total})")
+                yield df
+            concluido = True
+        finally:
+            if gravador and not concluido:
+                # Leitura interrompida: o Parquet parcial não é publicado
+                gravador.descartar()
+
+        self.linhas_descartadas = entrada.get('linhas_descartadas', 0) if entrada else leitor.linhas_descartadas
+        if gravador:
+            self._concluir_landing(gravador)
+        logger.info(f"Leitura em blocos concluída: {total} linhas, {self.linhas_descartadas} descartadas")
+
+    def _gravar_landing(self, gravador, df):
+        """Escreve o bloco no Parquet; uma falha só desliga a landing zone nesta execução"""
+        if gravador is None:
+            return False
+        try:
+            gravador.escrever(df)
+            return True
+        except Exception as e:
+            logger.warning(f"Landing zone desativada nesta leitura: {e}")
+            gravador.descartar()
+            return False
 
-            for col in colunas_booleanas:
-                if col in df.columns:
-                    df[col] = df[col].map(lambda x: True if str(x).strip().lower() in ['sim', 'true', '1'] else False)
+    def _concluir_landing(self, gravador):
+        try:
+            gravador.concluir(linhas_descartadas=self.linhas_descartadas)
+        except Exception as e:
+            logger.warning(f"Não foi possível publicar o export na landing zone: {e}")
+            gravador.descartar()
 
-            logger.info("Processamento e conversão de dados concluídos com sucesso")
-            
-            df_cancelados = df[df['SituacaoComercial'] == 'Cancelado']
-            df_sem_cancelados = df[df['SituacaoComercial'] != 'Cancelado']            
-            return df_sem_cancelados, df_cancelados
+    def tratar_bloco(self, df):
+        """Trata um bloco bruto e retorna (df_sem_cancelados, df_cancelados)"""
+        df = self._tratar_dataframe(df, layout_arquivo='|'.join(df.columns))
+        return self._separar_cancelados(df)
+
+    def iterar_arquivo_pedidos(self, tamanho_chunk=50000, filtros=None):
+        """
+        Versão em streaming: gera (df_sem_cancelados, df_cancelados) a cada
+        `tamanho_chunk` linhas, mantendo a memória constante em exports grandes.
+        """
+        try:
+            for df in self.ler_blocos(tamanho_chunk, filtros=filtros):
+                yield self.tratar_bloco(df)
 
         except Exception as e:
-            logger.error(f"Erro ao processar arquivo: {str(e)}")
+            logger.error(f"Erro ao processar arquivo em blocos: {str(e)}")
             raise
+
+    def _tratar_dataframe(self, df, layout_arquivo=None):
+        """Renomeia, filtra e converte os tipos de um DataFrame bruto do export"""
+        # Renomear pelo esquema e manter só as colunas da tabela
+        df = PEDIDOS.renomear(df)
+        logger.info(f"Colunas válidas para inserção: {list(df.columns)}")
+
+        if 'SituacaoComercial' not in df.columns:
+            logger.warning("Coluna 'SituacaoComercial' NÃO encontrada após renomeação!")
+        else:
+            logger.info("Coluna 'SituacaoComercial' encontrada para processamento.")
+
+        df['CodigoPedido'] = df['CodigoPedido'].astype(str)
+        df['CodUsuarioCriacao'] = df['CodUsuarioCriacao'].astype(str)
+        df['CodUsuarioFinalizacao'] = df['CodUsuarioFinalizacao'].astype(str)
+        df['Pessoa'] = df['Pessoa'].astype(str)
+        df['OrdemPedido'] = df['OrdemPedido'].astype(str)
+        df['SituacaoComercial'] = df['SituacaoComercial'].astype(str)   
+
+        # Conversores vetorizados por tipo do esquema: datas (formato em cache por layout),
+        # hora, decimais ('1.234,56'), inteiros (só dígitos, nulos viram 0), booleanos e
+        # texto normalizado/truncado pelo tamanho de cada coluna no DDL
+        df = PEDIDOS.converter(df, layout=layout_arquivo, inteiro_estrito=True)
+
+        logger.info("Processamento e conversão de dados concluídos com sucesso")
+        
+        return df
  
 
 class Banco():
+    # Colunas na ordem da tabela, flags do upsert, DDL e limites de texto vêm do esquema
+    COLUNAS_PEDIDOS = PEDIDOS.colunas
+
+    # Colunas que NÃO devem ser atualizadas em caso de conflito
+    COLUNAS_IMUTAVEIS = PEDIDOS.imutaveis
+
+    # Colunas críticas que devem sempre ser atualizadas (mesmo que venham como NULL)
+    COLUNAS_CRITICAS = PEDIDOS.criticas
+
+    DDL_PEDIDOS = PEDIDOS.ddl
+    LIMITES_TEXTO = PEDIDOS.limites
+
     def __init__(self):
-        self.engine = create_engine(os.getenv('DATABASE_URL')) 
+        self.engine = obter_engine('DATABASE_URL')
         try:
             conn = self.engine.connect()
             result = conn.execute(text("SELECT 1"))
@@ -335,83 +315,25 @@ class Banco():
     def criar_tabela(self):
         try:
             with self.engine.connect() as conn:
+                conn.execute(text(self.DDL_PEDIDOS))
+                # Digest do conteúdo enviado por pedido, para detectar o que mudou entre execuções
                 conn.execute(text("""
-                    CREATE TABLE IF NOT EXISTS pedidos (
-                        CodigoPedido varchar(30) primary key,
-                        CodExternoPedido VARCHAR(50),
-                        SituacaoFiscal VARCHAR(50),
-                        NotaFiscal VARCHAR(50),
-                        Pessoa varchar(20),
-                        NomePessoa VARCHAR(255),
-                        Papel VARCHAR(50),
-                        OrdemPedido varchar(50),
-                        QtdeItens INT,
-                        QtdeMateriais INT,
-                        ValorPedido DECIMAL(10, 2),
-                        ValorTotalSemCCR DECIMAL(10, 2),
-                        ValorTabela DECIMAL(10, 2),
-                        ValorPraticado DECIMAL(10, 2),
-                        ValorLiquido DECIMAL(10, 2),
-                        ValorProdutosRegulares DECIMAL(10, 2),
-                        ValorPraticadoProdutosRegulares DECIMAL(10, 2),
-                        ValorTabelaProdutosRegulares DECIMAL(10, 2),
-                        MeioCaptacao VARCHAR(100),
-                        TipoEntrega VARCHAR(100),
-                        SituacaoComercial VARCHAR(100),
-                        DetalheSituacaoComercial VARCHAR(255),
-                        SituacaoIntegracaoExterna VARCHAR(100),
-                        DetalheSituacaoIntExterna VARCHAR(255),
-                        DataCaptacao DATE,
-                        HoraPedido TIME,
-                        DataAprovacao DATE,
-                        DataMarketing DATE,
-                        PrevisaoEntrega DATE,
-                        DataEntrega DATE,
-                        DataAutorizacaoFaturamento DATE,
-                        CodLinhaSeparacao VARCHAR(50),
-                        DataFaturamento DATE,
-                        CicloCaptacao VARCHAR(50),
-                        SubCiclo VARCHAR(50),
-                        CicloMarketing VARCHAR(50),
-                        CicloIndicador VARCHAR(50),
-                        CicloCancelamento VARCHAR(50),
-                        CaptacaoRestrita BOOLEAN,
-                        DiaCiclo INT,
-                        PlanoPagamento VARCHAR(255),
-                        Logradouro VARCHAR(255),
-                        Complemento VARCHAR(255),
-                        Bairro VARCHAR(100),
-                        Cidade VARCHAR(100),
-                        UF CHAR(2),
-                        CEP VARCHAR(15),
-                        Referencia VARCHAR(255),
-                        LogradouroEntrega VARCHAR(255),
-                        ComplementoEntregaRetirada VARCHAR(255),
-                        BairroEntregaRetirada VARCHAR(100),
-                        CidadeEntregaRetirada VARCHAR(100),
-                        UFEntregaRetirada CHAR(2),
-                        CEPEntregaRetirada VARCHAR(15),
-                        ReferenciaEntregaRetirada VARCHAR(255),
-                        Telefone VARCHAR(20),
-                        CodModeloComercial VARCHAR(50),
-                        ModeloComercial VARCHAR(255),
-                        CodEstruturaPai VARCHAR(50),
-                        EstruturaPai VARCHAR(255),
-                        CodEstrutura VARCHAR(50),
-                        Estrutura VARCHAR(255),
-                        ResponsavelEstrutura VARCHAR(255),
-                        TelefoneResponsavel VARCHAR(20),
-                        CodUsuarioCriacao varchar(30),
-                        UsuarioCriacao VARCHAR(255),
-                        CodUsuarioFinalizacao varchar(30),
-                        UsuarioFinalizacao VARCHAR(255),
-                        Volume INT,
-                        PesoEstimado DECIMAL(10, 2),
-                        PesoReal DECIMAL(10, 2),
-                        LoteSeparacao VARCHAR(50),
-                        CodCD VARCHAR(50),
-                        CanalDistribuicao VARCHAR(100),
-                        DetalheMeioCaptacao VARCHAR(255)
+                    CREATE TABLE IF NOT EXISTS pedidos_hash (
+                        CodigoPedido varchar(30) primary key
+                            REFERENCES pedidos(CodigoPedido) ON DELETE CASCADE,
+                        HashConteudo BIGINT NOT NULL,
+                        AtualizadoEm TIMESTAMP DEFAULT now()
+                    )
+                """))
+                # Dead-letter: registros rejeitados na carga, guardados para reprocessamento
+                conn.execute(text("""
+                    CREATE TABLE IF NOT EXISTS cargas_rejeitadas (
+                        Id BIGSERIAL PRIMARY KEY,
+                        Origem VARCHAR(50) NOT NULL,
+                        CodigoPedido varchar(30),
+                        Registro JSONB,
+                        Erro TEXT,
+                        CriadoEm TIMESTAMP DEFAULT now()
                     )
                 """))
                 conn.commit()
@@ -420,92 +342,44 @@ class Banco():
             print(f"Erro ao criar tabela: {e}")
             raise
 
-    def inserirPedidos(self, pedidos):
+    def inserirPedidos(self, pedidos, modo='lotes'):
+        """
+        Insere/atualiza pedidos no banco.
+
+        Args:
+            pedidos: DataFrame ou lista de dicts com os pedidos tratados
+            modo: 'lotes' (execute_values paginado) ou 'copy' (COPY para staging + merge único)
+        """
         try:
-            if hasattr(pedidos, 'to_dict'):
-                pedidos = pedidos.to_dict('records')
+            if modo == 'copy':
+                return self._inserir_pedidos_copy(pedidos)
 
-            if not pedidos:
+            if pedidos is None or len(pedidos) == 0:
                 logger.warning("Nenhum pedido para processar")
                 return
 
-            # Lista com as colunas exatas e na ordem correta
-            colunas = [
-                "CodigoPedido", "CodExternoPedido", "SituacaoFiscal", "NotaFiscal", "Pessoa", "NomePessoa", "Papel", "OrdemPedido",
-                "QtdeItens", "QtdeMateriais", "ValorPedido", "ValorTotalSemCCR", "ValorTabela", "ValorPraticado", "ValorLiquido",
-                "ValorProdutosRegulares", "ValorPraticadoProdutosRegulares", "ValorTabelaProdutosRegulares", "MeioCaptacao",
-                "TipoEntrega", "SituacaoComercial", "DetalheSituacaoComercial", "SituacaoIntegracaoExterna",
-                "DetalheSituacaoIntExterna", "DataCaptacao", "HoraPedido", "DataAprovacao", "DataMarketing", "PrevisaoEntrega",
-                "DataEntrega", "DataAutorizacaoFaturamento", "CodLinhaSeparacao", "DataFaturamento", "CicloCaptacao", "SubCiclo",
-                "CicloMarketing", "CicloIndicador", "CicloCancelamento", "CaptacaoRestrita", "DiaCiclo", "PlanoPagamento",
-                "Logradouro", "Complemento", "Bairro", "Cidade", "UF", "CEP", "Referencia", "LogradouroEntrega",
-                "ComplementoEntregaRetirada", "BairroEntregaRetirada", "CidadeEntregaRetirada", "UFEntregaRetirada",
-                "CEPEntregaRetirada", "ReferenciaEntregaRetirada", "Telefone", "CodModeloComercial",
-                "ModeloComercial", "CodEstruturaPai", "EstruturaPai", "CodEstrutura", "Estrutura",
-                "ResponsavelEstrutura", "TelefoneResponsavel", "CodUsuarioCriacao", "UsuarioCriacao",
-                "CodUsuarioFinalizacao", "UsuarioFinalizacao", "Volume", "PesoEstimado", "PesoReal",
-                "LoteSeparacao", "CodCD", "CanalDistribuicao", "DetalheMeioCaptacao"
-            ]
-
-            # Colunas que NÃO devem ser atualizadas em caso de conflito
-            colunas_imutaveis = {"CodigoPedido", "CodUsuarioCriacao", "UsuarioCriacao", "DataCaptacao"}
-            
-            # Colunas críticas que devem sempre ser atualizadas (mesmo que venham como NULL)
-            colunas_criticas = {"SituacaoComercial", "DetalheSituacaoComercial", "SituacaoFiscal", "SituacaoIntegracaoExterna"}
+            colunas = self.COLUNAS_PEDIDOS
 
             logger.info(f"=== PROCESSAMENTO INICIADO - {len(pedidos)} pedidos ===")
-            
-            # Validação e limpeza dos dados
-            values = []
-            pedidos_com_problemas = []
-            
-            for i, pedido in enumerate(pedidos):
-                # Verificar se CodigoPedido existe e não é None/vazio
-                codigo_pedido = pedido.get("CodigoPedido")
-                if not codigo_pedido:
-                    pedidos_com_problemas.append(f"Índice {i}: CodigoPedido ausente ou vazio")
-                    continue
-                    
-                # Preparar tupla de valores, garantindo que strings vazias sejam convertidas para None
-                row_values = []
-                for col in colunas:
-                    valor = pedido.get(col)
-                    
-                    # Converter strings vazias para None, MAS manter valores válidos
-                    if valor == "" or valor == "None" or valor == "null":
-                        valor = None
-                    elif isinstance(valor, str) and valor.strip() == "":
-                        valor = None
-                        
-                    row_values.append(valor)
-                
-                values.append(tuple(row_values))
 
-            if pedidos_com_problemas:
-                logger.warning(f"Pedidos com problemas ignorados: {len(pedidos_com_problemas)} de {len(pedidos)}")
-            
+            # Normalização já feita no tratamento; aqui só descarta pedidos sem código
+            df, descartados = self._preparar_dataframe(pedidos, deduplicar=False)
+            if descartados:
+                logger.warning(f"Pedidos com problemas ignorados: {descartados} de {len(pedidos)}")
+
+            values = valores_para_carga(df)
+
             if not values:
                 logger.warning("Nenhum pedido válido para processar após validação")
                 return
 
-            # Construir cláusula UPDATE com tratamento especial para colunas críticas
-            update_cols = []
-            for col in colunas:
-                if col not in colunas_imutaveis:
-                    if col in colunas_criticas:
-                        # Para colunas críticas, sempre atualizar (mesmo que seja NULL)
-                        update_cols.append(f"{col} = EXCLUDED.{col}")
-                    else:
-                        # Para outras colunas, só atualizar se o novo valor não for NULL
-                        update_cols.append(f"{col} = COALESCE(EXCLUDED.{col}, pedidos.{col})")
-
             # Template para execute_values
             insert_template = f"""
                 INSERT INTO pedidos ({', '.join(colunas)})
                 VALUES %s
                 ON CONFLICT (CodigoPedido)
                 DO UPDATE SET
-                    {', '.join(update_cols)}
+                    {', '.join(self._montar_update_cols())}
             """
 
             # PROCESSAMENTO EM LOTES MENORES COM CONTROLE DE TRANSAÇÃO
@@ -515,15 +389,207 @@ class Banco():
             logger.error(f"Erro inesperado ao inserir/atualizar pedidos: {str(e)}")
             raise
 
+    def _montar_update_cols(self):
+        """Cláusula SET do ON CONFLICT (pré-calculada no esquema a partir das colunas imutáveis e críticas)"""
+        return PEDIDOS.set_upsert
+
+    def _preparar_dataframe(self, pedidos, deduplicar=True):
+        """
+        Reordena as colunas, aplica a normalização de texto (se o tratamento ainda
+        não aplicou) e descarta pedidos sem código. Usado pelos dois modos de carga.
+        """
+        df = pedidos if hasattr(pedidos, 'to_dict') else pd.DataFrame(list(pedidos))
+        normalizado = df.attrs.get('normalizado', False)
+        df = df.reindex(columns=self.COLUNAS_PEDIDOS)
+        if not normalizado:
+            df = normalizar_texto(df, self.LIMITES_TEXTO)
+
+        # Pedidos sem código são descartados
+        validos = df["CodigoPedido"].notna()
+        descartados = int((~validos).sum())
+        df = df[validos]
+
+        # Um mesmo pedido só pode aparecer uma vez no merge; mantém a última ocorrência
+        duplicados = int(df.duplicated("CodigoPedido", keep="last").sum()) if deduplicar else 0
+        if duplicados:
+            logger.warning(f"{duplicados} linhas duplicadas de CodigoPedido removidas (mantida a última)")
+            df = df.drop_duplicates("CodigoPedido", keep="last")
+
+        return df, descartados
+
+    def _inserir_pedidos_copy(self, pedidos):
+        """
+        Carrega os pedidos via COPY FROM STDIN em uma tabela de staging temporária
+        e aplica um único INSERT ... SELECT ... ON CONFLICT (CodigoPedido).
+
+        Retorna o mesmo dicionário de estatísticas do modo em lotes. Em caso de erro
+        no merge (ex.: valor excedendo o tamanho da coluna), recai para o modo em lotes,
+        que isola os registros problemáticos.
+        """
+        import time
+
+        if pedidos is None or len(pedidos) == 0:
+            logger.warning("Nenhum pedido para processar")
+            return
+
+        colunas = self.COLUNAS_PEDIDOS
+        df, descartados = self._preparar_dataframe(pedidos)
+
+        logger.info(f"=== PROCESSAMENTO VIA COPY INICIADO - {len(df)} pedidos ===")
+        if descartados:
+            logger.warning(f"Pedidos com problemas ignorados: {descartados} de {len(pedidos)}")
+
+        if df.empty:
+            logger.warning("Nenhum pedido válido para processar após validação")
+            return
+
+        merge_query = f"""
+            INSERT INTO pedidos ({', '.join(colunas)})
+            SELECT {', '.join(colunas)} FROM tmp_pedidos_carga
+            ON CONFLICT (CodigoPedido)
+            DO UPDATE SET
+                {', '.join(self._montar_update_cols())}
+        """
+
+        conn = self.engine.raw_connection()
+        conn.autocommit = False
+        cursor = conn.cursor()
+        start_time = time.time()
+
+        try:
+            self._otimizar_transacao(conn, cursor)
+
+            # Tabelas temporárias não geram WAL (equivalente a UNLOGGED) e somem no commit
+            cursor.execute("""
+                CREATE TEMP TABLE tmp_pedidos_carga
+                (LIKE pedidos INCLUDING DEFAULTS)
+                ON COMMIT DROP
+            """)
+
+            copy_start = time.time()
+            copiar_dataframe(cursor, df, "tmp_pedidos_carga", colunas)
+            logger.info(f"Staging carregada em {time.time() - copy_start:.2f}s")
+
+            merge_start = time.time()
+            cursor.execute(merge_query)
+            total_atualizados = cursor.rowcount
+            logger.info(f"Merge concluído em {time.time() - merge_start:.2f}s")
+
+            conn.commit()
+
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Erro na carga via COPY: {str(e)}")
+            logger.warning("Recaindo para o processamento em lotes para isolar os registros com erro")
+            cursor.close()
+            conn.close()
+            return self.inserirPedidos(df, modo='lotes')
+
+        cursor.close()
+        conn.close()
+
+        total_time = time.time() - start_time
+        total_values = len(df)
+
+        logger.info(f"=== PROCESSAMENTO VIA COPY CONCLUÍDO ===")
+        logger.info(f"Total de registros: {total_values}")
+        logger.info(f"Registros afetados no banco: {total_atualizados}")
+        logger.info(f"Tempo total: {total_time:.2f} segundos")
+        logger.info(f"Média: {total_values/max(total_time, 1e-6):.1f} registros/segundo")
+
+        return {
+            'total_valores': total_values,
+            'processados': total_values,
+            'afetados': total_atualizados,
+            'tempo': total_time,
+            'erros': 0
+        }
+
+    def filtrar_pedidos_alterados(self, pedidos):
+        """
+        Compara o digest de cada pedido com o último digest gravado e mantém
+        apenas os pedidos novos ou alterados.
+
+        Returns:
+            tuple: (df_alterados, hashes_alterados, quantidade_inalterados)
+        """
+        if pedidos is None or len(pedidos) == 0:
+            return pedidos, pd.Series(dtype='int64'), 0
+
+        hashes = calcular_hash_linhas(pedidos, self.COLUNAS_PEDIDOS)
+        codigos = pedidos['CodigoPedido']
+
+        with conexao_raw(self.engine) as (conn, cursor):
+            cursor.execute(
+                "SELECT CodigoPedido, HashConteudo FROM pedidos_hash WHERE CodigoPedido = ANY(%s)",
+                (codigos.dropna().astype(str).unique().tolist(),)
+            )
+            existentes = dict(cursor.fetchall())
+
+        hash_anterior = codigos.map(existentes)
+        inalterados = hash_anterior.notna() & (hash_anterior == hashes)
+        quantidade_inalterados = int(inalterados.sum())
+
+        logger.info(
+            f"Detecção de alterações: {len(pedidos) - quantidade_inalterados} novos/alterados, "
+            f"{quantidade_inalterados} inalterados (ignorados)"
+        )
+        return pedidos[~inalterados], hashes[~inalterados], quantidade_inalterados
+
+    def registrar_hashes(self, pedidos, hashes):
+        """Grava (upsert) o digest dos pedidos carregados com sucesso"""
+        if pedidos is None or len(pedidos) == 0:
+            return
+
+        df_hash = pd.DataFrame({
+            'CodigoPedido': pedidos['CodigoPedido'].astype(str),
+            'HashConteudo': hashes.loc[pedidos.index]
+        }).drop_duplicates('CodigoPedido', keep='last')
+
+        with conexao_raw(self.engine) as (conn, cursor):
+            try:
+                cursor.execute("""
+                    CREATE TEMP TABLE tmp_pedidos_hash (
+                        CodigoPedido varchar(30),
+                        HashConteudo BIGINT
+                    ) ON COMMIT DROP
+                """)
+                copiar_dataframe(cursor, df_hash, "tmp_pedidos_hash", ['CodigoPedido', 'HashConteudo'])
+                # Só registra pedidos que de fato existem na tabela principal
+                cursor.execute("""
+                    INSERT INTO pedidos_hash (CodigoPedido, HashConteudo)
+                    SELECT t.CodigoPedido, t.HashConteudo
+                    FROM tmp_pedidos_hash t
+                    JOIN pedidos p ON p.CodigoPedido = t.CodigoPedido
+                    ON CONFLICT (CodigoPedido)
+                    DO UPDATE SET HashConteudo = EXCLUDED.HashConteudo, AtualizadoEm = now()
+                """)
+                registrados = cursor.rowcount
+                conn.commit()
+                logger.info(f"Digests registrados: {registrados}")
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Erro ao registrar digests dos pedidos: {e}")
+
+    def invalidar_hashes(self, codigos):
+        """Remove o digest dos pedidos alterados fora da carga normal (ex.: cancelamentos)"""
+        if not codigos:
+            return
+        with conexao_raw(self.engine) as (conn, cursor):
+            try:
+                cursor.execute("DELETE FROM pedidos_hash WHERE CodigoPedido = ANY(%s)", (list(codigos),))
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                logger.warning(f"Erro ao invalidar digests: {e}")
+
     def _processar_em_lotes(self, values, insert_template, colunas):
         """Processa os dados em lotes menores com controle individual de transações"""
         from psycopg2.extras import execute_values
         import time
         
-        # Configurações de lote otimizadas
-        BATCH_SIZE = 100  # Lotes menores para melhor controle
-        COMMIT_EVERY = 5   # Commit a cada 5 lotes
-        SLEEP_TIME = 0.1   # Pequena pausa entre lotes para não sobrecarregar
+        # Tamanho do lote e cadência de commit ajustados pela latência (PEDIDOS_LOTE_* / PEDIDOS_COMMIT_*)
+        controlador = ControladorLotes.do_ambiente('PEDIDOS', tamanho_inicial=100)
         
         total_values = len(values)
         total_processados = 0
@@ -531,7 +597,7 @@ class Banco():
         lotes_processados = 0
         erros = []
         
-        logger.info(f"Iniciando processamento em lotes: {total_values} registros, lotes de {BATCH_SIZE}")
+        logger.info(f"Iniciando processamento em lotes: {total_values} registros, lote inicial de {controlador.tamanho}")
         
         conn = self.engine.raw_connection()
         
@@ -540,41 +606,51 @@ class Banco():
         cursor = conn.cursor()
         
         try:
-            # Configurações do PostgreSQL para otimizar performance (apenas as que podem ser alteradas em sessão)
-            try:
-                cursor.execute("SET synchronous_commit = OFF")
-                cursor.execute("SET commit_delay = 0")
-                cursor.execute("SET work_mem = '256MB'")  # Aumenta memória para operações
-            except Exception as e:
-                logger.warning(f"Algumas otimizações não puderam ser aplicadas: {e}")
+            # Configurações do PostgreSQL para otimizar performance, reaplicadas a cada transação
+            otimizar = self._otimizar_transacao(conn, cursor)
             
             start_time = time.time()
+
+            def executar_lote(cur, registros):
+                execute_values(
+                    cur, 
+                    insert_template, 
+                    registros, 
+                    template=None,
+                    page_size=len(registros)
+                )
+                return cur.rowcount
             
-            for i in range(0, total_values, BATCH_SIZE):
+            i = 0
+            while i < total_values:
+                batch = values[i:i + controlador.tamanho]
                 try:
-                    batch = values[i:i + BATCH_SIZE]
                     batch_start = time.time()
                     
-                    # Processar lote
-                    execute_values(
-                        cursor, 
-                        insert_template, 
-                        batch, 
-                        template=None,
-                        page_size=BATCH_SIZE
+                    # Processar lote (se falhar, isola os registros com erro por bisseção)
+                    resultado_lote = self._executar_lote_isolando_erros(
+                        cursor, batch, executar_lote, 'pedidos', indice_codigo=0, batch_start_index=i
                     )
                     
-                    rows_affected_batch = cursor.rowcount
+                    rows_affected_batch = resultado_lote['afetados']
                     total_atualizados += rows_affected_batch
-                    total_processados += len(batch)
+                    total_processados += resultado_lote['sucessos']
                     lotes_processados += 1
+                    if resultado_lote['rejeitados']:
+                        erros.append(f"Lote {lotes_processados} (registros {i}-{i+len(batch)}): "
+                                     f"{len(resultado_lote['rejeitados'])} registros rejeitados")
                     
                     batch_time = time.time() - batch_start
+                    controlador.registrar(len(batch), batch_time, rows_affected_batch)
                     
-                    # Commit a cada X lotes ou no final
-                    if lotes_processados % COMMIT_EVERY == 0 or i + BATCH_SIZE >= total_values:
+                    # Commit quando a transação atinge o tempo alvo ou no final
+                    if controlador.deve_commitar() or i + len(batch) >= total_values:
                         conn.commit()
-                        logger.info(f"Lote {lotes_processados}: {len(batch)} registros, {rows_affected_batch} afetados, tempo: {batch_time:.2f}s")
+                        controlador.commitado()
+                        if otimizar and i + len(batch) < total_values:
+                            otimizar = self._otimizar_transacao(conn, cursor)
+                        logger.info(f"Lote {lotes_processados}: {len(batch)} registros, {rows_affected_batch} afetados, "
+                                    f"tempo: {batch_time:.2f}s ({controlador.resumo()})")
                     
                     # Log detalhado a cada 10 lotes
                     if lotes_processados % 10 == 0:
@@ -586,26 +662,23 @@ class Banco():
                         logger.info(f"Progresso: {progress:.1f}% ({total_processados}/{total_values}) "
                                 f"- Tempo decorrido: {elapsed:.1f}s - ETA: {eta:.1f}s")
                     
-                    # Verificar alguns registros do lote para debug
-                    if lotes_processados <= 3:  # Só nos primeiros 3 lotes
-                        self._verificar_lote_debug(cursor, batch, colunas, lotes_processados)
-                    
-                    # Pequena pausa para não sobrecarregar o banco
-                    if SLEEP_TIME > 0:
-                        time.sleep(SLEEP_TIME)
+                    # Pausa só quando a latência degrada (backpressure)
+                    pausa = controlador.pausa()
+                    if pausa > 0:
+                        logger.info(f"Latência degradada, aguardando {pausa:.2f}s antes do próximo lote")
+                        time.sleep(pausa)
                         
                 except Exception as e:
-                    # Log do erro mas continua processando
+                    # Erro fora dos registros (ex.: conexão): descarta a transação e continua
                     erro_msg = f"Erro no lote {lotes_processados + 1} (registros {i}-{i+len(batch)}): {str(e)}"
                     logger.error(erro_msg)
                     erros.append(erro_msg)
-                    
-                    # Rollback apenas este lote e continua
                     conn.rollback()
-                    
-                    # Tentar processar registros individualmente neste lote com erro
-                    sucessos_individuais = self._processar_individualmente(cursor, conn, batch, insert_template, i)
-                    total_processados += sucessos_individuais
+                    controlador.commitado()
+                    if otimizar and not conn.closed:
+                        otimizar = self._otimizar_transacao(conn, cursor)
+                finally:
+                    i += len(batch)
                     
             # Commit final se necessário
             if not conn.closed:
@@ -642,106 +715,171 @@ class Banco():
             cursor.close()
             conn.close()
 
-    def _processar_individualmente(self, cursor, conn, batch, insert_template, batch_start_index):
-        """Processa registros individualmente quando um lote falha"""
-        sucessos = 0
-        
-        logger.info(f"Processando {len(batch)} registros individualmente devido a erro no lote...")
-        
-        # ✅ CORRIGIR: Criar template correto para INSERT individual
-        placeholders = ', '.join(['%s'] * len(batch[0])) if batch else ''
-        
-        # Extrair a parte base do INSERT (remover o VALUES %s do execute_values)
-        base_insert = insert_template.split('VALUES %s')[0] + f"VALUES ({placeholders})"
-        
-        # Manter a cláusula ON CONFLICT se existir
-        if 'ON CONFLICT' in insert_template:
-            conflict_part = insert_template.split('VALUES %s')[1]
-            single_template = base_insert + conflict_part
-        else:
-            single_template = base_insert
-        
-        for j, record in enumerate(batch):
-            try:
-                # ✅ Agora sim, executar com o template correto
-                cursor.execute(single_template, record)
-                conn.commit()
-                sucessos += 1
-                
-            except Exception as e:
-                logger.error(f"Erro no registro individual {batch_start_index + j} (CodigoPedido: {record[0]}): {str(e)}")
-                conn.rollback()
-        
-        logger.info(f"Processamento individual: {sucessos}/{len(batch)} sucessos")
-        return sucessos
+    @staticmethod
+    def _otimizar_transacao(conn, cursor):
+        """
+        Ajustes de desempenho da carga só para a transação atual (SET LOCAL): a
+        conexão volta ao pool compartilhado, e um SET de sessão valeria também
+        para as cargas seguintes que a pegassem. Retorna False se não puderem ser aplicados.
+        """
+        try:
+            cursor.execute("SET LOCAL synchronous_commit = OFF")
+            cursor.execute("SET LOCAL work_mem = '256MB'")  # Aumenta memória para operações
+            return True
+        except Exception as e:
+            logger.warning(f"Algumas otimizações não puderam ser aplicadas: {e}")
+            conn.rollback()
+            return False
 
-    def _verificar_lote_debug(self, cursor, batch, colunas, lote_num):
-        """Verifica alguns registros do lote para debug"""
+    def _executar_lote_isolando_erros(self, cursor, batch, executar, origem, indice_codigo, batch_start_index):
+        """
+        Executa o lote com bisseção por savepoints (ver bissecao_utils) e envia os
+        registros rejeitados para o dead-letter.
+        """
+        resultado = executar_com_bissecao(cursor, executar, batch)
+        rejeitados = resultado['rejeitados']
+        if rejeitados:
+            logger.error(f"Lote a partir do registro {batch_start_index}: "
+                         f"{len(rejeitados)}/{len(batch)} registros rejeitados")
+            for registro, erro in rejeitados[:3]:
+                logger.error(f"  CodigoPedido {registro[indice_codigo]}: {erro}")
+            self._registrar_rejeitados(origem, rejeitados, indice_codigo)
+        return resultado
+
+    def _registrar_rejeitados(self, origem, rejeitados, indice_codigo=0):
+        """Grava os rejeitados em cargas_rejeitadas (conexão própria); se falhar, em arquivo JSONL"""
+        linhas = [
+            (origem, registro[indice_codigo], json.dumps(list(registro), default=str, ensure_ascii=False), erro)
+            for registro, erro in rejeitados
+        ]
         try:
-            if not batch:
-                return
-                
-            # Pegar alguns códigos do lote para verificar
-            codigos_para_verificar = [record[0] for record in batch[:3]]  # Primeiros 3
-            situacao_index = colunas.index("SituacaoComercial")
-            
-            logger.info(f"=== DEBUG LOTE {lote_num} ===")
-            
-            for i, codigo in enumerate(codigos_para_verificar):
-                # Situação enviada
-                situacao_enviada = batch[i][situacao_index]
-                
-                # Situação no banco
-                cursor.execute(
-                    "SELECT SituacaoComercial FROM pedidos WHERE CodigoPedido = %s",
-                    (codigo,)
+            with conexao_raw(self.engine) as (conn, cursor):
+                execute_values(
+                    cursor,
+                    "INSERT INTO cargas_rejeitadas (Origem, CodigoPedido, Registro, Erro) VALUES %s",
+                    linhas
                 )
-                resultado = cursor.fetchone()
-                situacao_banco = resultado[0] if resultado else "NÃO ENCONTRADO"
-                
-                status = "✓ OK" if situacao_enviada == situacao_banco else "✗ DIFERENTE"
-                logger.info(f"  {codigo}: Enviado='{situacao_enviada}' | Banco='{situacao_banco}' | {status}")
-                
+                conn.commit()
+            logger.warning(f"{len(linhas)} registros rejeitados gravados em cargas_rejeitadas")
         except Exception as e:
-            logger.warning(f"Erro na verificação de debug do lote {lote_num}: {e}")
+            logger.error(f"Erro ao gravar rejeitados no banco ({e}); gravando em arquivo")
+            gravar_rejeitados_arquivo(origem, rejeitados, indice_codigo)
+
+    def verificar_carga(self, pedidos, limite_log=10):
+        """
+        Confere a carga inteira contra o banco em uma única consulta (staging + LEFT JOIN),
+        usando uma conexão própria do pool, fora da transação de escrita.
+
+        Args:
+            pedidos: DataFrame enviado na carga
+            limite_log: Quantidade de divergências de cada tipo listadas no log
+
+        Returns:
+            dict: {'verificados', 'corretos', 'ausentes', 'situacao_nula', 'situacao_divergente'},
+                com as três últimas chaves sendo listas de dicts por pedido
+        """
+        relatorio = {'verificados': 0, 'corretos': 0, 'ausentes': [], 'situacao_nula': [], 'situacao_divergente': []}
+        if pedidos is None or len(pedidos) == 0:
+            return relatorio
+
+        # Mesma normalização aplicada na carga, para comparar o que de fato foi enviado
+        colunas = ["CodigoPedido", "SituacaoComercial", "DetalheSituacaoComercial"]
+        esperado, _ = self._preparar_dataframe(pedidos)
+        esperado = esperado[colunas]
+
+        try:
+            with conexao_raw(self.engine) as (conn, cursor):
+                cursor.execute(f"""
+                    CREATE TEMP TABLE tmp_verificacao ON COMMIT DROP AS
+                    SELECT {', '.join(colunas)} FROM pedidos WITH NO DATA
+                """)
+                copiar_dataframe(cursor, esperado, "tmp_verificacao", colunas)
+                cursor.execute("""
+                    SELECT t.CodigoPedido,
+                           CASE
+                               WHEN p.CodigoPedido IS NULL THEN 'ausentes'
+                               WHEN p.SituacaoComercial IS NULL AND t.SituacaoComercial IS NOT NULL THEN 'situacao_nula'
+                               ELSE 'situacao_divergente'
+                           END AS tipo,
+                           t.SituacaoComercial, p.SituacaoComercial,
+                           t.DetalheSituacaoComercial, p.DetalheSituacaoComercial
+                    FROM tmp_verificacao t
+                    LEFT JOIN pedidos p ON p.CodigoPedido = t.CodigoPedido
+                    WHERE p.CodigoPedido IS NULL
+                       OR p.SituacaoComercial IS DISTINCT FROM t.SituacaoComercial
+                       OR p.DetalheSituacaoComercial IS DISTINCT FROM t.DetalheSituacaoComercial
+                """)
+                divergencias = cursor.fetchall()
+                conn.commit()
+        except Exception as e:
+            logger.error(f"Erro na verificação da carga: {e}")
+            return None
+
+        for codigo, tipo, situacao_enviada, situacao_banco, detalhe_enviado, detalhe_banco in divergencias:
+            relatorio[tipo].append({
+                'CodigoPedido': codigo,
+                'SituacaoEnviada': situacao_enviada,
+                'SituacaoBanco': situacao_banco,
+                'DetalheEnviado': detalhe_enviado,
+                'DetalheBanco': detalhe_banco
+            })
+        relatorio['verificados'] = len(esperado)
+        relatorio['corretos'] = len(esperado) - len(divergencias)
+
+        logger.info("=== VERIFICAÇÃO DA CARGA ===")
+        logger.info(f"Verificados: {relatorio['verificados']} | Corretos: {relatorio['corretos']} | "
+                    f"Ausentes: {len(relatorio['ausentes'])} | Situação NULL: {len(relatorio['situacao_nula'])} | "
+                    f"Situação divergente: {len(relatorio['situacao_divergente'])}")
+        for tipo in ('ausentes', 'situacao_nula', 'situacao_divergente'):
+            for item in relatorio[tipo][:limite_log]:
+                logger.warning(f"  [{tipo}] {item['CodigoPedido']}: Enviado='{item['SituacaoEnviada']}' | "
+                               f"Banco='{item['SituacaoBanco']}'")
+        return relatorio
 
     def verificar_pedidos_nao_atualizados(self, codigos_esperados):
-        """Verifica quais pedidos não foram atualizados corretamente"""
+        """Verifica, em uma única consulta, quais pedidos não estão no banco ou estão sem situação"""
         try:
-            conn = self.engine.raw_connection()
-            cursor = conn.cursor()
-            
-            problemas = []
-            
-            for codigo in codigos_esperados[:10]:  # Verificar apenas os primeiros 10
+            codigos = [str(c) for c in codigos_esperados if c]
+            if not codigos:
+                return
+
+            with conexao_raw(self.engine) as (conn, cursor):
                 cursor.execute(
-                    "SELECT CodigoPedido, SituacaoComercial, DetalheSituacaoComercial FROM pedidos WHERE CodigoPedido = %s",
-                    (codigo,)
+                    "SELECT CodigoPedido, SituacaoComercial FROM pedidos WHERE CodigoPedido = ANY(%s)",
+                    (codigos,)
                 )
-                resultado = cursor.fetchone()
-                
-                if not resultado:
-                    problemas.append(f"{codigo}: NÃO ENCONTRADO")
-                elif not resultado[1]:  # SituacaoComercial é NULL
-                    problemas.append(f"{codigo}: SituacaoComercial é NULL")
-                    
-            if problemas:
-                logger.warning("Pedidos com problemas detectados:")
-                for problema in problemas:
-                    logger.warning(f"  {problema}")
+                encontrados = dict(cursor.fetchall())
+
+            problemas = {
+                'ausentes': [c for c in codigos if c not in encontrados],
+                'situacao_nula': [c for c, situacao in encontrados.items() if not situacao]
+            }
+
+            if problemas['ausentes'] or problemas['situacao_nula']:
+                logger.warning(f"Pedidos com problemas detectados: {len(problemas['ausentes'])} não encontrados, "
+                               f"{len(problemas['situacao_nula'])} com SituacaoComercial NULL")
+                for codigo in problemas['ausentes'][:10]:
+                    logger.warning(f"  {codigo}: NÃO ENCONTRADO")
+                for codigo in problemas['situacao_nula'][:10]:
+                    logger.warning(f"  {codigo}: SituacaoComercial é NULL")
             else:
                 logger.info("Verificação OK - todos os pedidos verificados estão corretos")
-                
-            cursor.close()
-            conn.close()
-            
+
+            return problemas
+
         except Exception as e:
             logger.error(f"Erro na verificação de pedidos não atualizados: {e}")
             
-    def inserirPedidosCancelados(self, pedidos_cancelados):
+    def inserirPedidosCancelados(self, pedidos_cancelados, modo='lotes'):
         """
         Processa pedidos cancelados - atualiza apenas a situação comercial
         para marcar como cancelado no banco de dados
+
+        Args:
+            pedidos_cancelados: DataFrame ou lista de dicts com os cancelados
+            modo: 'lotes' (UPDATE por pedido via execute_batch) ou 'copy'
+                (COPY para staging + um único UPDATE ... FROM, com contagens
+                de encontrados/não encontrados/já cancelados feitas no servidor)
         """
         try:
             if hasattr(pedidos_cancelados, 'to_dict'):
@@ -807,7 +945,15 @@ class Banco():
                 WHERE CodigoPedido = %s
             """
 
-            return self._processar_cancelados_em_lotes(values, update_query)
+            if modo == 'copy':
+                resultado = self._processar_cancelados_copy(values, update_query)
+            else:
+                resultado = self._processar_cancelados_em_lotes(values, update_query)
+
+            # O conteúdo no banco deixou de refletir o último digest enviado
+            self.invalidar_hashes([v[2] for v in values])
+
+            return resultado
 
         except Exception as e:
             logger.error(f"Erro inesperado ao processar pedidos cancelados: {str(e)}")
@@ -818,9 +964,8 @@ class Banco():
         import time
         from psycopg2.extras import execute_batch  # Mais eficiente para UPDATEs
         
-        BATCH_SIZE = 200  # Lotes maiores pois são apenas UPDATEs
-        COMMIT_EVERY = 10
-        SLEEP_TIME = 0.05
+        # Lotes maiores pois são apenas UPDATEs (CANCELADOS_LOTE_* / CANCELADOS_COMMIT_*)
+        controlador = ControladorLotes.do_ambiente('CANCELADOS', tamanho_inicial=200)
         
         total_values = len(values)
         total_processados = 0
@@ -828,54 +973,73 @@ class Banco():
         lotes_processados = 0
         erros = []
         
-        logger.info(f"Processando {total_values} cancelamentos em lotes de {BATCH_SIZE}")
+        logger.info(f"Processando {total_values} cancelamentos, lote inicial de {controlador.tamanho}")
         
         conn = self.engine.raw_connection()
         conn.autocommit = False
         cursor = conn.cursor()
         
         try:
+            # Ajustes de desempenho só da transação (SET LOCAL), reaplicados a cada commit
+            otimizar = self._otimizar_transacao(conn, cursor)
+
             start_time = time.time()
+
+            def executar_lote(cur, registros):
+                # Usar execute_batch que é mais eficiente para UPDATEs
+                execute_batch(cur, update_query, registros, page_size=len(registros))
+                return cur.rowcount
             
-            for i in range(0, total_values, BATCH_SIZE):
+            i = 0
+            while i < total_values:
+                batch = values[i:i + controlador.tamanho]
                 try:
-                    batch = values[i:i + BATCH_SIZE]
                     batch_start = time.time()
                     
-                    # Usar execute_batch que é mais eficiente para UPDATEs
-                    execute_batch(cursor, update_query, batch, page_size=BATCH_SIZE)
+                    resultado_lote = self._executar_lote_isolando_erros(
+                        cursor, batch, executar_lote, 'pedidos_cancelados', indice_codigo=2, batch_start_index=i
+                    )
                     
-                    rows_affected_batch = cursor.rowcount
+                    rows_affected_batch = resultado_lote['afetados']
                     total_atualizados += rows_affected_batch
-                    total_processados += len(batch)
+                    total_processados += resultado_lote['sucessos']
                     lotes_processados += 1
+                    if resultado_lote['rejeitados']:
+                        erros.append(f"Lote cancelados {lotes_processados} (registros {i}-{i+len(batch)}): "
+                                     f"{len(resultado_lote['rejeitados'])} registros rejeitados")
                     
                     batch_time = time.time() - batch_start
+                    controlador.registrar(len(batch), batch_time, rows_affected_batch)
                     
-                    # Commit regular
-                    if lotes_processados % COMMIT_EVERY == 0 or i + BATCH_SIZE >= total_values:
+                    # Commit quando a transação atinge o tempo alvo ou no final
+                    if controlador.deve_commitar() or i + len(batch) >= total_values:
                         conn.commit()
-                        logger.info(f"Lote cancelados {lotes_processados}: {len(batch)} registros, {rows_affected_batch} linhas afetadas, tempo: {batch_time:.2f}s")
+                        controlador.commitado()
+                        if otimizar and i + len(batch) < total_values:
+                            otimizar = self._otimizar_transacao(conn, cursor)
+                        logger.info(f"Lote cancelados {lotes_processados}: {len(batch)} registros, {rows_affected_batch} linhas afetadas, "
+                                    f"tempo: {batch_time:.2f}s ({controlador.resumo()})")
                     
                     # Log de progresso
                     if lotes_processados % 5 == 0:
                         progresso = (total_processados / total_values) * 100
                         logger.info(f"Progresso cancelados: {progresso:.1f}% ({total_processados}/{total_values})")
                     
-                    # Pequena pausa
-                    if SLEEP_TIME > 0:
-                        time.sleep(SLEEP_TIME)
+                    # Pausa só quando a latência degrada (backpressure)
+                    pausa = controlador.pausa()
+                    if pausa > 0:
+                        time.sleep(pausa)
                         
                 except Exception as e:
                     erro_msg = f"Erro no lote cancelados {lotes_processados + 1} (registros {i}-{i+len(batch)}): {str(e)}"
                     logger.error(erro_msg)
                     erros.append(erro_msg)
-                    
                     conn.rollback()
-                    
-                    # Tentar processar individualmente
-                    sucessos_individuais = self._processar_cancelados_individualmente(cursor, conn, batch, update_query, i)
-                    total_processados += sucessos_individuais
+                    controlador.commitado()
+                    if otimizar and not conn.closed:
+                        otimizar = self._otimizar_transacao(conn, cursor)
+                finally:
+                    i += len(batch)
             
             # Commit final
             if not conn.closed:
@@ -914,29 +1078,97 @@ class Banco():
             cursor.close()
             conn.close()
 
-    def _processar_cancelados_individualmente(self, cursor, conn, batch, update_query, batch_start_index):
-        """Processa cancelamentos individualmente quando um lote falha"""
-        sucessos = 0
-        
-        logger.info(f"Processando {len(batch)} cancelamentos individualmente...")
-        
-        for j, record in enumerate(batch):
-            try:
-                cursor.execute(update_query, record)
-                conn.commit()
-                sucessos += 1
-                
-                # Log a cada 50 registros para não poluir
-                if (j + 1) % 50 == 0:
-                    logger.info(f"  Cancelamentos individuais: {j + 1}/{len(batch)}")
-                    
-            except Exception as e:
-                codigo_pedido = record[4] if len(record) > 4 else "N/A"
-                logger.error(f"Erro no cancelamento individual {batch_start_index + j} (Pedido: {codigo_pedido}): {str(e)}")
-                conn.rollback()
-        
-        logger.info(f"Cancelamentos individuais: {sucessos}/{len(batch)} sucessos")
-        return sucessos
+    def _processar_cancelados_copy(self, values, update_query):
+        """
+        Aplica os cancelamentos de uma vez: COPY de (CodigoPedido, SituacaoComercial,
+        DetalheSituacaoComercial) para uma tabela temporária e um único UPDATE ... FROM.
+
+        As contagens de encontrados, não encontrados e já cancelados são calculadas
+        no servidor, dispensando a verificação por amostra. Em caso de erro recai
+        para o processamento em lotes.
+        """
+        import time
+
+        df = pd.DataFrame(values, columns=["SituacaoComercial", "DetalheSituacaoComercial", "CodigoPedido"])
+        df["CodigoPedido"] = df["CodigoPedido"].astype(str)
+        # Um pedido só pode ser atualizado uma vez pelo UPDATE ... FROM; mantém a última ocorrência
+        df = df.drop_duplicates("CodigoPedido", keep="last")
+        colunas = ["CodigoPedido", "SituacaoComercial", "DetalheSituacaoComercial"]
+
+        logger.info(f"Processando {len(df)} cancelamentos via COPY")
+
+        conn = self.engine.raw_connection()
+        conn.autocommit = False
+        cursor = conn.cursor()
+        start_time = time.time()
+
+        try:
+            cursor.execute(f"""
+                CREATE TEMP TABLE tmp_cancelados ON COMMIT DROP AS
+                SELECT {', '.join(colunas)} FROM pedidos WITH NO DATA
+            """)
+            copiar_dataframe(cursor, df, "tmp_cancelados", colunas)
+
+            # Situação anterior ao UPDATE, calculada no servidor
+            cursor.execute("""
+                SELECT
+                    COUNT(p.CodigoPedido),
+                    COUNT(*) FILTER (WHERE p.CodigoPedido IS NULL),
+                    COUNT(*) FILTER (WHERE LOWER(p.SituacaoComercial) LIKE '%cancel%'),
+                    (ARRAY_AGG(t.CodigoPedido) FILTER (WHERE p.CodigoPedido IS NULL))[1:10]
+                FROM tmp_cancelados t
+                LEFT JOIN pedidos p ON p.CodigoPedido = t.CodigoPedido
+            """)
+            encontrados, nao_encontrados, ja_cancelados, amostra_nao_encontrados = cursor.fetchone()
+
+            # Só reescreve as linhas que de fato mudam
+            cursor.execute("""
+                UPDATE pedidos p
+                SET SituacaoComercial = t.SituacaoComercial,
+                    DetalheSituacaoComercial = t.DetalheSituacaoComercial
+                FROM tmp_cancelados t
+                WHERE p.CodigoPedido = t.CodigoPedido
+                AND (p.SituacaoComercial IS DISTINCT FROM t.SituacaoComercial
+                     OR p.DetalheSituacaoComercial IS DISTINCT FROM t.DetalheSituacaoComercial)
+            """)
+            total_atualizados = cursor.rowcount
+
+            conn.commit()
+
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Erro nos cancelamentos via COPY: {str(e)}")
+            logger.warning("Recaindo para o processamento de cancelados em lotes")
+            cursor.close()
+            conn.close()
+            return self._processar_cancelados_em_lotes(values, update_query)
+
+        cursor.close()
+        conn.close()
+
+        total_time = time.time() - start_time
+        total_values = len(df)
+
+        logger.info(f"=== PROCESSAMENTO DE CANCELADOS VIA COPY CONCLUÍDO ===")
+        logger.info(f"Total de pedidos cancelados: {total_values}")
+        logger.info(f"Encontrados no banco: {encontrados} (já cancelados antes: {ja_cancelados})")
+        logger.info(f"Linhas atualizadas no banco: {total_atualizados}")
+        logger.info(f"Tempo total: {total_time:.2f} segundos")
+        if nao_encontrados:
+            logger.warning(f"Pedidos não encontrados no banco: {nao_encontrados}. Amostra: {amostra_nao_encontrados}")
+
+        return {
+            'total_cancelados': total_values,
+            'processados': total_values,
+            'atualizados': total_atualizados,
+            'eficiencia': encontrados / total_values if total_values else 0,
+            'tempo': total_time,
+            'erros': 0,
+            'encontrados': encontrados,
+            'nao_encontrados': nao_encontrados,
+            'ja_cancelados': ja_cancelados,
+            'amostra_nao_encontrados': amostra_nao_encontrados or []
+        }
 
     def verificar_cancelamentos(self, codigos_cancelados):
         """Verifica se os pedidos cancelados foram atualizados corretamente"""
@@ -945,19 +1177,17 @@ class Banco():
                 logger.info("Nenhum código para verificar")
                 return
                 
-            conn = self.engine.raw_connection()
-            cursor = conn.cursor()
-            
             # Converter para tuple para a query IN
             codigos_tuple = tuple(codigos_cancelados[:100])  # Limitar a 100 para não sobrecarregar
             
-            cursor.execute("""
-                SELECT CodigoPedido, SituacaoComercial, DetalheSituacaoComercial
-                FROM pedidos 
-                WHERE CodigoPedido IN %s
-            """, (codigos_tuple,))
-            
-            resultados = cursor.fetchall()
+            with conexao_raw(self.engine) as (conn, cursor):
+                cursor.execute("""
+                    SELECT CodigoPedido, SituacaoComercial, DetalheSituacaoComercial
+                    FROM pedidos 
+                    WHERE CodigoPedido IN %s
+                """, (codigos_tuple,))
+                
+                resultados = cursor.fetchall()
             
             cancelados_corretos = []
             cancelados_problema = []
@@ -987,9 +1217,6 @@ class Banco():
                 for codigo in list(nao_encontrados)[:10]:
                     logger.warning(f"  {codigo}")
             
-            cursor.close()
-            conn.close()
-            
             return {
                 'verificados': len(resultados),
                 'corretos': len(cancelados_corretos),
@@ -1004,9 +1231,7 @@ class Banco():
     def verificarConsistencia(self, codigo_pedido):
         """Método para verificar se um pedido específico está correto no banco"""
         try:
-            conn = self.engine.raw_connection()
-            cursor = conn.cursor()
-            try:
+            with conexao_raw(self.engine) as (conn, cursor):
                 cursor.execute("""
                     SELECT CodigoPedido, SituacaoComercial, DetalheSituacaoComercial,
                         SituacaoFiscal, SituacaoIntegracaoExterna
@@ -1026,9 +1251,6 @@ class Banco():
                     logger.error(f"Pedido {codigo_pedido} não encontrado no banco!")
                     return None
                     
-            finally:
-                cursor.close()
-                conn.close()
                 
         except Exception as e:
             logger.error(f"Erro na verificação de consistência: {e}")
@@ -1058,41 +1280,29 @@ class Banco():
             if not codigos_pedidos:
                 return
                 
-            conn = self.engine.raw_connection()
-            cursor = conn.cursor()
-            try:
-                # Usar executemany para evitar problemas com placeholders
-                query = """
+            codigos = [str(c) for c in codigos_pedidos[:5]]  # Limitar a 5 para não spam no log
+            with conexao_raw(self.engine) as (conn, cursor):
+                cursor.execute("""
                     SELECT CodigoPedido, SituacaoComercial, DetalheSituacaoComercial
                     FROM pedidos 
-                    WHERE CodigoPedido = %s
-                    ORDER BY CodigoPedido
-                """
-                
-                logger.info("=== VERIFICAÇÃO DE DADOS APÓS INSERÇÃO ===")
-                for codigo in codigos_pedidos[:5]:  # Limitar a 5 para não spam no log
-                    cursor.execute(query, (codigo,))
-                    resultado = cursor.fetchone()
-                    if resultado:
-                        logger.info(f"CodigoPedido={resultado[0]}, SituacaoComercial='{resultado[1]}', DetalheSituacaoComercial='{resultado[2]}'")
-                    else:
-                        logger.warning(f"Pedido {codigo} não encontrado no banco")
-                    
-            finally:
-                cursor.close()
-                conn.close()
-                
+                    WHERE CodigoPedido = ANY(%s)
+                """, (codigos,))
+                resultados = {linha[0]: linha for linha in cursor.fetchall()}
+
+            logger.info("=== VERIFICAÇÃO DE DADOS APÓS INSERÇÃO ===")
+            for codigo in codigos:
+                resultado = resultados.get(codigo)
+                if resultado:
+                    logger.info(f"CodigoPedido={resultado[0]}, SituacaoComercial='{resultado[1]}', DetalheSituacaoComercial='{resultado[2]}'")
+                else:
+                    logger.warning(f"Pedido {codigo} não encontrado no banco")
+
         except Exception as e:
             logger.error(f"Erro na verificação pós-inserção: {e}")
 
         
     def fechar(self):
-        """Método para fechar o navegador"""
-        try:
-            if self.engine:
-                self.engine.dispose()
-        except Exception as e:
-            print(f"Erro ao fechar o navegador: {e}")
+        """Nada a liberar aqui: o engine é compartilhado (db_utils) e descartado só no fim do processo"""
     
     def consulta(self):
         try:
@@ -1106,14 +1316,33 @@ class Banco():
 
 class PegarGoogle():
     
-    def __init__(self):
+    def __init__(self, navegador=None):
+        """
+        Args:
+            navegador: PegarGoogle já aberto por outro script (ou o NavegadorRelatorios);
+                se informado, o driver, as esperas, a sessão e a pasta de downloads
+                dele são reaproveitados e nenhum Chrome novo é aberto
+        """
         logger.info("Inicializando PegarGoogle e o driver do Chrome...")
         self.driver = None
         self.wait = None
+        self.esperas = None
+        self.sessao = CacheSessao()
         self.data_formatada = None
         self.ciclo_1 = None
         self.ciclo_2 = None
-        
+
+        if navegador is not None:
+            # Reaproveita o navegador já aberto (e logado) em vez de abrir outro Chrome
+            self.driver = navegador.driver
+            self.wait = navegador.wait
+            self.esperas = navegador.esperas
+            self.sessao = navegador.sessao
+            self.download_dir = navegador.download_dir
+            self.vars = {}
+            self.ciclo = None
+            return
+
         # Diretório de download personalizado (portátil)
         base_dir = r"C:\Users\Administrator\Desktop"
         download_dir = os.path.join(base_dir, r'download_path_databse')
@@ -1163,6 +1392,8 @@ class PegarGoogle():
             # Configurar wait com timeout mais longo (120s)
             logger.info("Configurando WebDriverWait com timeout de 120 segundos")
             self.wait = WebDriverWait(self.driver, 120)
+            self.esperas = Esperas(self.driver, timeout=120)
+            self.esperas.instalar_monitor_rede()
             self.vars = {}
             
             # Maximizar a janela
@@ -1185,18 +1416,15 @@ class PegarGoogle():
         for tentativa in range(3):
             try:
                 logger.debug(f"Tentativa {tentativa + 1} de clicar no elemento: {valor}")
-                elemento = self.wait.until(
-                    EC.element_to_be_clickable((by, valor))
-                )
-                self.driver.execute_script("arguments[0].click();", elemento)
+                self.esperas.clicar(by, valor)
                 logger.info(f"Clique bem-sucedido no elemento: {valor}")
                 return True
             except Exception as e:
                 if tentativa == 2:  # última tentativa 
                     logger.error(f"Erro ao clicar no elemento {valor}: {e}")
                     raise
-                logger.warning(f"Tentativa {tentativa + 1} falhou, tentando novamente em 1 segundo... Erro: {str(e)[:100]}")
-                time.sleep(1)
+                logger.warning(f"Tentativa {tentativa + 1} falhou, tentando novamente após a página carregar... Erro: {str(e)[:100]}")
+                self.esperas.documento_pronto(timeout=10, exigir=False)
                 
     def _esperar_elemento(self, by, valor, timeout=30):
         """Função auxiliar para esperar elementos com retry"""
@@ -1204,19 +1432,21 @@ class PegarGoogle():
         for tentativa in range(3):
             try:
                 logger.debug(f"Tentativa {tentativa + 1} de localizar o elemento: {valor}")
-                elemento = self.wait.until(
-                    EC.presence_of_element_located((by, valor))
-                )
+                elemento = self.esperas.elemento(by, valor)
                 logger.info(f"Elemento localizado com sucesso: {valor}")
                 return elemento
             except Exception as e:
                 if tentativa == 2:  # última tentativa
                     logger.error(f"Erro ao esperar elemento {valor}: {e}")
                     raise
-                logger.warning(f"Tentativa {tentativa + 1} falhou, tentando novamente em 1 segundo... Erro: {str(e)[:100]}")
-                time.sleep(1)
+                logger.warning(f"Tentativa {tentativa + 1} falhou, tentando novamente após a página carregar... Erro: {str(e)[:100]}")
+                self.esperas.documento_pronto(timeout=10, exigir=False)
                 
     def entrar(self):
+        # Sessão salva por uma execução anterior: dispensa o login enquanto for válida
+        if self.sessao.restaurar(self.driver, self.esperas):
+            return True
+        
         try:
             self.driver.get("https://sgi.e-boticario.com.br/Paginas/Acesso/Entrar.aspx?ReturnUrl=%2f")
                 
@@ -1225,7 +1455,7 @@ class PegarGoogle():
             self.driver.click(r'#btnLoginExterno')
             print("entrou no site")
             
-            time.sleep(3)
+            self.esperas.elemento(By.CSS_SELECTOR, '#GoogleExchange', estado='clicavel')
             self.driver.click(r'#GoogleExchange')
             print("entrou no google")
             
@@ -1236,7 +1466,9 @@ class PegarGoogle():
             self.driver.type("#password > div.aCsJod.oJeWuf > div > div.Xb9hP > input", senha)
             self.driver.click("#passwordNext > div > button")
             print("Passando a senha")
-            time.sleep(10)
+            # Login concluído quando o menu do SGI estiver disponível
+            self.esperas.elemento(By.ID, 'menu-cod-1', estado='clicavel')
+            self.sessao.salvar(self.driver)
             return True
             
         except ValueError as e:
@@ -1247,7 +1479,7 @@ class PegarGoogle():
             logger.error(f"Erro ao fazer login: {str(e)}", exc_info=True)
             return False
             
-    def pegarPedidos(self):
+    def pegarPedidos(self, baixar=True):
         try:
             logger.info("Iniciando processo de busca e exportação de pedidos")
             ciclo = 1
@@ -1293,8 +1525,8 @@ class PegarGoogle():
             logger.info("Preenchendo data final")
             self._esperar_elemento(By.XPATH, r'//*[@id="ContentPlaceHolder1_ControleBuscaPedido_txtDataFim_Tb1"]').send_keys(fim_formatado)
             
-            logger.info("Aguardando 3 segundos para garantir que os filtros foram aplicados")
-            time.sleep(3)
+            logger.info("Aguardando a aplicação dos filtros")
+            self.esperas.postback_concluido()
 
             # Buscar e exportar
             logger.info("Iniciando busca de pedidos")
@@ -1306,8 +1538,12 @@ class PegarGoogle():
             logger.info("Selecionando opção de exportação")
             self._esperar_e_clicar(By.XPATH, r'//*[@id="tab-01"]/div[3]/div/div[3]/div/div[1]/span/label')
             
-            logger.info("Iniciando processo de download")
-            self.pegar_downloads()
+            # A confirmação é que agenda o export; com baixar=False a coleta fica com quem chamou (exportar_relatorios.py)
+            logger.info("Confirmando a exportação")
+            self.confirmar_exportacao()
+            if baixar:
+                logger.info("Iniciando processo de download")
+                self.pegar_downloads()
             
             logger.info("Fechando janelas secundárias")
             self.fecharJanela()
@@ -1338,36 +1574,44 @@ class PegarGoogle():
         except Exception as e:
             logger.error(f"Erro ao fechar janela: {e}", exc_info=True)
             
+    def confirmar_exportacao(self):
+        """Confirma o diálogo aberto pelo botão Exportar; é este passo que agenda o export no SGI"""
+        elements = [
+            '//*[@id="agendamentoExportacao_exportarPanel"]/div/div/div[2]/div[1]/div/div/div[2]/ul/li[2]/a',
+            '//*[@id="agendamentoExportacao_colunasTab"]/div[1]/div/div/label',
+            '//*[@id="agendamentoExportacao_divIncluirDadosPessoais"]/label',
+            '//*[@id="popupOkButton"]',
+            '//*[@id="agendamentoExportacao_okButton_B1"]',
+            '//*[@id="popupOkButton"]',
+        ]
+        for xpath in elements:
+            self.esperas.clicar(By.XPATH, xpath, postback=True)
+
     def pegar_downloads(self):
-        wait = WebDriverWait(self.driver, 120)
+        """Vai à fila de exportações e baixa o export mais recente (já confirmado em confirmar_exportacao)"""
+        # Modo HTTP opcional: fila e download com a sessão do navegador, sem renderizar páginas
+        if exportacao_http_ativa() and baixar_exportacao(self.driver, self.download_dir):
+            return
         
         try:
-            # Clique em vários elementos conforme necessário
+            # Menu até a fila de exportações
             elements = [
-                '//*[@id="agendamentoExportacao_exportarPanel"]/div/div/div[2]/div[1]/div/div/div[2]/ul/li[2]/a',
-                '//*[@id="agendamentoExportacao_colunasTab"]/div[1]/div/div/label',
-                '//*[@id="agendamentoExportacao_divIncluirDadosPessoais"]/label',
-                '//*[@id="popupOkButton"]',
-                '//*[@id="agendamentoExportacao_okButton_B1"]',
-                '//*[@id="popupOkButton"]',
                 '//*[@id="menu-cod-8"]/a',
                 '//*[@id="submenu-cod-8"]/div/div[1]/ul/li[10]/a',
                 '//*[@id="submenu-cod-8"]/div/div[1]/ul/li[10]/ul/li[3]/a'
             ]
             
-            
             for xpath in elements:
-                element = wait.until(EC.element_to_be_clickable((By.XPATH, xpath)))
-                self.driver.execute_script("arguments[0].click();", element)
-                time.sleep(2)  # Adicione um tempo de espera se necessário
+                self.esperas.clicar(By.XPATH, xpath, postback=True)
             
             # Código específico para clicar no botão de download com tratamento de exceção
             while True:
                 try:
-                    download_button = WebDriverWait(self.driver, 10).until(EC.element_to_be_clickable(('xpath', '//*[@id="ContentPlaceHolder1_exportacoesGrid_baixarButton_0_btn_0"]')))
-                    time.sleep(10)
+                    download_button = self.esperas.elemento(By.XPATH, '//*[@id="ContentPlaceHolder1_exportacoesGrid_baixarButton_0_btn_0"]', estado='clicavel', timeout=10)
+                    inicio_download = time.time()
                     self.driver.execute_script("arguments[0].click();", download_button)
-                    time.sleep(10)
+                    # O navegador é fechado em seguida: espera o arquivo terminar de baixar
+                    self.esperas.download_concluido(self.download_dir, inicio_download, exigir=False)
                     break  # Sai do loop se conseguir clicar no botão de download
                 except TimeoutException:
                     # Verifica se o botão de alerta está presente
@@ -1376,7 +1620,7 @@ class PegarGoogle():
                         if alert_button.is_displayed():
                             logger.info("Alerta detectado. Recarregando a página...")
                             self.driver.refresh()  # Recarrega a página
-                            time.sleep(5)  # Aguarda um tempo para a página recarregar
+                            self.esperas.documento_pronto()
                             continue  # Volta para o início do loop
                     except NoSuchElementException:
                         pass  # Se o alerta não for encontrado, continua com a próxima tentativa
@@ -1387,63 +1631,167 @@ class PegarGoogle():
 
                 # Tentar clicar no botão de atualizar se o botão de download não estiver disponível
                 try:
-                    atualizar = WebDriverWait(self.driver, 10).until(EC.element_to_be_clickable(('xpath', '//*[@id="ContentPlaceHolder1_atualizarButton_btn"]')))
-                    self.driver.execute_script("arguments[0].click();", atualizar)
-                    time.sleep(5)  # Adiciona um pequeno tempo de espera para o botão ser clicado
+                    self.esperas.clicar(By.XPATH, '//*[@id="ContentPlaceHolder1_atualizarButton_btn"]', timeout=10, postback=True)
                 except TimeoutException:
                     pass
         except StaleElementReferenceException:
             logger.info("Elemento foi atualizado ou não está mais na página. Recarregando...")
             self.driver.refresh()  # Recarrega a página
-            time.sleep(5)
+            self.esperas.documento_pronto()
             self.pegar_downloads()  # Tenta novamente
             
     def fechar(self):
         """Método para fechar o navegador"""
+        if self.esperas:
+            self.esperas.resumo()
         try:
             if self.driver:
                 self.driver.quit()
         except Exception as e:
             print(f"Erro ao fechar o navegador: {e}")
             
-if __name__ == "__main__":
-    logger.info("Iniciando execução principal do script Pedidos.py")
-    
-    rpa = PegarGoogle()
-    while rpa.entrar():
-        logger.info("Chamando método pegarPedidos()")
-        if rpa.pegarPedidos():
-            break
-    
-    logger.info("Execução principal finalizada")
-    banco = Banco()
-    banco.criar_tabela()
-    tratar = TratarDados()
-    # Antes de processar, separe os cancelados
-    df_sem_cancelados, df_cancelados = tratar.processar_arquivo_pedidos()
-
-    # Primeiro processa os cancelados (são menos dados e mais críticos)
-    if df_cancelados is not None and len(df_cancelados) > 0:
+def preparar_banco():
+    """Conecta e verifica as tabelas (roda em paralelo com o navegador)"""
+    # Banco.__init__ já executa criar_tabela
+    return Banco()
+
+
+def executar_pipeline(banco, tamanho_chunk=50000, tamanho_fila=4, arquivo=None):
+    """
+    Lê, trata e carrega o export em streaming: os primeiros blocos já são
+    carregados enquanto os seguintes ainda estão sendo lidos, e cancelados e
+    normais são carregados em paralelo (cada um com sua conexão do pool).
+    `arquivo` fixa o export a carregar (padrão: o CSV mais recente).
+    """
+    tratar = TratarDados(arquivo)
+    pipeline = PipelineETL(tamanho_fila=tamanho_fila)
+    resumo = {'normais': 0, 'enviados': 0, 'inalterados': 0, 'cancelados': 0,
+              'ausentes': 0, 'situacao_nula': 0, 'situacao_divergente': 0,
+              'cancelados_encontrados': 0, 'cancelados_nao_encontrados': 0, 'ja_cancelados': 0}
+    amostra_cancelados = []
+
+    def carregar_cancelados(df_cancelados):
+        if len(df_cancelados) == 0:
+            return
         logger.info(f"Processando {len(df_cancelados)} pedidos cancelados")
-        resultado_cancelados = banco.inserirPedidosCancelados(df_cancelados)
-        
-        # Verificação opcional
-        codigos_cancelados = df_cancelados['CodigoPedido'].tolist()
-        banco.verificar_cancelamentos(codigos_cancelados[:10])  # Verifica apenas 10
-    else:
+        resultado = banco.inserirPedidosCancelados(df_cancelados, modo='copy')
+        resumo['cancelados'] += len(df_cancelados)
+        if resultado and 'encontrados' in resultado:
+            resumo['cancelados_encontrados'] += resultado['encontrados']
+            resumo['cancelados_nao_encontrados'] += resultado['nao_encontrados']
+            resumo['ja_cancelados'] += resultado['ja_cancelados']
+        elif len(amostra_cancelados) < 10:
+            # Carga recaiu para lotes: sem contagens do servidor, verifica por amostra
+            amostra_cancelados.extend(df_cancelados['CodigoPedido'].tolist()[:10 - len(amostra_cancelados)])
+
+    def carregar_normais(df_sem_cancelados):
+        if len(df_sem_cancelados) == 0:
+            return
+        df_alterados, hashes, inalterados = banco.filtrar_pedidos_alterados(df_sem_cancelados)
+        logger.info(f"Processando {len(df_alterados)} pedidos normais ({inalterados} inalterados ignorados)")
+        if len(df_alterados) > 0:
+            resultado = banco.inserirPedidos(df_alterados, modo='copy')
+            if resultado and resultado['erros'] == 0:
+                banco.registrar_hashes(df_alterados, hashes)
+        resumo['normais'] += len(df_sem_cancelados)
+        resumo['enviados'] += len(df_alterados)
+        resumo['inalterados'] += inalterados
+        return df_alterados if len(df_alterados) > 0 else None
+
+    def verificar_normais(df_alterados):
+        relatorio = banco.verificar_carga(df_alterados)
+        if relatorio:
+            for chave in ('ausentes', 'situacao_nula', 'situacao_divergente'):
+                resumo[chave] += len(relatorio[chave])
+
+    blocos = pipeline.fonte('leitura', tratar.ler_blocos(tamanho_chunk))
+    fila_normais, fila_cancelados = pipeline.etapa('tratamento', blocos, tratar.tratar_bloco, saidas=2)
+    pipeline.etapa('carga_cancelados', fila_cancelados, carregar_cancelados, saidas=0)
+    carregados = pipeline.etapa('carga_normais', fila_normais, carregar_normais)
+    # Verificação pós-carga em conexão própria, sem atrasar a carga dos blocos seguintes
+    pipeline.etapa('verificacao', carregados, verificar_normais, saidas=0)
+    pipeline.aguardar()
+
+    # Verificação opcional (apenas se algum bloco não trouxe as contagens do servidor)
+    if amostra_cancelados:
+        banco.verificar_cancelamentos(amostra_cancelados)  # Verifica apenas 10
+    elif not resumo['cancelados']:
         logger.info("Nenhum pedido cancelado para processar")
 
-    # Depois processa os normais
-    if df_sem_cancelados is not None and len(df_sem_cancelados) > 0:
-        logger.info(f"Processando {len(df_sem_cancelados)} pedidos normais")
-        banco.inserirPedidos(df_sem_cancelados)
-    else:
-        logger.info("Nenhum pedido normal para processar")
+    logger.info(f"=== RESUMO: {resumo['normais']} pedidos normais no arquivo, {resumo['enviados']} enviados, "
+                f"{resumo['inalterados']} ignorados por não terem mudado, {resumo['cancelados']} cancelados "
+                f"({resumo['cancelados_encontrados']} encontrados, {resumo['cancelados_nao_encontrados']} não encontrados, "
+                f"{resumo['ja_cancelados']} já cancelados) ===")
+    logger.info(f"=== VERIFICAÇÃO: {resumo['ausentes']} ausentes, {resumo['situacao_nula']} com situação NULL, "
+                f"{resumo['situacao_divergente']} com situação divergente ===")
+    return pipeline
+
+
+def configurar_por_linha_de_comando():
+    """Opções de linha de comando; têm prioridade sobre as variáveis de ambiente equivalentes"""
+    parser = argparse.ArgumentParser(description="Exporta e carrega os pedidos do SGI")
+    opcoes = {
+        '--tamanho-chunk': ('PEDIDOS_TAMANHO_CHUNK', int, "Linhas por bloco de leitura"),
+        '--tamanho-fila': ('PEDIDOS_TAMANHO_FILA', int, "Blocos em espera entre as etapas"),
+    }
+    for opcao, (variavel, tipo, ajuda) in opcoes.items():
+        parser.add_argument(opcao, type=tipo, help=f"{ajuda} ({variavel})")
+
+    # Os mesmos ajustes de ControladorLotes.do_ambiente para pedidos e para cancelados
+    ajustes_lote = {
+        'lote-inicial': ('LOTE_INICIAL', int, "Tamanho inicial do lote no modo em lotes"),
+        'lote-min': ('LOTE_MIN', int, "Tamanho mínimo do lote"),
+        'lote-max': ('LOTE_MAX', int, "Tamanho máximo do lote"),
+        'lote-tempo-alvo': ('LOTE_TEMPO_ALVO', float, "Segundos alvo por lote"),
+        'commit-tempo-alvo': ('COMMIT_TEMPO_ALVO', float, "Segundos alvo por transação"),
+        'pausa-max': ('PAUSA_MAX', float, "Pausa máxima entre lotes quando a latência degrada"),
+    }
+    for prefixo, titulo, inicio in (('PEDIDOS', "Lotes de pedidos", ''),
+                                    ('CANCELADOS', "Lotes de cancelados", 'cancelados-')):
+        grupo = parser.add_argument_group(titulo)
+        for nome, (sufixo, tipo, ajuda) in ajustes_lote.items():
+            opcao = f"--{inicio}{nome}"
+            variavel = f"{prefixo}_{sufixo}"
+            opcoes[opcao] = (variavel, tipo, ajuda)
+            grupo.add_argument(opcao, type=tipo, help=f"{ajuda} ({variavel})")
+    args = parser.parse_args()
+
+    for opcao, (variavel, _, _) in opcoes.items():
+        valor = getattr(args, opcao.lstrip('-').replace('-', '_'))
+        if valor is not None:
+            os.environ[variavel] = str(valor)
 
-    banco.fechar()
 
+if __name__ == "__main__":
+    configurar_por_linha_de_comando()
+    logger.info("Iniciando execução principal do script Pedidos.py")
+
+    # A conexão e a verificação das tabelas não dependem do navegador
+    preparacao = PipelineETL(max_tarefas=1)
+    banco_futuro = preparacao.em_segundo_plano('conexao_banco', preparar_banco)
+
+    rpa = PegarGoogle()
+    with preparacao.medir('download'):
+        while rpa.entrar():
+            logger.info("Chamando método pegarPedidos()")
+            if rpa.pegarPedidos():
+                break
     rpa.fechar()
 
+    logger.info("Execução principal finalizada")
+    banco = banco_futuro.result()
+    preparacao.aguardar()
+    preparacao.resumo()
+
+    pipeline = executar_pipeline(
+        banco,
+        tamanho_chunk=int(os.getenv('PEDIDOS_TAMANHO_CHUNK', '50000')),
+        tamanho_fila=int(os.getenv('PEDIDOS_TAMANHO_FILA', '4'))
+    )
+    pipeline.resumo()
+
+    banco.fechar()
+
 
 # WITH vendas_filtradas AS (
 #     SELECT *
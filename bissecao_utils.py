@@ -0,0 +1,78 @@
+import json
+import logging
+import os
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Pasta dos arquivos de rejeitados quando a tabela de dead-letter não está acessível
+PASTA_REJEITADOS = os.getenv('PASTA_REJEITADOS', 'rejeitados')
+
+
+def executar_com_bissecao(cursor, executar, registros, savepoint='bissecao'):
+    """
+    Executa um lote dentro de um SAVEPOINT; se falhar, divide o lote ao meio e
+    tenta cada metade, até isolar os registros com erro.
+
+    Um registro problemático num lote de N custa ~2*log2(N) tentativas em vez de
+    N, e nada é commitado aqui: o que já estava na transação é preservado pelo
+    ROLLBACK TO SAVEPOINT e o commit continua a cargo de quem chama.
+
+    Args:
+        cursor: Cursor psycopg2 dentro de uma transação aberta
+        executar: Função (cursor, registros) -> linhas afetadas
+        registros: Lista de tuplas do lote
+        savepoint: Nome do savepoint
+
+    Returns:
+        dict: {'sucessos': int, 'afetados': int, 'rejeitados': [(registro, erro), ...]}
+    """
+    resultado = {'sucessos': 0, 'afetados': 0, 'rejeitados': []}
+
+    def _tentar(parte):
+        cursor.execute(f"SAVEPOINT {savepoint}")
+        try:
+            afetados = executar(cursor, parte)
+        except Exception as e:
+            cursor.execute(f"ROLLBACK TO SAVEPOINT {savepoint}")
+            cursor.execute(f"RELEASE SAVEPOINT {savepoint}")
+            if len(parte) == 1:
+                resultado['rejeitados'].append((parte[0], str(e).strip()))
+                return
+            meio = len(parte) // 2
+            _tentar(parte[:meio])
+            _tentar(parte[meio:])
+            return
+
+        cursor.execute(f"RELEASE SAVEPOINT {savepoint}")
+        resultado['sucessos'] += len(parte)
+        resultado['afetados'] += max(afetados or 0, 0)
+
+    if registros:
+        _tentar(list(registros))
+    return resultado
+
+
+def gravar_rejeitados_arquivo(origem, rejeitados, indice_codigo=0, pasta=None):
+    """
+    Grava os rejeitados em JSONL (um por linha) para reprocessamento posterior.
+
+    Returns:
+        str: Caminho do arquivo gravado
+    """
+    pasta = pasta or PASTA_REJEITADOS
+    os.makedirs(pasta, exist_ok=True)
+    caminho = os.path.join(pasta, f"{origem}_{datetime.now():%Y%m%d}.jsonl")
+
+    with open(caminho, 'a', encoding='utf-8') as f:
+        for registro, erro in rejeitados:
+            f.write(json.dumps({
+                'origem': origem,
+                'codigo_pedido': registro[indice_codigo],
+                'registro': list(registro),
+                'erro': erro,
+                'criado_em': datetime.now().isoformat(timespec='seconds')
+            }, default=str, ensure_ascii=False) + '\n')
+
+    logger.warning(f"{len(rejeitados)} registros rejeitados gravados em {caminho}")
+    return caminho
@@ -0,0 +1,96 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Valores aceitos como verdadeiro nas colunas booleanas dos exports (comparados após strip/lower)
+VERDADEIROS_PADRAO = ('sim', 'true', '1')
+
+_LIMITE_INT32 = np.iinfo(np.int32).max
+
+
+def _para_inteiro_nulavel(numeros):
+    """Trunca (como int()) e converte para Int32, ou Int64 se algum valor não couber."""
+    numeros = np.trunc(numeros)
+    if numeros.abs().max(skipna=True) > _LIMITE_INT32:
+        return numeros.astype('Int64')
+    return numeros.astype('Int32')
+
+
+def _por_valores_distintos(serie, funcao):
+    """
+    Aplica `funcao` (vetorizada) só aos valores distintos e expande o resultado.
+
+    Colunas como quantidades e flags têm poucos valores distintos em relação ao
+    número de linhas, então o parse de texto roda sobre centenas de valores em
+    vez de centenas de milhares. Nulos chegam à `funcao` como NaN.
+    """
+    codigos, unicos = pd.factorize(serie)
+    convertidos = funcao(pd.Series(unicos, dtype=object))
+    # Posição extra no final para os nulos (código -1)
+    convertidos = pd.concat([convertidos, funcao(pd.Series([np.nan], dtype=object))], ignore_index=True)
+    return pd.Series(convertidos.array.take(codigos), index=serie.index, name=serie.name)
+
+
+def converter_inteiros(serie, padrao=0, estrito=False):
+    """
+    Converte uma coluna para inteiro nulável (Int32) de forma vetorizada.
+
+    Args:
+        serie: Série com texto ou números
+        padrao: Valor usado para vazios/inválidos (None mantém <NA>)
+        estrito: Se True, só aceita texto composto apenas por dígitos (regra
+            do Pedidos.py: '1.5', '-3' e ' 2' viram `padrao`); se False,
+            aceita qualquer número que o pandas reconheça e trunca a parte decimal
+
+    Returns:
+        pd.Series: Série Int32 (Int64 se houver valores fora do intervalo)
+    """
+    if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+        numeros = serie.astype('float64')
+    else:
+        def _texto_para_numero(valores):
+            texto = valores.astype('string')
+            if estrito:
+                texto = texto.where(texto.str.isdigit().fillna(False).astype(bool))
+            return pd.to_numeric(texto, errors='coerce').astype('float64')
+
+        numeros = _por_valores_distintos(serie, _texto_para_numero)
+
+    if padrao is not None:
+        numeros = numeros.fillna(padrao)
+    return _para_inteiro_nulavel(numeros)
+
+
+def converter_booleanos(serie, verdadeiros=VERDADEIROS_PADRAO, padrao=False):
+    """
+    Converte uma coluna de texto ('Sim'/'Não', 'true'/'false', '1'/'0') em boolean nulável.
+
+    Vazios recebem `padrao` (None mantém <NA>); qualquer outro texto é False.
+    """
+    def _texto_para_booleano(valores):
+        texto = valores.astype('string').str.strip().str.lower()
+        resultado = texto.isin(list(verdadeiros)).astype('boolean')
+        if padrao is None:
+            return resultado.mask(texto.isna())
+        return resultado.mask(texto.isna(), bool(padrao))
+
+    return _por_valores_distintos(serie, _texto_para_booleano)
+
+
+def converter_colunas_inteiras(df, colunas, padrao=0, estrito=False):
+    """Aplica converter_inteiros às colunas existentes."""
+    for col in colunas:
+        if col in df.columns:
+            df[col] = converter_inteiros(df[col], padrao=padrao, estrito=estrito)
+    return df
+
+
+def converter_colunas_booleanas(df, colunas, verdadeiros=VERDADEIROS_PADRAO, padrao=False):
+    """Aplica converter_booleanos às colunas existentes."""
+    for col in colunas:
+        if col in df.columns:
+            df[col] = converter_booleanos(df[col], verdadeiros=verdadeiros, padrao=padrao)
+    return df
@@ -0,0 +1,41 @@
+import io
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Marcador de NULL usado no COPY (mantém '' distinto de NULL)
+NULL_COPY = r'\N'
+
+
+def dataframe_para_buffer(df, colunas):
+    """Serializa as colunas do DataFrame em um buffer CSV pronto para COPY FROM STDIN."""
+    buffer = io.StringIO()
+    df[colunas].to_csv(buffer, index=False, header=False, na_rep=NULL_COPY)
+    buffer.seek(0)
+    return buffer
+
+
+def copiar_dataframe(cursor, df, tabela, colunas):
+    """
+    Envia o DataFrame para a tabela via COPY FROM STDIN (formato CSV).
+
+    Args:
+        cursor: Cursor psycopg2 aberto
+        df: DataFrame com os dados
+        tabela: Nome da tabela de destino (normalmente uma tabela de staging)
+        colunas: Colunas na ordem em que serão copiadas
+
+    Returns:
+        int: Quantidade de linhas copiadas
+    """
+    if df.empty:
+        return 0
+
+    buffer = dataframe_para_buffer(df, colunas)
+    cursor.copy_expert(
+        f"COPY {tabela} ({', '.join(colunas)}) FROM STDIN "
+        f"WITH (FORMAT csv, NULL '{NULL_COPY}')",
+        buffer
+    )
+    logger.info(f"COPY concluído: {len(df)} linhas enviadas para {tabela}")
+    return len(df)
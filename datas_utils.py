@@ -0,0 +1,102 @@
+import logging
+import warnings
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Formatos aceitos nos exports do SGI, na ordem histórica de tentativa.
+# São mutuamente exclusivos (posição do ano e separador diferentes), então
+# reordená-los pelo formato vencedor não altera o resultado.
+FORMATOS_DATA_PADRAO = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%Y/%m/%d')
+
+# Formato vencedor por (layout do arquivo, coluna)
+_CACHE_FORMATOS = {}
+
+
+def _ordenar_formatos(formatos, chave_cache):
+    """Coloca o formato que venceu da última vez (para esta coluna/layout) na frente."""
+    vencedor = _CACHE_FORMATOS.get(chave_cache) if chave_cache is not None else None
+    if vencedor in formatos:
+        return [vencedor] + [f for f in formatos if f != vencedor]
+    return list(formatos)
+
+
+def _converter_sobras(valores):
+    """Conversão automática, uma vez por valor distinto, do que nenhum formato resolveu."""
+    convertidos = {}
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)
+        for valor in pd.unique(valores):
+            try:
+                convertidos[valor] = pd.to_datetime(valor).date()
+            except Exception:
+                convertidos[valor] = None
+    return convertidos
+
+
+def converter_coluna_datas(serie, formatos=FORMATOS_DATA_PADRAO, chave_cache=None, como_data=True):
+    """
+    Converte uma coluna de texto em datas tentando cada formato uma única vez
+    sobre as linhas ainda não resolvidas.
+
+    Args:
+        serie: Série com as datas em texto
+        formatos: Formatos a tentar
+        chave_cache: Chave (ex.: (layout, coluna)) para lembrar o formato vencedor
+        como_data: Se True retorna objetos date/None (como o conversor legado);
+            se False retorna uma série datetime64
+
+    Returns:
+        pd.Series: Coluna convertida, com o mesmo índice da entrada
+    """
+    pendente = (serie.notna() & (serie != '')).to_numpy()
+    resultado = pd.Series(pd.NaT, index=serie.index, dtype='datetime64[ns]')
+    acertos = Counter()
+
+    for formato in _ordenar_formatos(formatos, chave_cache):
+        if not pendente.any():
+            break
+        convertidos = pd.to_datetime(serie[pendente], format=formato, errors='coerce')
+        ok = convertidos.notna().to_numpy()
+        if ok.any():
+            posicoes = pendente.nonzero()[0][ok]
+            resultado.iloc[posicoes] = convertidos.to_numpy()[ok]
+            pendente[posicoes] = False
+            acertos[formato] = int(ok.sum())
+
+    if chave_cache is not None and acertos:
+        _CACHE_FORMATOS[chave_cache] = acertos.most_common(1)[0][0]
+
+    sobras = {}
+    if pendente.any():
+        sobras = _converter_sobras(serie[pendente])
+        logger.debug(f"{int(pendente.sum())} valores resolvidos pela conversão automática")
+
+    if not como_data:
+        if sobras:
+            resultado[pendente] = [
+                pd.Timestamp(sobras[v]) if sobras[v] is not None else pd.NaT
+                for v in serie[pendente]
+            ]
+        return resultado
+
+    saida = pd.Series(np.full(len(serie), None, dtype=object), index=serie.index)
+    resolvidos = resultado.notna().to_numpy()
+    if resolvidos.any():
+        saida[resolvidos] = resultado[resolvidos].dt.date.to_numpy()
+    if sobras:
+        saida[pendente] = [sobras[v] for v in serie[pendente]]
+    return saida
+
+
+def converter_colunas_datas(df, colunas, layout=None, formatos=FORMATOS_DATA_PADRAO, como_data=True):
+    """Aplica converter_coluna_datas às colunas existentes, com cache por (layout, coluna)."""
+    for col in colunas:
+        if col in df.columns:
+            logger.info(f"Processando coluna {col}")
+            chave = (layout, col) if layout is not None else None
+            df[col] = converter_coluna_datas(df[col], formatos=formatos, chave_cache=chave, como_data=como_data)
+    return df
@@ -0,0 +1,90 @@
+import atexit
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine
+
+logger = logging.getLogger(__name__)
+
+# Um engine (e portanto um pool) por URL, compartilhado por todos os Banco do processo
+_ENGINES = {}
+_LOCK = threading.Lock()
+
+
+def _config_pool():
+    """Parâmetros do pool, ajustáveis por variável de ambiente."""
+    return {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', '5')),
+        'max_overflow': int(os.getenv('DB_POOL_MAX_OVERFLOW', '5')),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', '30')),
+        # Descarta conexões mortas (ex.: derrubadas pelo servidor durante o download no navegador)
+        'pool_pre_ping': True,
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '1800')),
+    }
+
+
+def obter_engine(variavel='DATABASE_URL'):
+    """
+    Retorna o engine compartilhado para a URL guardada em `variavel`.
+
+    Args:
+        variavel: Nome da variável de ambiente com a URL (ex.: 'DATABASE_URL', 'dbUrlConnect')
+
+    Returns:
+        sqlalchemy.engine.Engine: Engine com pool dimensionado e statement_timeout
+    """
+    url = os.getenv(variavel)
+    if not url:
+        raise ValueError(f"Variável de ambiente '{variavel}' não definida")
+
+    with _LOCK:
+        engine = _ENGINES.get(url)
+        if engine is None:
+            timeout_ms = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '900000'))
+            engine = create_engine(
+                url,
+                connect_args={'options': f'-c statement_timeout={timeout_ms}'},
+                **_config_pool()
+            )
+            _ENGINES[url] = engine
+            logger.info(f"Engine criado para '{variavel}' (statement_timeout={timeout_ms}ms)")
+        return engine
+
+
+@contextmanager
+def conexao_raw(engine):
+    """
+    Empresta uma conexão psycopg2 do pool e um cursor, devolvendo ambos ao sair.
+
+    Em caso de exceção faz rollback antes de devolver a conexão; o commit fica
+    a cargo de quem usa (como nos métodos de carga).
+
+    Uso:
+        with conexao_raw(self.engine) as (conn, cursor):
+            cursor.execute(...)
+            conn.commit()
+    """
+    conn = engine.raw_connection()
+    cursor = conn.cursor()
+    try:
+        yield conn, cursor
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def liberar_engines():
+    """Fecha as conexões de todos os pools (fim da execução)."""
+    with _LOCK:
+        for engine in _ENGINES.values():
+            engine.dispose()
+        _ENGINES.clear()
+
+
+# Os Banco não descartam o engine compartilhado; o pool é fechado uma vez, na saída do processo
+atexit.register(liberar_engines)
@@ -0,0 +1,110 @@
+import atexit
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Snapshots de depuração: desligados por padrão. DEBUG_SNAPSHOT=amostra grava até
+# DEBUG_SNAPSHOT_LINHAS linhas sorteadas de cada DataFrame; DEBUG_SNAPSHOT=completo grava tudo.
+MODOS_SNAPSHOT = ('desligado', 'amostra', 'completo')
+PASTA_SNAPSHOTS = os.getenv('PASTA_SNAPSHOTS', 'snapshots')
+
+
+class SnapshotDepuracao:
+    """
+    Grava cópias de DataFrames intermediários em Parquet para depuração.
+
+    A gravação acontece numa thread de fundo (uma só, para não competir com a
+    carga), então o ponto de captura só paga a cópia/amostragem do DataFrame.
+    Desligado (o padrão), `capturar` retorna imediatamente. Falhas na gravação
+    só geram aviso: o snapshot nunca interrompe o processamento.
+
+    Args:
+        modo: 'desligado', 'amostra' ou 'completo' (None = DEBUG_SNAPSHOT, padrão desligado)
+        linhas: Tamanho da amostra no modo 'amostra' (None = DEBUG_SNAPSHOT_LINHAS, padrão 1000)
+        pasta: Pasta dos arquivos (None = PASTA_SNAPSHOTS)
+    """
+
+    def __init__(self, modo=None, linhas=None, pasta=None):
+        modo = (modo or os.getenv('DEBUG_SNAPSHOT') or 'desligado').strip().lower()
+        if modo not in MODOS_SNAPSHOT:
+            logger.warning(f"DEBUG_SNAPSHOT inválido ({modo!r}); snapshots desligados")
+            modo = 'desligado'
+        self.modo = modo
+        self.linhas = linhas or int(os.getenv('DEBUG_SNAPSHOT_LINHAS', '1000'))
+        self.pasta = pasta or PASTA_SNAPSHOTS
+        self._executor = None
+        self._pendentes = []
+        self._lock = threading.Lock()
+
+    @property
+    def ativo(self):
+        return self.modo != 'desligado'
+
+    def capturar(self, nome, df):
+        """
+        Agenda a gravação de `df` em `<pasta>/<nome>_<data_hora>.parquet`.
+
+        Returns:
+            str | None: Caminho do arquivo que será gravado (None se desligado)
+        """
+        if not self.ativo or df is None:
+            return None
+
+        if self.modo == 'amostra' and len(df) > self.linhas:
+            copia = df.sample(n=self.linhas, random_state=0).sort_index()
+        else:
+            copia = df.copy()
+        caminho = os.path.join(self.pasta, f"{nome}_{datetime.now():%Y%m%d_%H%M%S_%f}.parquet")
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='snapshot')
+            self._pendentes = [f for f in self._pendentes if not f.done()]
+            self._pendentes.append(self._executor.submit(self._gravar, caminho, copia, len(df)))
+        return caminho
+
+    def _gravar(self, caminho, df, total):
+        try:
+            os.makedirs(self.pasta, exist_ok=True)
+            try:
+                df.to_parquet(caminho, index=False)
+            except (TypeError, ValueError):
+                # Colunas object com tipos misturados (ex.: str e int): grava como texto
+                objetos = df.select_dtypes(include='object').columns
+                df[objetos] = df[objetos].astype(str).where(df[objetos].notna(), None)
+                df.to_parquet(caminho, index=False)
+            logger.info(f"Snapshot de depuração gravado: {caminho} ({len(df)} de {total} linhas)")
+        except Exception as e:
+            logger.warning(f"Não foi possível gravar o snapshot {caminho}: {e}")
+
+    def aguardar(self):
+        """Espera as gravações pendentes (chamado automaticamente no fim do processo)."""
+        with self._lock:
+            pendentes, self._pendentes = self._pendentes, []
+        for futuro in pendentes:
+            futuro.result()
+
+
+_padrao = None
+_padrao_lock = threading.Lock()
+
+
+def snapshot_padrao():
+    """Instância compartilhada configurada pelas variáveis de ambiente da execução."""
+    global _padrao
+    with _padrao_lock:
+        if _padrao is None:
+            _padrao = SnapshotDepuracao()
+            if _padrao.ativo:
+                atexit.register(_padrao.aguardar)
+                logger.info(f"Snapshots de depuração ativos (modo {_padrao.modo}) em {_padrao.pasta}")
+        return _padrao
+
+
+def capturar_snapshot(nome, df):
+    """Atalho para snapshot_padrao().capturar(nome, df)."""
+    return snapshot_padrao().capturar(nome, df)
@@ -0,0 +1,222 @@
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Estados do evento Browser.downloadProgress
+CONCLUIDO = 'completed'
+CANCELADO = 'canceled'
+EM_ANDAMENTO = 'inProgress'
+
+
+def caminho_livre(pasta, nome):
+    """Caminho para `nome` em `pasta`, numerado como o Chrome ("nome (1).ext") se já existir."""
+    base, extensao = os.path.splitext(os.path.basename(nome))
+    caminho = os.path.join(pasta, base + extensao)
+    numero = 1
+    while os.path.exists(caminho):
+        caminho = os.path.join(pasta, f"{base} ({numero}){extensao}")
+        numero += 1
+    return caminho
+
+
+def _estado(evento):
+    # Conforme a versão do devtools o estado vem como str ou como Enum
+    return getattr(evento.state, 'value', evento.state)
+
+
+class GerenciadorDownloads:
+    """
+    Acompanha os downloads do Chrome pelos eventos do DevTools em vez de olhar a pasta.
+
+    Uma thread de fundo abre uma conexão CDP com o navegador (driver.bidi_connection),
+    configura Browser.setDownloadBehavior com eventos ligados e escuta
+    Browser.downloadWillBegin/downloadProgress. Cada download é gravado pelo Chrome
+    com o GUID como nome ('allowAndName') e, ao concluir, renomeado para o nome
+    sugerido pelo servidor; por isso o caminho devolvido é exatamente o do
+    download pedido, mesmo com dois exports chegando quase juntos.
+
+    Uso:
+        marca = downloads.marcar()       # antes do clique que dispara o download
+        ...clique...
+        caminho = downloads.aguardar(marca)
+
+    Args:
+        driver: WebDriver do Chrome/Edge (Selenium 4)
+        pasta: Pasta onde os arquivos devem ficar
+        timeout: Tempo máximo padrão de `aguardar`, em segundos
+    """
+
+    def __init__(self, driver, pasta, timeout=300):
+        self.driver = driver
+        self.pasta = os.path.abspath(pasta)
+        self.timeout = timeout
+        self.ativo = False
+        self._downloads = {}
+        self._sequencia = 0
+        self._condicao = threading.Condition()
+        self._pronto = threading.Event()
+        self._thread = None
+        self._token = None
+        self._escopo = None
+
+    # --- ciclo de vida ------------------------------------------------------
+
+    def iniciar(self, timeout=15):
+        """
+        Abre a conexão CDP e configura o comportamento de download.
+
+        Returns:
+            bool: False se o navegador/driver não oferecer CDP (quem chama deve
+            cair na verificação da pasta de downloads)
+        """
+        try:
+            import trio  # noqa: F401  (dependência do Selenium para CDP)
+        except ImportError:
+            logger.warning("trio indisponível: downloads serão acompanhados pela pasta")
+            return False
+
+        os.makedirs(self.pasta, exist_ok=True)
+        self._thread = threading.Thread(target=self._executar, name='downloads-cdp', daemon=True)
+        self._thread.start()
+        if not self._pronto.wait(timeout):
+            logger.warning(f"Conexão CDP para downloads não ficou pronta em {timeout}s")
+        return self.ativo
+
+    def parar(self):
+        """Encerra a escuta de eventos (o navegador continua aberto)."""
+        if self._token is None or self._escopo is None:
+            return
+        import trio
+
+        try:
+            trio.from_thread.run_sync(self._escopo.cancel, trio_token=self._token)
+        except (RuntimeError, trio.RunFinishedError):
+            pass  # Escuta já encerrada
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _executar(self):
+        import trio
+
+        try:
+            trio.run(self._escutar)
+        except Exception as e:
+            logger.warning(f"Escuta de downloads via CDP encerrada: {str(e)[:200]}")
+        finally:
+            self.ativo = False
+            self._pronto.set()
+            with self._condicao:
+                self._condicao.notify_all()
+
+    async def _escutar(self):
+        import trio
+
+        self._token = trio.lowlevel.current_trio_token()
+        with trio.CancelScope() as escopo:
+            self._escopo = escopo
+            async with self.driver.bidi_connection() as conexao:
+                sessao, devtools = conexao.session, conexao.devtools
+                await sessao.execute(devtools.browser.set_download_behavior(
+                    behavior='allowAndName', download_path=self.pasta, events_enabled=True
+                ))
+                # Buffer folgado: um evento de conclusão descartado faria aguardar() estourar o tempo
+                eventos = sessao.listen(devtools.browser.DownloadWillBegin,
+                                        devtools.browser.DownloadProgress, buffer_size=1000)
+                self.ativo = True
+                self._pronto.set()
+                logger.info(f"Downloads acompanhados via CDP em {self.pasta}")
+                async for evento in eventos:
+                    self._tratar_evento(evento)
+
+    # --- eventos ------------------------------------------------------------
+
+    def _tratar_evento(self, evento):
+        with self._condicao:
+            if hasattr(evento, 'suggested_filename'):
+                self._downloads[evento.guid] = {
+                    'ordem': self._sequencia,
+                    'nome': evento.suggested_filename,
+                    'url': evento.url,
+                    'estado': EM_ANDAMENTO,
+                    'caminho': None,
+                    'inicio': time.perf_counter(),
+                }
+                self._sequencia += 1
+                logger.info(f"Download iniciado: {evento.suggested_filename}")
+                return
+
+            download = self._downloads.get(evento.guid)
+            estado = _estado(evento)
+            if download is None or estado == EM_ANDAMENTO:
+                return
+
+            if estado == CONCLUIDO:
+                download['caminho'] = self._renomear(evento.guid, download['nome'])
+                logger.info(
+                    f"Download concluído: {os.path.basename(download['caminho'])} "
+                    f"({int(evento.received_bytes)} bytes em {time.perf_counter() - download['inicio']:.1f}s)"
+                )
+            else:
+                logger.warning(f"Download cancelado: {download['nome']}")
+            download['estado'] = estado
+            self._condicao.notify_all()
+
+    def _renomear(self, guid, nome):
+        """Move <pasta>/<guid> para o nome sugerido."""
+        origem = os.path.join(self.pasta, guid)
+        destino = caminho_livre(self.pasta, nome or guid)
+        try:
+            os.replace(origem, destino)
+        except OSError as e:
+            logger.warning(f"Não foi possível renomear {origem} para {destino}: {e}")
+            return origem
+        return destino
+
+    # --- espera -------------------------------------------------------------
+
+    def marcar(self):
+        """Marca o ponto a partir do qual `aguardar` deve considerar downloads novos."""
+        with self._condicao:
+            return self._sequencia
+
+    def aguardar(self, marca=0, timeout=None):
+        """
+        Espera o primeiro download iniciado depois de `marca` terminar.
+
+        Returns:
+            str | None: Caminho do arquivo baixado; None se o download for
+            cancelado, a escuta cair ou o tempo esgotar
+        """
+        timeout = self.timeout if timeout is None else timeout
+        limite = time.monotonic() + timeout
+
+        def _terminado():
+            candidatos = [d for d in self._downloads.values() if d['ordem'] >= marca]
+            if candidatos:
+                download = min(candidatos, key=lambda d: d['ordem'])
+                if download['estado'] != EM_ANDAMENTO:
+                    return download
+            return None
+
+        with self._condicao:
+            while True:
+                download = _terminado()
+                if download is not None:
+                    return download['caminho'] if download['estado'] == CONCLUIDO else None
+                restante = limite - time.monotonic()
+                if not self.ativo:
+                    logger.error("Escuta de downloads via CDP não está ativa")
+                    return None
+                if restante <= 0:
+                    logger.error(f"Tempo limite excedido ({timeout}s). Download não concluído.")
+                    return None
+                self._condicao.wait(restante)
+
+
+def criar_gerenciador(driver, pasta, timeout=300):
+    """GerenciadorDownloads já iniciado, ou None se o driver não suportar CDP."""
+    gerenciador = GerenciadorDownloads(driver, pasta, timeout)
+    return gerenciador if gerenciador.iniciar() else None
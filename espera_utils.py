@@ -0,0 +1,268 @@
+import glob
+import logging
+import os
+import time
+from collections import defaultdict
+
+from selenium.common.exceptions import (
+    NoSuchElementException,
+    StaleElementReferenceException,
+    TimeoutException,
+    WebDriverException,
+)
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+logger = logging.getLogger(__name__)
+
+# Extensões dos arquivos que o Chrome/Firefox/Edge usam enquanto o download não termina
+EXTENSOES_PARCIAIS = ('.crdownload', '.part', '.download', '.tmp')
+
+# Contador de requisições XHR/fetch pendentes e aviso de saída da página. Instalado via
+# CDP (Page.addScriptToEvaluateOnNewDocument) para valer em todo documento novo.
+_MONITOR_REDE = """
+(function () {
+    if (window.__esperasRede) { return; }
+    var estado = window.__esperasRede = {pendentes: 0, ultimo: Date.now(), saindo: false};
+    function inicio() { estado.pendentes++; estado.ultimo = Date.now(); }
+    function fim() { estado.pendentes = Math.max(0, estado.pendentes - 1); estado.ultimo = Date.now(); }
+    var enviar = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        inicio();
+        this.addEventListener('loadend', fim);
+        return enviar.apply(this, arguments);
+    };
+    if (window.fetch) {
+        var buscar = window.fetch;
+        window.fetch = function () {
+            inicio();
+            return buscar.apply(this, arguments).finally(fim);
+        };
+    }
+    window.addEventListener('beforeunload', function () { estado.saindo = true; });
+})();
+"""
+
+# [readyState, requisições pendentes, ms sem atividade de rede, saindo da página,
+#  postback assíncrono do ASP.NET em andamento, requisições jQuery ativas]
+_ESTADO_PAGINA = """
+var rede = window.__esperasRede;
+var prm = null;
+try {
+    prm = window.Sys && Sys.WebForms && Sys.WebForms.PageRequestManager
+        ? Sys.WebForms.PageRequestManager.getInstance() : null;
+} catch (e) {}
+return [
+    document.readyState,
+    rede ? rede.pendentes : -1,
+    rede ? Date.now() - rede.ultimo : -1,
+    rede ? rede.saindo : false,
+    prm ? prm.get_isInAsyncPostBack() : false,
+    window.jQuery ? jQuery.active : 0
+];
+"""
+
+_ESTADOS_ELEMENTO = {
+    'presente': EC.presence_of_element_located,
+    'visivel': EC.visibility_of_element_located,
+    'clicavel': EC.element_to_be_clickable,
+    'invisivel': EC.invisibility_of_element_located,
+}
+
+
+class Esperas:
+    """
+    Esperas por condição explícita para os fluxos do SGI, no lugar de time.sleep.
+
+    Cada espera termina assim que a condição é satisfeita (elemento no estado
+    pedido, documento carregado, rede ociosa, postback do ASP.NET concluído,
+    download terminado) e registra quanto tempo realmente levou; `resumo()`
+    mostra onde o portal está lento.
+
+    Args:
+        driver: WebDriver (Selenium ou SeleniumBase)
+        timeout: Tempo máximo padrão de cada espera, em segundos
+        intervalo: Intervalo entre as verificações da condição
+    """
+
+    def __init__(self, driver, timeout=30, intervalo=0.2):
+        self.driver = driver
+        self.timeout = timeout
+        self.intervalo = intervalo
+        self.tempos = []
+        self.monitor_rede = False
+
+    # --- núcleo -------------------------------------------------------------
+
+    def ate(self, condicao, descricao, timeout=None, exigir=True):
+        """
+        Espera `condicao(driver)` retornar um valor verdadeiro e devolve esse valor.
+
+        Args:
+            condicao: Função (driver) -> valor; exceções de elemento obsoleto/ausente e
+                erros de JavaScript durante a navegação contam como "ainda não"
+            descricao: Nome da espera no registro de tempos
+            timeout: Segundos (None = padrão da instância)
+            exigir: Se False, o estouro do tempo só gera aviso e retorna None
+
+        Raises:
+            TimeoutException: Se a condição não for satisfeita no prazo e `exigir` for True
+        """
+        timeout = self.timeout if timeout is None else timeout
+        espera = WebDriverWait(
+            self.driver, timeout, poll_frequency=self.intervalo,
+            ignored_exceptions=(NoSuchElementException, StaleElementReferenceException, WebDriverException),
+        )
+        inicio = time.perf_counter()
+        try:
+            resultado = espera.until(condicao)
+        except TimeoutException:
+            self._registrar(descricao, time.perf_counter() - inicio, False)
+            if exigir:
+                raise
+            logger.warning(f"Espera '{descricao}' excedeu {timeout}s; seguindo adiante")
+            return None
+        self._registrar(descricao, time.perf_counter() - inicio, True)
+        return resultado
+
+    def _registrar(self, descricao, duracao, concluida):
+        self.tempos.append((descricao, duracao, concluida))
+        logger.debug(f"Espera '{descricao}': {duracao:.2f}s{'' if concluida else ' (tempo esgotado)'}")
+
+    def resumo(self):
+        """
+        Loga as esperas agrupadas por descrição, das mais lentas para as mais rápidas.
+
+        Returns:
+            dict: {descricao: {'vezes', 'total', 'maximo', 'esgotadas'}}
+        """
+        agrupado = defaultdict(lambda: {'vezes': 0, 'total': 0.0, 'maximo': 0.0, 'esgotadas': 0})
+        for descricao, duracao, concluida in self.tempos:
+            item = agrupado[descricao]
+            item['vezes'] += 1
+            item['total'] += duracao
+            item['maximo'] = max(item['maximo'], duracao)
+            item['esgotadas'] += 0 if concluida else 1
+
+        if agrupado:
+            total = sum(item['total'] for item in agrupado.values())
+            logger.info(f"=== ESPERAS NO NAVEGADOR: {len(self.tempos)} esperas, {total:.1f}s no total ===")
+            for descricao, item in sorted(agrupado.items(), key=lambda par: par[1]['total'], reverse=True):
+                logger.info(
+                    f"  {descricao}: {item['vezes']}x, total {item['total']:.1f}s, máx {item['maximo']:.1f}s"
+                    + (f", {item['esgotadas']} com tempo esgotado" if item['esgotadas'] else "")
+                )
+        return dict(agrupado)
+
+    # --- elementos ----------------------------------------------------------
+
+    def elemento(self, by, valor, estado='presente', timeout=None, exigir=True):
+        """Espera o elemento ficar 'presente', 'visivel', 'clicavel' ou 'invisivel'."""
+        return self.ate(_ESTADOS_ELEMENTO[estado]((by, valor)), f"{estado}: {valor}", timeout, exigir)
+
+    def clicar(self, by, valor, timeout=None, postback=False, rolar=False):
+        """
+        Espera o elemento ficar clicável e clica via JavaScript (como os fluxos já
+        faziam), buscando de novo o elemento se ele ficar obsoleto entre a espera e
+        o clique. Com `postback`, espera também o postback disparado pelo clique.
+        """
+        def _clicar(driver):
+            elemento = EC.element_to_be_clickable((by, valor))(driver)
+            if not elemento:
+                return False
+            if rolar:
+                driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", elemento)
+            driver.execute_script("arguments[0].click();", elemento)
+            return elemento
+
+        elemento = self.ate(_clicar, f"clicar: {valor}", timeout)
+        if postback:
+            self.postback_concluido(timeout=timeout)
+        return elemento
+
+    def janelas(self, quantidade, timeout=None, exigir=True):
+        """Espera o navegador ter `quantidade` janelas abertas."""
+        return self.ate(EC.number_of_windows_to_be(quantidade), f"{quantidade} janelas", timeout, exigir)
+
+    # --- página -------------------------------------------------------------
+
+    def instalar_monitor_rede(self):
+        """
+        Instala o contador de requisições usado por rede_ociosa/postback_concluido,
+        via CDP para os próximos documentos e via JavaScript no documento atual.
+
+        Returns:
+            bool: False se o driver não aceitar comandos CDP (as esperas de rede
+            passam a olhar só o readyState)
+        """
+        try:
+            self.driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': _MONITOR_REDE})
+            self.driver.execute_script(_MONITOR_REDE)
+            self.monitor_rede = True
+        except (WebDriverException, AttributeError) as e:
+            logger.warning(f"Monitor de rede via CDP indisponível: {str(e)[:100]}")
+            self.monitor_rede = False
+        return self.monitor_rede
+
+    def _estado_pagina(self):
+        try:
+            return self.driver.execute_script(_ESTADO_PAGINA)
+        except WebDriverException:
+            # Documento trocando no meio da consulta
+            return None
+
+    def documento_pronto(self, timeout=None, exigir=True):
+        """Espera document.readyState == 'complete'."""
+        def _pronto(driver):
+            estado = self._estado_pagina()
+            return bool(estado) and estado[0] == 'complete' and not estado[3]
+        return self.ate(_pronto, 'documento pronto', timeout, exigir)
+
+    def rede_ociosa(self, ociosidade=0.5, timeout=None, exigir=True):
+        """Espera o documento carregado e nenhuma requisição XHR/fetch por `ociosidade` segundos."""
+        def _ociosa(driver):
+            estado = self._estado_pagina()
+            if not estado or estado[0] != 'complete' or estado[3]:
+                return False
+            pendentes, parado = estado[1], estado[2]
+            return pendentes <= 0 and (parado < 0 or parado >= ociosidade * 1000)
+        return self.ate(_ociosa, 'rede ociosa', timeout, exigir)
+
+    def postback_concluido(self, ociosidade=0.3, timeout=None, exigir=True):
+        """
+        Espera o fim do postback do ASP.NET: documento carregado (postback completo),
+        PageRequestManager fora de postback assíncrono (UpdatePanel), jQuery sem
+        requisições ativas e rede parada por `ociosidade` segundos.
+        """
+        def _concluido(driver):
+            estado = self._estado_pagina()
+            if not estado:
+                return False
+            pronto, pendentes, parado, saindo, assincrono, jquery = estado
+            if pronto != 'complete' or saindo or assincrono or jquery:
+                return False
+            return pendentes <= 0 and (parado < 0 or parado >= ociosidade * 1000)
+        return self.ate(_concluido, 'postback concluído', timeout, exigir)
+
+    # --- downloads ----------------------------------------------------------
+
+    def download_concluido(self, pasta, desde, timeout=300, exigir=True):
+        """
+        Espera um arquivo novo (modificado depois de `desde`, em time.time()) na pasta
+        de downloads, sem nenhum download parcial em andamento.
+
+        Returns:
+            str | None: Caminho do arquivo baixado
+        """
+        def _concluido(driver):
+            arquivos = glob.glob(os.path.join(pasta, '*'))
+            if any(arquivo.lower().endswith(EXTENSOES_PARCIAIS) for arquivo in arquivos):
+                return False
+            try:
+                novos = {arquivo: os.path.getmtime(arquivo) for arquivo in arquivos}
+            except OSError:
+                # Arquivo renomeado/removido entre o glob e o stat (fim do download)
+                return False
+            novos = {arquivo: modificado for arquivo, modificado in novos.items() if modificado >= desde}
+            return max(novos, key=novos.get) if novos else False
+        return self.ate(_concluido, 'download concluído', timeout, exigir)
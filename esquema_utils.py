@@ -0,0 +1,195 @@
+import logging
+import re
+
+import pandas as pd
+
+from coercao_utils import converter_colunas_booleanas, converter_colunas_inteiras
+from datas_utils import converter_colunas_datas
+from normalizacao_utils import normalizar_texto
+
+logger = logging.getLogger(__name__)
+
+# Tipo lógico (usado nos conversores) a partir do tipo SQL da coluna
+_TIPOS_LOGICOS = (
+    (re.compile(r'^(var)?char\b|^text\b', re.IGNORECASE), 'texto'),
+    (re.compile(r'^(small|big)?int(eger)?\b|^(big)?serial\b', re.IGNORECASE), 'inteiro'),
+    (re.compile(r'^(decimal|numeric|real|double|float)\b', re.IGNORECASE), 'decimal'),
+    (re.compile(r'^date\b', re.IGNORECASE), 'data'),
+    (re.compile(r'^timestamp\b', re.IGNORECASE), 'data_hora'),
+    (re.compile(r'^time\b', re.IGNORECASE), 'hora'),
+    (re.compile(r'^bool(ean)?\b', re.IGNORECASE), 'booleano'),
+)
+
+_TAMANHO = re.compile(r'^(?:var)?char\s*\(\s*(\d+)\s*\)', re.IGNORECASE)
+
+
+class Coluna:
+    """
+    Uma coluna da tabela de destino.
+
+    Args:
+        nome: Nome da coluna no banco (e no DataFrame tratado)
+        tipo_sql: Tipo no DDL (ex.: 'VARCHAR(50)', 'DECIMAL(10, 2)'); None quando a
+            tabela é mantida fora destes scripts e só a ordem/upsert são usados
+        origem: Cabeçalho no arquivo exportado (None = não vem do arquivo)
+        restricao: Complemento do DDL na própria coluna (ex.: 'primary key')
+        imutavel: Não é atualizada no ON CONFLICT
+        critica: Sempre atualizada no ON CONFLICT, mesmo com NULL
+        categorica: Lida como category (colunas repetitivas)
+        texto_decimal: Coluna inteira que chega formatada como decimal ('1.234,5')
+        gerada: Preenchida pelo banco (ex.: SERIAL); só entra no DDL, não na carga
+    """
+
+    def __init__(self, nome, tipo_sql=None, origem=None, restricao=None, imutavel=False,
+                 critica=False, categorica=False, texto_decimal=False, gerada=False):
+        self.nome = nome
+        self.tipo_sql = tipo_sql
+        self.origem = origem
+        self.restricao = restricao
+        self.imutavel = imutavel
+        self.critica = critica
+        self.categorica = categorica
+        self.texto_decimal = texto_decimal
+        self.gerada = gerada
+
+        self.tipo = None
+        self.tamanho = None
+        if tipo_sql:
+            self.tipo = next((tipo for padrao, tipo in _TIPOS_LOGICOS if padrao.match(tipo_sql)), None)
+            tamanho = _TAMANHO.match(tipo_sql)
+            self.tamanho = int(tamanho.group(1)) if tamanho else None
+
+    def __repr__(self):
+        return f"Coluna({self.nome!r}, {self.tipo_sql!r})"
+
+
+class Esquema:
+    """
+    Definição única de uma tabela: a partir da lista de colunas são pré-calculados
+    uma vez (na importação) o mapa de renomeação, os dtypes de leitura, as colunas
+    por tipo para os conversores, os limites de texto, o DDL, a ordem do COPY e a
+    cláusula SET do upsert.
+    """
+
+    def __init__(self, tabela, colunas, chave, restricoes=()):
+        self.tabela = tabela
+        self.definicoes = [c for c in colunas if not c.gerada]
+        self.geradas = [c for c in colunas if c.gerada]
+        self.chave = tuple(chave)
+        self.restricoes = tuple(restricoes)
+
+        self.colunas = [c.nome for c in self.definicoes]
+        self.mapeamento = {c.origem: c.nome for c in self.definicoes if c.origem}
+        self.origens_categoricas = {c.origem for c in self.definicoes if c.origem and c.categorica}
+        self.dtypes_leitura = {
+            origem: ('category' if origem in self.origens_categoricas else str)
+            for origem in self.mapeamento
+        }
+        self.limites = {c.nome: c.tamanho for c in self.definicoes if c.tamanho}
+        self.imutaveis = set(self.chave) | {c.nome for c in self.definicoes if c.imutavel}
+        self.criticas = {c.nome for c in self.definicoes if c.critica}
+
+        self.por_tipo = {}
+        for c in self.definicoes:
+            self.por_tipo.setdefault(c.tipo, []).append(c.nome)
+        self.texto_decimal = [c.nome for c in self.definicoes if c.texto_decimal]
+
+        self.ddl = self._montar_ddl()
+        self.set_upsert = self._montar_set_upsert()
+
+    def colunas_do_tipo(self, *tipos):
+        return [nome for tipo in tipos for nome in self.por_tipo.get(tipo, [])]
+
+    def _montar_ddl(self):
+        todas = self.geradas + self.definicoes
+        if any(c.tipo_sql is None for c in todas):
+            return None
+        linhas = [' '.join(filter(None, (c.nome, c.tipo_sql, c.restricao))) for c in todas]
+        linhas.extend(self.restricoes)
+        corpo = ',\n            '.join(linhas)
+        return f"""
+        CREATE TABLE IF NOT EXISTS {self.tabela} (
+            {corpo}
+        )
+    """
+
+    def _montar_set_upsert(self):
+        """SET do ON CONFLICT: críticas sempre atualizadas, demais só quando o novo valor não é NULL"""
+        atualizaveis = [c for c in self.colunas if c not in self.imutaveis]
+        return [
+            f"{col} = EXCLUDED.{col}" if col in self.criticas
+            else f"{col} = COALESCE(EXCLUDED.{col}, {self.tabela}.{col})"
+            for col in atualizaveis
+        ]
+
+    def clausula_conflito(self, substituir_nulos=False):
+        """
+        `ON CONFLICT (chave) DO UPDATE SET ...` pronto para o INSERT.
+
+        Args:
+            substituir_nulos: Se True, todas as colunas atualizáveis recebem EXCLUDED
+                (inclusive NULL), como nos upserts simples dos scripts de itens
+        """
+        if substituir_nulos:
+            sets = [f"{col} = EXCLUDED.{col}" for col in self.colunas if col not in self.imutaveis]
+        else:
+            sets = self.set_upsert
+        return f"ON CONFLICT ({', '.join(self.chave)}) DO UPDATE SET {', '.join(sets)}"
+
+    def renomear(self, df):
+        """Renomeia os cabeçalhos do export e mantém só as colunas do esquema (na ordem da tabela)"""
+        df = df.rename(columns={k: v for k, v in self.mapeamento.items() if k in df.columns})
+        return df[[col for col in self.colunas if col in df.columns]]
+
+    def converter(self, df, layout=None, inteiro_estrito=False, tipos=None):
+        """
+        Aplica os conversores vetorizados de cada tipo lógico às colunas presentes.
+
+        Args:
+            df: DataFrame já renomeado
+            layout: Chave do cache de formatos de data (normalmente o cabeçalho do arquivo)
+            inteiro_estrito: Regra de inteiros do Pedidos.py (só dígitos, ver converter_inteiros)
+            tipos: Restringe aos tipos informados (ex.: ('decimal', 'inteiro')); None = todos
+
+        Returns:
+            pd.DataFrame: DataFrame convertido (texto normalizado e truncado pelos limites do DDL)
+        """
+        def _ativo(tipo):
+            return tipos is None or tipo in tipos
+
+        if _ativo('data'):
+            df = converter_colunas_datas(df, self.colunas_do_tipo('data'), layout=layout)
+
+        if _ativo('hora'):
+            for col in self.colunas_do_tipo('hora'):
+                if col in df.columns:
+                    df[col] = pd.to_datetime(df[col], errors='coerce').dt.time
+
+        if _ativo('decimal'):
+            for col in self.colunas_do_tipo('decimal') + self.texto_decimal:
+                if col in df.columns:
+                    df[col] = _texto_para_decimal(df[col])
+
+        if _ativo('inteiro'):
+            df = converter_colunas_inteiras(df, self.colunas_do_tipo('inteiro'), padrao=0, estrito=inteiro_estrito)
+
+        if _ativo('booleano'):
+            df = converter_colunas_booleanas(df, self.colunas_do_tipo('booleano'), padrao=False)
+
+        if _ativo('texto'):
+            df = normalizar_texto(df, self.limites)
+
+        return df
+
+
+def _texto_para_decimal(serie):
+    """'R$ 1.234,56' -> 1234.56 (float32); inválidos viram NaN"""
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie
+    texto = (
+        serie.astype(object)
+        .str.replace('R$', '', regex=False)
+        .str.replace('.', '', regex=False)   # separador de milhares
+        .str.replace(',', '.', regex=False)
+    )
+    return pd.to_numeric(texto, errors='coerce', downcast='float')
@@ -0,0 +1,161 @@
+"""
+Registro dos esquemas das tabelas carregadas pelos scripts.
+
+Cada tabela é declarada uma única vez (cabeçalho do export, coluna, tipo SQL e
+flags de upsert); mapa de renomeação, DDL, limites de texto, ordem do COPY e
+SET do upsert são derivados daqui por esquema_utils.Esquema.
+"""
+from esquema_utils import Coluna, Esquema
+
+PEDIDOS = Esquema('pedidos', [
+    Coluna('CodigoPedido', 'VARCHAR(30)', origem='CodigoPedido', restricao='primary key'),
+    Coluna('CodExternoPedido', 'VARCHAR(50)', origem='Cód Externo Pedido'),
+    Coluna('SituacaoFiscal', 'VARCHAR(50)', origem='SituaçãoFiscal', critica=True, categorica=True),
+    Coluna('NotaFiscal', 'VARCHAR(50)', origem='NotaFiscal'),
+    Coluna('Pessoa', 'VARCHAR(20)', origem='Pessoa'),
+    Coluna('NomePessoa', 'VARCHAR(255)', origem='NomePessoa'),
+    Coluna('Papel', 'VARCHAR(50)', origem='Papel', categorica=True),
+    Coluna('OrdemPedido', 'VARCHAR(50)', origem='Ordem de Pedido'),
+    Coluna('QtdeItens', 'INT', origem='QtdeItens'),
+    Coluna('QtdeMateriais', 'INT', origem='QtdeMateriais'),
+    Coluna('ValorPedido', 'DECIMAL(10, 2)', origem='ValorPedido'),
+    Coluna('ValorTotalSemCCR', 'DECIMAL(10, 2)', origem='ValorTotalSemCCR'),
+    Coluna('ValorTabela', 'DECIMAL(10, 2)', origem='ValorTabela'),
+    Coluna('ValorPraticado', 'DECIMAL(10, 2)', origem='ValorPraticado'),
+    Coluna('ValorLiquido', 'DECIMAL(10, 2)', origem='ValorLiquido'),
+    Coluna('ValorProdutosRegulares', 'DECIMAL(10, 2)', origem='ValorProdutosRegulares'),
+    Coluna('ValorPraticadoProdutosRegulares', 'DECIMAL(10, 2)', origem='ValorPraticadoProdutosRegulares'),
+    Coluna('ValorTabelaProdutosRegulares', 'DECIMAL(10, 2)', origem='ValorTabelaProdutosRegulares'),
+    Coluna('MeioCaptacao', 'VARCHAR(100)', origem='MeioCaptacao', categorica=True),
+    Coluna('TipoEntrega', 'VARCHAR(100)', origem='Tipo de Entrega', categorica=True),
+    Coluna('SituacaoComercial', 'VARCHAR(100)', origem='SituaçãoComercial', critica=True, categorica=True),
+    Coluna('DetalheSituacaoComercial', 'VARCHAR(255)', origem='DetalheSituaçãoComercial', critica=True, categorica=True),
+    Coluna('SituacaoIntegracaoExterna', 'VARCHAR(100)', origem='SituacaoIntegracaoExterna', critica=True, categorica=True),
+    Coluna('DetalheSituacaoIntExterna', 'VARCHAR(255)', origem='DetalheSituacaoIntExterna', categorica=True),
+    Coluna('DataCaptacao', 'DATE', origem='Data Captação', imutavel=True),
+    Coluna('HoraPedido', 'TIME', origem='HoraPedido'),
+    Coluna('DataAprovacao', 'DATE', origem='Data Aprovação'),
+    Coluna('DataMarketing', 'DATE', origem='Data Marketing'),
+    Coluna('PrevisaoEntrega', 'DATE', origem='PrevisãoEntrega'),
+    Coluna('DataEntrega', 'DATE', origem='DataEntrega'),
+    Coluna('DataAutorizacaoFaturamento', 'DATE', origem='DataAutorizaçãoFaturamento'),
+    Coluna('CodLinhaSeparacao', 'VARCHAR(50)', origem='Cód Linha de Separação'),
+    Coluna('DataFaturamento', 'DATE', origem='DataFaturamento'),
+    Coluna('CicloCaptacao', 'VARCHAR(50)', origem='Ciclo Captação', categorica=True),
+    Coluna('SubCiclo', 'VARCHAR(50)', origem='SubCiclo', categorica=True),
+    Coluna('CicloMarketing', 'VARCHAR(50)', origem='Ciclo Marketing', categorica=True),
+    Coluna('CicloIndicador', 'VARCHAR(50)', origem='CicloIndicador', categorica=True),
+    Coluna('CicloCancelamento', 'VARCHAR(50)', origem='CicloCancelamento', categorica=True),
+    Coluna('CaptacaoRestrita', 'BOOLEAN', origem='CaptacaoRestrita', categorica=True),
+    Coluna('DiaCiclo', 'INT', origem='Dia do Ciclo'),
+    Coluna('PlanoPagamento', 'VARCHAR(255)', origem='PlanoPagamento', categorica=True),
+    Coluna('Logradouro', 'VARCHAR(255)', origem='Logradouro'),
+    Coluna('Complemento', 'VARCHAR(255)', origem='Complemento'),
+    Coluna('Bairro', 'VARCHAR(100)', origem='Bairro'),
+    Coluna('Cidade', 'VARCHAR(100)', origem='Cidade'),
+    Coluna('UF', 'CHAR(2)', origem='UF', categorica=True),
+    Coluna('CEP', 'VARCHAR(15)', origem='CEP'),
+    Coluna('Referencia', 'VARCHAR(255)', origem='Referência'),
+    Coluna('LogradouroEntrega', 'VARCHAR(255)', origem='LogradouroEntrega'),
+    Coluna('ComplementoEntregaRetirada', 'VARCHAR(255)', origem='ComplementoEntregaRetirada'),
+    Coluna('BairroEntregaRetirada', 'VARCHAR(100)', origem='BairroEntregaRetirada'),
+    Coluna('CidadeEntregaRetirada', 'VARCHAR(100)', origem='CidadeEntregaRetirada'),
+    Coluna('UFEntregaRetirada', 'CHAR(2)', origem='UFEntregaRetirada', categorica=True),
+    Coluna('CEPEntregaRetirada', 'VARCHAR(15)', origem='CEPEntregaRetirada'),
+    Coluna('ReferenciaEntregaRetirada', 'VARCHAR(255)', origem='ReferênciaEntregaRetirada'),
+    Coluna('Telefone', 'VARCHAR(20)', origem='Telefone'),
+    Coluna('CodModeloComercial', 'VARCHAR(50)', origem='CódModeloComercial', categorica=True),
+    Coluna('ModeloComercial', 'VARCHAR(255)', origem='ModeloComercial', categorica=True),
+    Coluna('CodEstruturaPai', 'VARCHAR(50)', origem='Cód Estrutura Pai'),
+    Coluna('EstruturaPai', 'VARCHAR(255)', origem='EstruturaPai'),
+    Coluna('CodEstrutura', 'VARCHAR(50)', origem='Cód Estrutura'),
+    Coluna('Estrutura', 'VARCHAR(255)', origem='Estrutura'),
+    Coluna('ResponsavelEstrutura', 'VARCHAR(255)', origem='Responsável Estrutura'),
+    Coluna('TelefoneResponsavel', 'VARCHAR(20)', origem='Telefone Responsável'),
+    Coluna('CodUsuarioCriacao', 'VARCHAR(30)', origem='Cód Usuário Criação', imutavel=True),
+    Coluna('UsuarioCriacao', 'VARCHAR(255)', origem='Usuario de Criação', imutavel=True),
+    Coluna('CodUsuarioFinalizacao', 'VARCHAR(30)', origem='Cód Usuário Finalização'),
+    Coluna('UsuarioFinalizacao', 'VARCHAR(255)', origem='Usuario de Finalização'),
+    Coluna('Volume', 'INT', origem='Volume', texto_decimal=True),
+    Coluna('PesoEstimado', 'DECIMAL(10, 2)', origem='PesoEstimado'),
+    Coluna('PesoReal', 'DECIMAL(10, 2)', origem='PesoReal'),
+    Coluna('LoteSeparacao', 'VARCHAR(50)', origem='Lote de separação'),
+    Coluna('CodCD', 'VARCHAR(50)', origem='CódCD', categorica=True),
+    Coluna('CanalDistribuicao', 'VARCHAR(100)', origem='CanalDistribuicao', categorica=True),
+    Coluna('DetalheMeioCaptacao', 'VARCHAR(255)', origem='Detalhe Entrega', categorica=True),
+], chave=['CodigoPedido'])
+
+ITENS_PEDIDOS = Esquema('itens_pedidos', [
+    Coluna('CodigoPedido', 'VARCHAR(30)', origem='Código Pedido'),
+    Coluna('CodigoProduto', 'VARCHAR(30)', origem='Código Produto'),
+    Coluna('Produto', 'VARCHAR(200)', origem='Produto'),
+    Coluna('DataCaptacao', 'DATE', origem='Data captação pedido'),
+    Coluna('CicloCaptacao', 'VARCHAR(10)', origem='Ciclo captação pedido'),
+    Coluna('DataFaturamento', 'DATE', origem='Data faturamento'),
+    Coluna('CicloFaturamento', 'VARCHAR(10)', origem='Ciclo faturamento'),
+    Coluna('Pessoa', 'VARCHAR(30)', origem='Código Revendedor'),
+    Coluna('NomePessoa', 'VARCHAR(255)', origem='Revendedor'),
+    Coluna('Papel', 'VARCHAR(20)', origem='Papel'),
+    Coluna('SituacaoFiscal', 'VARCHAR(40)', origem='Situação Fiscal'),
+    Coluna('NotaFiscal', 'VARCHAR(30)', origem='Nota Fiscal'),
+    Coluna('MeioCaptacao', 'VARCHAR(30)', origem='Meio de captação'),
+    Coluna('CodPlanoPagamento', 'VARCHAR(30)', origem='Código plano pagamento'),
+    Coluna('PlanoPagamento', 'VARCHAR(255)', origem='Plano de pagamento'),
+    Coluna('TipoEntrega', 'VARCHAR(30)', origem='Tipo de Entrega'),
+    Coluna('CodUsuarioCriacao', 'VARCHAR(30)', origem='Código usuário criação'),
+    Coluna('UsuarioCriacao', 'VARCHAR(255)', origem='Usuário criação'),
+    Coluna('CodUsuarioFinalizacao', 'VARCHAR(30)', origem='Código usuário finalização'),
+    Coluna('UsuarioFinalizacao', 'VARCHAR(255)', origem='Usuário finalização'),
+    Coluna('CodCD', 'VARCHAR(30)', origem='Código CD'),
+    Coluna('CanalDistribuicao', 'VARCHAR(255)', origem='Canal de distribuição'),
+    Coluna('QtdItens', 'INT', origem='Qtde'),
+    Coluna('ValorTabela', 'DECIMAL(10, 2)', origem='Total Tabela'),
+    Coluna('ValorPraticado', 'DECIMAL(10, 2)', origem='Total Praticado'),
+    Coluna('ValorLiquido', 'DECIMAL(10, 2)', origem='Total Líquido'),
+], chave=['CodigoPedido', 'CodigoProduto'], restricoes=[
+    'PRIMARY KEY (CodigoPedido, CodigoProduto)',
+    'FOREIGN KEY (CodigoPedido) REFERENCES pedidos(codigopedido) ON DELETE CASCADE',
+])
+
+# Tabela das vendas/cortes (Estoque.py e VendasCortes.py)
+ITENS_PEDIDO = Esquema('itens_pedido', [
+    Coluna('id', 'SERIAL', restricao='PRIMARY KEY', gerada=True),
+    Coluna('codigopedido', 'VARCHAR(20)', origem='Código Pedido'),
+    Coluna('codigo_produto', 'VARCHAR(10)', origem='Código Produto'),
+    Coluna('nome_produto', 'TEXT', origem='Nome Produto'),
+    Coluna('cod_est_pai', 'VARCHAR(10)', origem='Cód Est Pai'),
+    Coluna('estrutura_pai', 'TEXT', origem='Estrutura Pai'),
+    Coluna('cod_est_com', 'VARCHAR(10)', origem='CodEstCom'),
+    Coluna('nome_est_com', 'TEXT', origem='NomeEstCom'),
+    Coluna('responsavel_est_com', 'VARCHAR(20)', origem='Responsável Est Com'),
+    Coluna('quantidade', 'INTEGER', origem='Quantidade'),
+    Coluna('codigo_pessoa', 'VARCHAR(20)', origem='Código Pessoa'),
+    Coluna('nome_pessoa', 'TEXT', origem='Nome Pessoa'),
+    Coluna('data_pedido', 'TIMESTAMP', origem='Data Pedido'),
+    Coluna('ciclo', 'VARCHAR(10)', origem='Ciclo'),
+    Coluna('subciclo', 'VARCHAR(10)', origem='SubCiclo'),
+    Coluna('situacao_pedido', 'VARCHAR(20)', origem='Situação pedido'),
+    Coluna('nome_modelo_comercial', 'TEXT', origem='Nome Modelo Comercial'),
+], chave=['codigopedido', 'codigo_produto'], restricoes=[
+    'UNIQUE (codigopedido, codigo_produto)',
+    'FOREIGN KEY (codigopedido) REFERENCES pedidos(CodigoPedido)',
+])
+
+# Tabelas alimentadas por planilhas (itens_make_skin.py e metas_consultores.py).
+# O DDL é mantido no banco; aqui ficam só a ordem das colunas e a chave do upsert.
+MARCAS_PRODUTO = Esquema('marcas_produto', [
+    Coluna('CodigoProduto'),
+    Coluna('Produto'),
+    Coluna('Marca'),
+], chave=['CodigoProduto'])
+
+METAS_REVENDEDORES = Esquema('metas_revendedores', [
+    Coluna('id_colaborador'),
+    Coluna('ciclo'),
+    Coluna('nome'),
+    Coluna('setor'),
+    Coluna('estrutura'),
+    Coluna('metaciclo'),
+    Coluna('canal'),
+    Coluna('eudora'),
+], chave=['id_colaborador', 'ciclo'])
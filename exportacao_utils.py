@@ -0,0 +1,239 @@
+import io
+import logging
+import os
+import re
+import time
+from email.message import Message
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from download_utils import caminho_livre
+
+logger = logging.getLogger(__name__)
+
+# Modo opcional: EXPORTACAO_HTTP=1 busca a fila de exportações e o arquivo por HTTP,
+# com os cookies do navegador já logado. URL_FILA_EXPORTACOES é a página da fila
+# (a mesma aberta pelo menu menu-cod-8 > ... > li[3]).
+URL_FILA_EXPORTACOES = os.getenv('URL_FILA_EXPORTACOES')
+
+BOTAO_DOWNLOAD = 'ContentPlaceHolder1_exportacoesGrid_baixarButton_0_btn_0'
+BOTAO_ATUALIZAR = 'ContentPlaceHolder1_atualizarButton_btn'
+ALERTA = 'msgAlert'
+
+_POSTBACK = re.compile(r"""__doPostBack\(\s*['"]([^'"]*)['"]\s*,\s*['"]([^'"]*)['"]\s*\)""")
+_OCULTO = re.compile(r'display\s*:\s*none', re.IGNORECASE)
+
+
+def exportacao_http_ativa():
+    """True se o modo de exportação por HTTP estiver ligado (EXPORTACAO_HTTP=1)."""
+    return os.getenv('EXPORTACAO_HTTP', '0') == '1'
+
+
+class _Pagina(HTMLParser):
+    """Campos ocultos do formulário ASP.NET e elementos com id de uma página da fila."""
+
+    def __init__(self, url, html):
+        super().__init__(convert_charrefs=True)
+        self.url = url
+        self.acao = url
+        self.campos = {}
+        self.elementos = {}
+        self.feed(html)
+        self.close()
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {nome: valor or '' for nome, valor in attrs}
+        if attrs.get('id'):
+            self.elementos[attrs['id']] = (tag, attrs)
+        if tag == 'form' and attrs.get('action'):
+            self.acao = urljoin(self.url, attrs['action'])
+        elif tag == 'input' and attrs.get('name') and attrs.get('type', 'text').lower() == 'hidden':
+            self.campos[attrs['name']] = attrs.get('value', '')
+
+    @property
+    def alerta(self):
+        elemento = self.elementos.get(ALERTA)
+        return elemento is not None and not _OCULTO.search(elemento[1].get('style', ''))
+
+    def postback(self, id_elemento):
+        """Dados do POST equivalentes a clicar no elemento (botão com name ou __doPostBack)."""
+        tag, attrs = self.elementos[id_elemento]
+        dados = dict(self.campos)
+        alvo = _POSTBACK.search(attrs.get('href', '') + ' ' + attrs.get('onclick', ''))
+        if alvo:
+            dados['__EVENTTARGET'], dados['__EVENTARGUMENT'] = alvo.groups()
+        elif attrs.get('name'):
+            if attrs.get('type', '').lower() == 'image':
+                dados[f"{attrs['name']}.x"] = dados[f"{attrs['name']}.y"] = '1'
+            else:
+                dados[attrs['name']] = attrs.get('value', '')
+        else:
+            raise ValueError(f"Elemento {id_elemento} ({tag}) não dispara um postback reconhecível")
+        return dados
+
+
+def _nome_arquivo(resposta):
+    """Nome do arquivo pelo Content-Disposition (None se a resposta não for um anexo)."""
+    disposicao = resposta.headers.get('Content-Disposition')
+    if not disposicao:
+        return None
+    mensagem = Message()
+    mensagem['Content-Disposition'] = disposicao
+    nome = mensagem.get_filename()
+    return os.path.basename(nome) if nome else None
+
+
+class ClienteExportacoes:
+    """
+    Fila de exportações do SGI por HTTP, sem renderizar páginas no navegador.
+
+    Reaproveita a sessão autenticada (cookies e User-Agent do Selenium) num
+    requests.Session com pool de conexões e retry, consulta a grade de
+    exportações, reenvia o postback do botão "Atualizar" até o arquivo ficar
+    pronto e baixa o arquivo em streaming para disco ou para memória.
+
+    Args:
+        url_fila: URL da página da fila de exportações
+        sessao: requests.Session já autenticada (None = sessão nova)
+        intervalo: Segundos entre as consultas à fila
+        timeout: Timeout (conexão, leitura) de cada requisição, em segundos
+    """
+
+    def __init__(self, url_fila, sessao=None, intervalo=5, timeout=60):
+        self.url_fila = url_fila
+        self.intervalo = intervalo
+        self.timeout = (10, timeout)
+        self.sessao = sessao or requests.Session()
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(502, 503, 504),
+                      allowed_methods=frozenset({'GET', 'POST'}))
+        adaptador = HTTPAdapter(pool_connections=2, pool_maxsize=4, max_retries=retry)
+        self.sessao.mount('https://', adaptador)
+        self.sessao.mount('http://', adaptador)
+
+    @classmethod
+    def do_navegador(cls, driver, url_fila, **kwargs):
+        """Cliente com os cookies e o User-Agent da sessão logada no Selenium."""
+        sessao = requests.Session()
+        for cookie in driver.get_cookies():
+            sessao.cookies.set(cookie['name'], cookie['value'],
+                               domain=cookie.get('domain'), path=cookie.get('path', '/'))
+        try:
+            sessao.headers['User-Agent'] = driver.execute_script('return navigator.userAgent')
+        except Exception:
+            pass  # Mantém o User-Agent padrão do requests
+        return cls(url_fila, sessao=sessao, **kwargs)
+
+    def fechar(self):
+        self.sessao.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def _verificar(self, resposta):
+        resposta.raise_for_status()
+        if 'Entrar.aspx' in resposta.url:
+            raise ValueError("Sessão do SGI expirada: a fila redirecionou para o login")
+        return resposta
+
+    def consultar(self):
+        """Carrega a fila (equivale a abrir/recarregar a página)."""
+        resposta = self._verificar(self.sessao.get(self.url_fila, timeout=self.timeout))
+        return _Pagina(resposta.url, resposta.text)
+
+    def _postback(self, pagina, id_elemento, **kwargs):
+        return self._verificar(self.sessao.post(pagina.acao, data=pagina.postback(id_elemento),
+                                                timeout=self.timeout, **kwargs))
+
+    def aguardar_arquivo(self, timeout=600):
+        """
+        Consulta a fila até o botão de download do export mais recente aparecer.
+
+        Raises:
+            TimeoutError: Se o arquivo não ficar pronto no prazo
+        """
+        limite = time.monotonic() + timeout
+        pagina = self.consultar()
+        consultas = 1
+        while BOTAO_DOWNLOAD not in pagina.elementos:
+            if time.monotonic() >= limite:
+                raise TimeoutError(f"Exportação não ficou pronta em {timeout}s ({consultas} consultas)")
+            time.sleep(self.intervalo)
+            if pagina.alerta or BOTAO_ATUALIZAR not in pagina.elementos:
+                logger.info("Alerta na fila de exportações. Recarregando...")
+                pagina = self.consultar()
+            else:
+                resposta = self._postback(pagina, BOTAO_ATUALIZAR)
+                pagina = _Pagina(resposta.url, resposta.text)
+            consultas += 1
+        logger.info(f"Exportação pronta após {consultas} consultas à fila")
+        return pagina
+
+    def baixar(self, destino=None, timeout=600, tamanho_bloco=1024 * 1024):
+        """
+        Espera o export ficar pronto e baixa o arquivo em streaming.
+
+        Args:
+            destino: Pasta onde gravar o arquivo; None para devolver em memória
+            timeout: Tempo máximo de espera pela fila, em segundos
+
+        Returns:
+            str | tuple[str, io.BytesIO]: Caminho gravado, ou (nome, conteúdo) sem `destino`
+        """
+        pagina = self.aguardar_arquivo(timeout)
+        inicio = time.perf_counter()
+        with self._postback(pagina, BOTAO_DOWNLOAD, stream=True) as resposta:
+            nome = _nome_arquivo(resposta)
+            if nome is None:
+                raise ValueError("A resposta do download não é um arquivo (sem Content-Disposition)")
+            blocos = resposta.iter_content(chunk_size=tamanho_bloco)
+
+            if destino is None:
+                conteudo = io.BytesIO()
+                for bloco in blocos:
+                    conteudo.write(bloco)
+                conteudo.seek(0)
+                logger.info(f"Download por HTTP concluído em memória: {nome} "
+                            f"({conteudo.getbuffer().nbytes} bytes em {time.perf_counter() - inicio:.1f}s)")
+                return nome, conteudo
+
+            os.makedirs(destino, exist_ok=True)
+            caminho = caminho_livre(destino, nome)
+            parcial = f"{caminho}.part"
+            try:
+                with open(parcial, 'wb') as arquivo:
+                    for bloco in blocos:
+                        arquivo.write(bloco)
+                os.replace(parcial, caminho)
+            finally:
+                if os.path.exists(parcial):
+                    os.remove(parcial)
+        logger.info(f"Download por HTTP concluído: {caminho} "
+                    f"({os.path.getsize(caminho)} bytes em {time.perf_counter() - inicio:.1f}s)")
+        return caminho
+
+
+def baixar_exportacao(driver, pasta, url_fila=None, timeout=600):
+    """
+    Baixa o export mais recente por HTTP com a sessão do navegador.
+
+    Returns:
+        str | None: Caminho do arquivo; None se o modo não estiver configurado ou
+        falhar (quem chama segue pelo navegador)
+    """
+    url_fila = url_fila or URL_FILA_EXPORTACOES
+    if not url_fila:
+        logger.warning("EXPORTACAO_HTTP=1 sem URL_FILA_EXPORTACOES; seguindo pelo navegador")
+        return None
+    try:
+        with ClienteExportacoes.do_navegador(driver, url_fila) as cliente:
+            return cliente.baixar(pasta, timeout=timeout)
+    except (requests.RequestException, ValueError, TimeoutError, OSError) as e:
+        logger.warning(f"Exportação por HTTP falhou ({str(e)[:200]}); seguindo pelo navegador")
+        return None
@@ -0,0 +1,364 @@
+"""
+Exporta vários relatórios do SGI numa única sessão do navegador.
+
+Em vez de cada script abrir o próprio Chrome, fazer login, exportar um relatório
+e sair, um só navegador faz login uma vez, agenda os exports no SGI (em rodadas
+sem dois relatórios do mesmo formato de arquivo) e só então vai à fila de
+exportações, baixando cada arquivo assim que fica pronto. A
+carga no banco de cada relatório começa em segundo plano logo após o download,
+enquanto os demais ainda estão sendo gerados; o tempo total fica próximo ao do
+relatório mais lento.
+
+Uso:
+    python exportar_relatorios.py                      # todos
+    python exportar_relatorios.py pedidos vendas_cortes
+    python exportar_relatorios.py --sem-carga estoque  # só baixa
+"""
+import argparse
+import fnmatch
+import importlib
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from selenium.common.exceptions import StaleElementReferenceException, TimeoutException, WebDriverException
+from selenium.webdriver.common.by import By
+
+import Pedidos  # navegador base (e configuração de log/.env, como nos demais scripts)
+from download_utils import criar_gerenciador
+from pipeline_utils import PipelineETL
+from sessao_utils import URL_SGI
+
+logger = logging.getLogger(__name__)
+
+# Menu até a fila de exportações (o mesmo de pegar_downloads)
+ELEMENTOS_FILA = (
+    '//*[@id="menu-cod-8"]/a',
+    '//*[@id="submenu-cod-8"]/div/div[1]/ul/li[10]/a',
+    '//*[@id="submenu-cod-8"]/div/div[1]/ul/li[10]/ul/li[3]/a',
+)
+BOTAO_DOWNLOAD = 'ContentPlaceHolder1_exportacoesGrid_baixarButton_{linha}_btn_{linha}'
+BOTAO_ATUALIZAR = '//*[@id="ContentPlaceHolder1_atualizarButton_btn"]'
+
+
+def _carregar_pedidos(modulo, arquivo):
+    banco = modulo.preparar_banco()
+    try:
+        modulo.executar_pipeline(
+            banco,
+            tamanho_chunk=int(os.getenv('PEDIDOS_TAMANHO_CHUNK', '50000')),
+            tamanho_fila=int(os.getenv('PEDIDOS_TAMANHO_FILA', '4')),
+            arquivo=arquivo,
+        ).resumo()
+    finally:
+        banco.fechar()
+
+
+def _carregar_itens_pedidos(modulo, arquivo):
+    banco = modulo.Banco()
+    try:
+        banco.inserirItensPedidos(modulo.TratarDados(arquivo).processar_arquivo_itens_pedidos())
+    finally:
+        banco.fechar()
+
+
+def _carregar_itens_analitico(modulo, arquivo):
+    # VendasCortes e Estoque: mesmo export analítico de itens, tabelas diferentes
+    banco = modulo.Banco()
+    try:
+        banco.inserirItensPedido(modulo.TratarDados(arquivo=arquivo).processar_arquivo_vendas())
+    finally:
+        banco.fechar()
+
+
+def _carregar_metas(modulo, arquivo):
+    banco = modulo.Banco()
+    try:
+        banco.inserirMetas(modulo.TratarDados(arquivo).processar_arquivo_metas())
+    finally:
+        banco.fechar()
+
+
+@dataclass(frozen=True)
+class Relatorio:
+    """Um tipo de export: script que o define, método que o agenda, formato do arquivo e carga."""
+    nome: str
+    modulo: str
+    agendar: str
+    padrao_arquivo: str
+    carregar: Callable
+
+
+RELATORIOS = {
+    relatorio.nome: relatorio for relatorio in (
+        Relatorio('pedidos', 'Pedidos', 'pegarPedidos', '*.csv', _carregar_pedidos),
+        Relatorio('itens_pedidos', 'itens_pedidos', 'pegarItensVendas', '*.xlsx', _carregar_itens_pedidos),
+        Relatorio('vendas_cortes', 'VendasCortes', 'pegarVendas', 'BuscarPedidosItensAnalitico_*',
+                  _carregar_itens_analitico),
+        Relatorio('estoque', 'Estoque', 'pegarVendas', 'BuscarPedidosItensAnalitico_*', _carregar_itens_analitico),
+        Relatorio('metas_consultores', 'metas_consultores', 'pegarItensVendas', '*.xlsx', _carregar_metas),
+    )
+}
+
+
+def rodadas(relatorios):
+    """
+    Separa os relatórios em rodadas sem dois do mesmo `padrao_arquivo`, mantendo a ordem.
+
+    Dentro de uma rodada a conferência do nome do arquivo só detecta uma linha da
+    fila trocada se os formatos forem distintos: vendas_cortes e estoque (mesmo
+    export analítico) ou itens_pedidos e metas_consultores (ambos .xlsx) agendados
+    juntos poderiam ter os arquivos trocados sem que nada acusasse.
+    """
+    resultado = []
+    for relatorio in relatorios:
+        for rodada in resultado:
+            if all(r.padrao_arquivo != relatorio.padrao_arquivo for r in rodada):
+                rodada.append(relatorio)
+                break
+        else:
+            resultado.append([relatorio])
+    return resultado
+
+
+class NavegadorRelatorios:
+    """
+    Navegador único, com um login, que agenda e coleta vários exports.
+
+    Os passos de cada relatório continuam nos métodos PegarGoogle dos scripts
+    (chamados com baixar=False); aqui eles rodam sobre o mesmo navegador.
+
+    A fila do SGI lista o export mais recente na linha 0: com N exports agendados
+    em sequência, o k-ésimo (a partir de 0) está na linha N-1-k. Para que essa conta
+    seja verificável, os relatórios são agendados e coletados em rodadas (ver
+    `rodadas`) sem formatos repetidos, e o nome do arquivo baixado é conferido com
+    `Relatorio.padrao_arquivo` antes da carga. Se um agendamento falhar, o export
+    pode ter entrado na fila mesmo assim e deslocado as linhas: a coleta daquela
+    rodada é abortada.
+
+    Args:
+        cargas_paralelas: Quantas cargas no banco podem rodar ao mesmo tempo
+        intervalo: Segundos entre as atualizações da fila
+    """
+
+    def __init__(self, cargas_paralelas=2, intervalo=5):
+        self.intervalo = intervalo
+        self.base = Pedidos.PegarGoogle()
+        self.driver = self.base.driver
+        self.wait = self.base.wait
+        self.esperas = self.base.esperas
+        self.sessao = self.base.sessao
+        self.download_dir = self.base.download_dir
+        self.downloads = criar_gerenciador(self.driver, self.base.download_dir)
+        self.pipeline = PipelineETL(max_tarefas=cargas_paralelas)
+        self.cargas = {}
+        self.arquivos = {}
+
+    def entrar(self):
+        return self.base.entrar()
+
+    def _adotar(self, modulo):
+        """PegarGoogle de outro script usando este navegador, sem abrir outro Chrome."""
+        return modulo.PegarGoogle(navegador=self)
+
+    # --- agendamento --------------------------------------------------------
+
+    def agendar(self, relatorios):
+        """
+        Agenda os exports em sequência, sem esperar nenhum ficar pronto.
+
+        Uma falha interrompe o agendamento: ela pode ter acontecido depois do clique
+        em exportar, e aí a fila tem uma linha a mais que a contagem de `coletar`
+        não enxerga.
+
+        Returns:
+            tuple[list[Relatorio], bool]: Relatórios agendados, na ordem de
+            agendamento, e False se algum agendamento falhou
+        """
+        agendados = []
+        for relatorio in relatorios:
+            logger.info(f"Agendando export: {relatorio.nome}")
+            try:
+                with self.pipeline.medir(f"agendar {relatorio.nome}"):
+                    modulo = importlib.import_module(relatorio.modulo)
+                    sucesso = getattr(self._adotar(modulo), relatorio.agendar)(baixar=False)
+            except Exception as e:
+                logger.error(f"Falha ao agendar {relatorio.nome}: {e}", exc_info=True)
+                sucesso = False
+            if sucesso is False:
+                # Os métodos de VendasCortes/Estoque retornam False em vez de lançar exceção
+                logger.error(f"Export de {relatorio.nome} não agendado")
+                self._voltar_ao_inicio()
+                return agendados, False
+            agendados.append(relatorio)
+        return agendados, True
+
+    def _voltar_ao_inicio(self):
+        """Fecha janelas extras e volta à página inicial, para o próximo relatório partir de um estado conhecido."""
+        self.base.fecharJanela()
+        self.driver.get(URL_SGI)
+        self.esperas.documento_pronto(exigir=False)
+
+    # --- coleta -------------------------------------------------------------
+
+    def _botao_pronto(self, linha):
+        botoes = self.driver.find_elements(By.ID, BOTAO_DOWNLOAD.format(linha=linha))
+        try:
+            return botoes[0] if botoes and botoes[0].is_displayed() and botoes[0].is_enabled() else None
+        except StaleElementReferenceException:
+            return None
+
+    def _alerta_visivel(self):
+        alertas = self.driver.find_elements(By.ID, 'msgAlert')
+        try:
+            return bool(alertas) and alertas[0].is_displayed()
+        except StaleElementReferenceException:
+            return False
+
+    def _baixar(self, botao, timeout=300):
+        inicio = time.time()
+        marca = self.downloads.marcar() if self.downloads else None
+        self.driver.execute_script("arguments[0].click();", botao)
+        if self.downloads:
+            return self.downloads.aguardar(marca, timeout)
+        # Sem CDP os cliques são sequenciais: o arquivo novo desde o clique é o deste export
+        return self.esperas.download_concluido(self.base.download_dir, inicio, timeout=timeout, exigir=False)
+
+    def coletar(self, agendados, carregar=True, timeout=None):
+        """
+        Baixa cada export assim que fica pronto e, com `carregar`, inicia a carga
+        no banco em segundo plano.
+
+        Returns:
+            dict: {nome do relatório: caminho do arquivo} dos exports baixados
+        """
+        timeout = timeout or float(os.getenv('RELATORIOS_TIMEOUT_FILA', '3600'))
+        limite = time.monotonic() + timeout
+        total = len(agendados)
+        pendentes = {total - 1 - ordem: relatorio for ordem, relatorio in enumerate(agendados)}
+
+        for xpath in ELEMENTOS_FILA:
+            self.esperas.clicar(By.XPATH, xpath, postback=True)
+
+        while pendentes:
+            for linha, relatorio in sorted(pendentes.items()):
+                botao = self._botao_pronto(linha)
+                if botao is None:
+                    continue
+                with self.pipeline.medir(f"baixar {relatorio.nome}"):
+                    arquivo = self._baixar(botao)
+                del pendentes[linha]
+                self._registrar_download(relatorio, arquivo, carregar)
+
+            if not pendentes:
+                break
+            if time.monotonic() >= limite:
+                logger.error(f"Tempo limite da fila excedido ({timeout:.0f}s); não baixados: "
+                             f"{', '.join(r.nome for r in pendentes.values())}")
+                break
+
+            # Intervalo entre consultas à fila (o SGI não avisa quando o export fica pronto)
+            time.sleep(self.intervalo)
+            if self._alerta_visivel():
+                logger.info("Alerta detectado. Recarregando a fila...")
+                self.driver.refresh()
+                self.esperas.documento_pronto()
+                continue
+            try:
+                self.esperas.clicar(By.XPATH, BOTAO_ATUALIZAR, timeout=10, postback=True)
+            except TimeoutException:
+                pass
+        return dict(self.arquivos)
+
+    def _registrar_download(self, relatorio, arquivo, carregar):
+        if not arquivo:
+            logger.error(f"Download de {relatorio.nome} não concluído")
+            return
+        nome = os.path.basename(arquivo)
+        if not fnmatch.fnmatch(nome, relatorio.padrao_arquivo):
+            logger.error(f"Arquivo {nome} não corresponde a {relatorio.nome} ({relatorio.padrao_arquivo}); "
+                         "a ordem da fila não bate com a do agendamento. Carga ignorada.")
+            return
+        logger.info(f"{relatorio.nome}: {nome} baixado")
+        self.arquivos[relatorio.nome] = arquivo
+        if carregar:
+            modulo = importlib.import_module(relatorio.modulo)
+            self.cargas[relatorio.nome] = self.pipeline.em_segundo_plano(
+                f"carregar {relatorio.nome}", relatorio.carregar, modulo, arquivo
+            )
+
+    # --- execução -----------------------------------------------------------
+
+    def executar(self, relatorios, carregar=True):
+        """Agenda e coleta os relatórios, uma rodada por vez (ver `rodadas`). Retorna {nome: arquivo}."""
+        for numero, rodada in enumerate(rodadas(relatorios), 1):
+            logger.info(f"Rodada {numero}: {', '.join(r.nome for r in rodada)}")
+            if numero > 1:
+                self._voltar_ao_inicio()
+            agendados, consistente = self.agendar(rodada)
+            if not consistente:
+                logger.error(f"Rodada {numero} abortada: a falha no agendamento pode ter deixado um export "
+                             f"a mais na fila. Não baixados: {', '.join(r.nome for r in rodada)}")
+                continue
+            if agendados:
+                self.coletar(agendados, carregar=carregar)
+        return dict(self.arquivos)
+
+    def aguardar_cargas(self):
+        """Espera as cargas em segundo plano. Retorna {nome: True/False}."""
+        resultados = {}
+        for nome, futuro in self.cargas.items():
+            try:
+                futuro.result()
+                resultados[nome] = True
+            except Exception as e:
+                logger.error(f"Falha na carga de {nome}: {e}", exc_info=True)
+                resultados[nome] = False
+        self.pipeline.aguardar()
+        self.pipeline.resumo()
+        return resultados
+
+    def fechar(self):
+        if self.downloads:
+            self.downloads.parar()
+        try:
+            self.base.fechar()
+        except WebDriverException as e:
+            logger.error(f"Erro ao fechar o navegador: {e}")
+
+
+def configurar_por_linha_de_comando():
+    parser = argparse.ArgumentParser(description="Exporta relatórios do SGI numa única sessão do navegador")
+    parser.add_argument('relatorios', nargs='*',
+                        help=f"Relatórios a exportar (padrão: todos): {', '.join(RELATORIOS)}")
+    parser.add_argument('--sem-carga', action='store_true', help="Só baixa os arquivos, sem carregar no banco")
+    parser.add_argument('--cargas-paralelas', type=int,
+                        default=int(os.getenv('RELATORIOS_CARGAS_PARALELAS', '2')),
+                        help="Cargas no banco ao mesmo tempo (RELATORIOS_CARGAS_PARALELAS)")
+    args = parser.parse_args()
+    desconhecidos = [nome for nome in args.relatorios if nome not in RELATORIOS]
+    if desconhecidos:
+        parser.error(f"relatório(s) desconhecido(s): {', '.join(desconhecidos)}")
+    return args
+
+
+if __name__ == "__main__":
+    args = configurar_por_linha_de_comando()
+    relatorios = [RELATORIOS[nome] for nome in (args.relatorios or RELATORIOS)]
+    logger.info(f"Exportando numa única sessão: {', '.join(r.nome for r in relatorios)}")
+
+    navegador = NavegadorRelatorios(cargas_paralelas=args.cargas_paralelas)
+    try:
+        if not navegador.entrar():
+            raise SystemExit("Falha no login")
+        arquivos = navegador.executar(relatorios, carregar=not args.sem_carga)
+    finally:
+        navegador.fechar()
+
+    resultados = navegador.aguardar_cargas()
+    for relatorio in relatorios:
+        situacao = 'não baixado' if relatorio.nome not in arquivos else (
+            'baixado' if args.sem_carga else ('carregado' if resultados.get(relatorio.nome) else 'falha na carga'))
+        logger.info(f"{relatorio.nome}: {situacao}")
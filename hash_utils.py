@@ -0,0 +1,27 @@
+import pandas as pd
+
+
+def calcular_hash_linhas(df, colunas):
+    """
+    Calcula um digest estável (int64) do conteúdo de cada linha.
+
+    Cada coluna é normalizada para texto antes do hash (NULL/NaN/None viram ''),
+    de modo que o digest não depende do dtype usado no tratamento.
+
+    Args:
+        df: DataFrame tratado
+        colunas: Colunas que compõem o conteúdo comparado
+
+    Returns:
+        pd.Series: Hash por linha, com o mesmo índice do DataFrame
+    """
+    normalizado = pd.DataFrame(index=df.index)
+    for col in colunas:
+        if col in df.columns:
+            serie = df[col].astype(object)
+            normalizado[col] = serie.where(serie.notna(), '').astype(str)
+        else:
+            normalizado[col] = ''
+
+    # hash_pandas_object usa chave fixa, então o resultado é reproduzível entre execuções
+    return pd.util.hash_pandas_object(normalizado, index=False).astype('uint64').view('int64')
@@ -21,7 +21,12 @@ import glob
 import os
 import numpy as np
 from urllib.parse import quote
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
+from coercao_utils import converter_colunas_inteiras
+from db_utils import obter_engine, conexao_raw
+from esquemas import ITENS_PEDIDOS, MARCAS_PRODUTO
+from leitura_utils import LeitorExcel
+from parquet_utils import ZonaParquet
 from sqlalchemy.types import String
 from sqlalchemy.types import Integer
 from sqlalchemy.types import Float
@@ -36,6 +41,9 @@ import csv
 from pandas.api.types import is_scalar
 import psycopg2.extras
 from seleniumbase import Driver
+from espera_utils import Esperas
+from sessao_utils import CacheSessao
+from exportacao_utils import baixar_exportacao, exportacao_http_ativa
 
 # Configuração do sistema de logging
 
@@ -108,14 +116,12 @@ class TratarDados():
             raise FileNotFoundError("Nenhum arquivo XLSX encontrado nas pastas padrão ('downloads' do projeto ou 'Downloads' do usuário).")
 
         self.file = max(list_of_files, key=os.path.getctime)
+        self.zona = ZonaParquet()
         
 
     def processar_arquivo_itens_pedidos(self):
         try:
             logger.info(f"Iniciando processamento do arquivo: {self.file}")
-            df = pd.read_excel(self.file, dtype=str)
-            logger.info(f"Arquivo lido com sucesso. Total de linhas: {len(df)}")
-
             # Mapeamento de colunas para os novos dados
             mapeamento_colunas = {
                 'Código Pedido': 'CodigoPedido',
@@ -146,6 +152,11 @@ class TratarDados():
                 'Total Líquido': 'ValorLiquido'
             }
 
+            # Só as colunas mapeadas do export são lidas
+            leitor = LeitorExcel(self.file, colunas=list(mapeamento_colunas))
+            df = self.zona.carregar('itens_make_skin', self.file, leitor.ler)
+            logger.info(f"Arquivo lido com sucesso. Total de linhas: {len(df)}")
+
             # Renomear colunas existentes
             colunas_existentes = {k: v for k, v in mapeamento_colunas.items() if k in df.columns}
             logger.info(f"Colunas renomeadas: {list(colunas_existentes.values())}")
@@ -191,8 +202,7 @@ class TratarDados():
                     df[col] = pd.to_numeric(df[col], errors='coerce', downcast='float')
 
             # Processar quantidade
-            if 'QtdeItens' in df.columns:
-                df['QtdeItens'] = pd.to_numeric(df['QtdeItens'], errors='coerce').fillna(0).astype(int)
+            df = converter_colunas_inteiras(df, ['QtdeItens'], padrao=0)
 
             # Manter apenas colunas mapeadas
             colunas_validas = [col for col in mapeamento_colunas.values() if col in df.columns]
@@ -212,7 +222,7 @@ class TratarDados():
 
 class Banco():
     def __init__(self):
-        self.engine = create_engine(os.getenv('DATABASE_URL')) 
+        self.engine = obter_engine('DATABASE_URL')
         try:
             conn = self.engine.connect()
             result = conn.execute(text("SELECT 1"))
@@ -229,38 +239,7 @@ class Banco():
     def criar_tabela(self):
         try:
             with self.engine.connect() as conn:
-                conn.execute(text("""
-                    CREATE TABLE IF NOT EXISTS itens_pedidos (
-                        CodigoPedido varchar(30) ,
-                        CodigoProduto varchar(30) ,
-                        Produto VARCHAR(200),
-                        DataCaptacao DATE,
-                        CicloCaptacao VARCHAR(10),
-                        DataFaturamento DATE,
-                        CicloFaturamento VARCHAR(10),
-                        Pessoa VARCHAR(30),
-                        NomePessoa VARCHAR(255),
-                        Papel VARCHAR(20),
-                        SituacaoFiscal VARCHAR(40),
-                        NotaFiscal VARCHAR(30),
-                        MeioCaptacao VARCHAR(30),
-                        CodPlanoPagamento VARCHAR(30),
-                        PlanoPagamento VARCHAR(255),
-                        TipoEntrega VARCHAR(30),
-                        CodUsuarioCriacao VARCHAR(30),
-                        UsuarioCriacao VARCHAR(255),
-                        CodUsuarioFinalizacao VARCHAR(30),
-                        UsuarioFinalizacao VARCHAR(255),
-                        CodCD VARCHAR(30),
-                        CanalDistribuicao VARCHAR(255),
-                        QtdItens INT,
-                        ValorTabela DECIMAL(10, 2),
-                        ValorPraticado DECIMAL(10, 2),
-                        ValorLiquido DECIMAL(10, 2),
-                        PRIMARY KEY (CodigoPedido, CodigoProduto),
-                        FOREIGN KEY (CodigoPedido) REFERENCES pedidos(codigopedido) ON DELETE CASCADE
-                    )
-                """))
+                conn.execute(text(ITENS_PEDIDOS.ddl))
                 conn.commit()
                 print("Tabela 'itens_pedidos' criada/verificada com sucesso!")
         except Exception as e:
@@ -273,11 +252,7 @@ class Banco():
                 itens_pedidos = itens_pedidos.to_dict('records')
 
             # Lista com as colunas exatas e na ordem correta para itens_pedidos
-            colunas = [
-                'CodigoProduto',
-                'Produto',
-                'Marca'
-            ]
+            colunas = MARCAS_PRODUTO.colunas
 
             # Filtrar e ordenar os dados conforme as colunas definidas
             values = [tuple(item.get(col, None) for col in colunas) for item in itens_pedidos]
@@ -285,32 +260,24 @@ class Banco():
             insert_query = f"""
                 INSERT INTO marcas_produto({', '.join(colunas)})
                 VALUES ({', '.join(['%s'] * len(colunas))})
-                ON CONFLICT (CodigoProduto)
-                DO UPDATE SET
-                    {', '.join([f"{col} = EXCLUDED.{col}" for col in colunas if col not in ['CodigoProduto']])}
+                {MARCAS_PRODUTO.clausula_conflito(substituir_nulos=True)}
                 """
 
-            conn = self.engine.raw_connection()
-            cursor = conn.cursor()
-            try:
-                psycopg2.extras.execute_batch(cursor, insert_query, values)
-                conn.commit()
-                logger.info("Inserção/atualização de itens de pedidos concluída com sucesso")
-            except Exception as e:
-                conn.rollback()
-                logger.error(f"Erro ao inserir/atualizar itens de pedidos: {str(e)}")
-                raise
+            with conexao_raw(self.engine) as (conn, cursor):
+                try:
+                    psycopg2.extras.execute_batch(cursor, insert_query, values)
+                    conn.commit()
+                    logger.info("Inserção/atualização de itens de pedidos concluída com sucesso")
+                except Exception as e:
+                    conn.rollback()
+                    logger.error(f"Erro ao inserir/atualizar itens de pedidos: {str(e)}")
+                    raise
         except Exception as e:
             logger.error(f"Erro ao inserir/atualizar itens de pedidos: {str(e)}")
             raise
     
     def fechar(self):
-        """Método para fechar o navegador"""
-        try:
-            if self.engine:
-                self.engine.dispose()
-        except Exception as e:
-            print(f"Erro ao fechar o navegador: {e}")
+        """Nada a liberar aqui: o engine é compartilhado (db_utils) e descartado só no fim do processo"""
     
     def consulta(self):
         try:
@@ -324,14 +291,33 @@ class Banco():
 
 class PegarGoogle():
     
-    def __init__(self):
+    def __init__(self, navegador=None):
+        """
+        Args:
+            navegador: PegarGoogle já aberto por outro script (ou o NavegadorRelatorios);
+                se informado, o driver, as esperas, a sessão e a pasta de downloads
+                dele são reaproveitados e nenhum Chrome novo é aberto
+        """
         logger.info("Inicializando PegarGoogle e o driver do Chrome...")
         self.driver = None
         self.wait = None
+        self.esperas = None
+        self.sessao = CacheSessao()
         self.data_formatada = None
         self.ciclo_1 = None
         self.ciclo_2 = None
-        
+
+        if navegador is not None:
+            # Reaproveita o navegador já aberto (e logado) em vez de abrir outro Chrome
+            self.driver = navegador.driver
+            self.wait = navegador.wait
+            self.esperas = navegador.esperas
+            self.sessao = navegador.sessao
+            self.download_dir = navegador.download_dir
+            self.vars = {}
+            self.ciclo = None
+            return
+
         # Diretório de download personalizado
         base_dir = os.path.dirname(os.path.abspath(__file__))
         download_dir = os.path.join(base_dir, 'downloads')
@@ -381,6 +367,8 @@ class PegarGoogle():
             # Configurar wait com timeout mais longo (120s)
             logger.info("Configurando WebDriverWait com timeout de 120 segundos")
             self.wait = WebDriverWait(self.driver, 120)
+            self.esperas = Esperas(self.driver, timeout=120)
+            self.esperas.instalar_monitor_rede()
             self.vars = {}
             
             # Maximizar a janela
@@ -403,18 +391,15 @@ class PegarGoogle():
         for tentativa in range(3):
             try:
                 logger.debug(f"Tentativa {tentativa + 1} de clicar no elemento: {valor}")
-                elemento = self.wait.until(
-                    EC.element_to_be_clickable((by, valor))
-                )
-                self.driver.execute_script("arguments[0].click();", elemento)
+                self.esperas.clicar(by, valor)
                 logger.info(f"Clique bem-sucedido no elemento: {valor}")
                 return True
             except Exception as e:
                 if tentativa == 2:  # última tentativa 
                     logger.error(f"Erro ao clicar no elemento {valor}: {e}")
                     raise
-                logger.warning(f"Tentativa {tentativa + 1} falhou, tentando novamente em 1 segundo... Erro: {str(e)[:100]}")
-                time.sleep(1)
+                logger.warning(f"Tentativa {tentativa + 1} falhou, tentando novamente após a página carregar... Erro: {str(e)[:100]}")
+                self.esperas.documento_pronto(timeout=10, exigir=False)
                 
     def _esperar_elemento(self, by, valor, timeout=30):
         """Função auxiliar para esperar elementos com retry"""
@@ -422,19 +407,21 @@ class PegarGoogle():
         for tentativa in range(3):
             try:
                 logger.debug(f"Tentativa {tentativa + 1} de localizar o elemento: {valor}")
-                elemento = self.wait.until(
-                    EC.presence_of_element_located((by, valor))
-                )
+                elemento = self.esperas.elemento(by, valor)
                 logger.info(f"Elemento localizado com sucesso: {valor}")
                 return elemento
             except Exception as e:
                 if tentativa == 2:  # última tentativa
                     logger.error(f"Erro ao esperar elemento {valor}: {e}")
                     raise
-                logger.warning(f"Tentativa {tentativa + 1} falhou, tentando novamente em 1 segundo... Erro: {str(e)[:100]}")
-                time.sleep(1)
+                logger.warning(f"Tentativa {tentativa + 1} falhou, tentando novamente após a página carregar... Erro: {str(e)[:100]}")
+                self.esperas.documento_pronto(timeout=10, exigir=False)
                 
     def entrar(self):
+        # Sessão salva por uma execução anterior: dispensa o login enquanto for válida
+        if self.sessao.restaurar(self.driver, self.esperas):
+            return True
+        
         try:
             self.driver.get("https://sgi.e-boticario.com.br/Paginas/Acesso/Entrar.aspx?ReturnUrl=%2f")
                 
@@ -443,7 +430,7 @@ class PegarGoogle():
             self.driver.click(r'#btnLoginExterno')
             print("entrou no site")
             
-            time.sleep(3)
+            self.esperas.elemento(By.CSS_SELECTOR, '#GoogleExchange', estado='clicavel')
             self.driver.click(r'#GoogleExchange')
             print("entrou no google")
             
@@ -454,7 +441,9 @@ class PegarGoogle():
             self.driver.type("#password > div.aCsJod.oJeWuf > div > div.Xb9hP > input", senha)
             self.driver.click("#passwordNext > div > button")
             print("Passando a senha")
-            time.sleep(10)
+            # Login concluído quando o menu do SGI estiver disponível
+            self.esperas.elemento(By.ID, 'menu-cod-1', estado='clicavel')
+            self.sessao.salvar(self.driver)
             return True
             
         except ValueError as e:
@@ -511,8 +500,8 @@ class PegarGoogle():
             logger.info("Preenchendo data final")
             self._esperar_elemento(By.XPATH, r'//*[@id="ContentPlaceHolder1_ctlRelatorioItensPorVendedor_txtDataFinalCaptacao_Tb1"]').send_keys(fim_formatado)
             
-            logger.info("Aguardando 3 segundos para garantir que os filtros foram aplicados")
-            time.sleep(3)
+            logger.info("Aguardando a aplicação dos filtros")
+            self.esperas.postback_concluido()
 
             # Buscar e exportar
             logger.info("Iniciando busca de pedidos")
@@ -524,6 +513,8 @@ class PegarGoogle():
             logger.info("Selecionando opção de exportação")
             self._esperar_e_clicar(By.XPATH, r'//*[@id="tab-01"]/div[3]/div/div[2]/div/div[1]/span/label')
             
+            logger.info("Confirmando a exportação")
+            self.confirmar_exportacao()
             logger.info("Iniciando processo de download")
             self.pegar_downloads()
             
@@ -556,36 +547,44 @@ class PegarGoogle():
         except Exception as e:
             logger.error(f"Erro ao fechar janela: {e}", exc_info=True)
             
+    def confirmar_exportacao(self):
+        """Confirma o diálogo aberto pelo botão Exportar; é este passo que agenda o export no SGI"""
+        elements = [
+            '//*[@id="agendamentoExportacao_exportarPanel"]/div/div/div[2]/div[1]/div/div/div[2]/ul/li[2]/a',
+            '//*[@id="agendamentoExportacao_colunasTab"]/div[1]/div/div/label',
+            '//*[@id="agendamentoExportacao_divIncluirDadosPessoais"]/label',
+            '//*[@id="popupOkButton"]',
+            '//*[@id="agendamentoExportacao_okButton_B1"]',
+            '//*[@id="popupOkButton"]',
+        ]
+        for xpath in elements:
+            self.esperas.clicar(By.XPATH, xpath, postback=True)
+
     def pegar_downloads(self):
-        wait = WebDriverWait(self.driver, 120)
+        """Vai à fila de exportações e baixa o export mais recente (já confirmado em confirmar_exportacao)"""
+        # Modo HTTP opcional: fila e download com a sessão do navegador, sem renderizar páginas
+        if exportacao_http_ativa() and baixar_exportacao(self.driver, self.download_dir):
+            return
         
         try:
-            # Clique em vários elementos conforme necessário
+            # Menu até a fila de exportações
             elements = [
-                '//*[@id="agendamentoExportacao_exportarPanel"]/div/div/div[2]/div[1]/div/div/div[2]/ul/li[2]/a',
-                '//*[@id="agendamentoExportacao_colunasTab"]/div[1]/div/div/label',
-                '//*[@id="agendamentoExportacao_divIncluirDadosPessoais"]/label',
-                '//*[@id="popupOkButton"]',
-                '//*[@id="agendamentoExportacao_okButton_B1"]',
-                '//*[@id="popupOkButton"]',
                 '//*[@id="menu-cod-8"]/a',
                 '//*[@id="submenu-cod-8"]/div/div[1]/ul/li[10]/a',
                 '//*[@id="submenu-cod-8"]/div/div[1]/ul/li[10]/ul/li[3]/a'
             ]
             
-            
             for xpath in elements:
-                element = wait.until(EC.element_to_be_clickable((By.XPATH, xpath)))
-                self.driver.execute_script("arguments[0].click();", element)
-                time.sleep(2)  # Adicione um tempo de espera se necessário
+                self.esperas.clicar(By.XPATH, xpath, postback=True)
             
             # Código específico para clicar no botão de download com tratamento de exceção
             while True:
                 try:
-                    download_button = WebDriverWait(self.driver, 10).until(EC.element_to_be_clickable(('xpath', '//*[@id="ContentPlaceHolder1_exportacoesGrid_baixarButton_0_btn_0"]')))
-                    time.sleep(10)
+                    download_button = self.esperas.elemento(By.XPATH, '//*[@id="ContentPlaceHolder1_exportacoesGrid_baixarButton_0_btn_0"]', estado='clicavel', timeout=10)
+                    inicio_download = time.time()
                     self.driver.execute_script("arguments[0].click();", download_button)
-                    time.sleep(10)
+                    # O navegador é fechado em seguida: espera o arquivo terminar de baixar
+                    self.esperas.download_concluido(self.download_dir, inicio_download, exigir=False)
                     break  # Sai do loop se conseguir clicar no botão de download
                 except TimeoutException:
                     # Verifica se o botão de alerta está presente
@@ -594,7 +593,7 @@ class PegarGoogle():
                         if alert_button.is_displayed():
                             logger.info("Alerta detectado. Recarregando a página...")
                             self.driver.refresh()  # Recarrega a página
-                            time.sleep(5)  # Aguarda um tempo para a página recarregar
+                            self.esperas.documento_pronto()
                             continue  # Volta para o início do loop
                     except NoSuchElementException:
                         pass  # Se o alerta não for encontrado, continua com a próxima tentativa
@@ -605,19 +604,19 @@ class PegarGoogle():
 
                 # Tentar clicar no botão de atualizar se o botão de download não estiver disponível
                 try:
-                    atualizar = WebDriverWait(self.driver, 10).until(EC.element_to_be_clickable(('xpath', '//*[@id="ContentPlaceHolder1_atualizarButton_btn"]')))
-                    self.driver.execute_script("arguments[0].click();", atualizar)
-                    time.sleep(5)  # Adiciona um pequeno tempo de espera para o botão ser clicado
+                    self.esperas.clicar(By.XPATH, '//*[@id="ContentPlaceHolder1_atualizarButton_btn"]', timeout=10, postback=True)
                 except TimeoutException:
                     pass
         except StaleElementReferenceException:
             logger.info("Elemento foi atualizado ou não está mais na página. Recarregando...")
             self.driver.refresh()  # Recarrega a página
-            time.sleep(5)
+            self.esperas.documento_pronto()
             self.pegar_downloads()  # Tenta novamente
             
     def fechar(self):
         """Método para fechar o navegador"""
+        if self.esperas:
+            self.esperas.resumo()
         try:
             if self.driver:
                 self.driver.quit()
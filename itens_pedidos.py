@@ -19,7 +19,7 @@ import glob
 import os
 import numpy as np
 from urllib.parse import quote
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from sqlalchemy.types import String
 from sqlalchemy.types import Integer
 from sqlalchemy.types import Float
@@ -33,7 +33,15 @@ import io
 from pandas.api.types import is_scalar
 import psycopg2.extras
 from seleniumbase import Driver
+from espera_utils import Esperas
+from sessao_utils import CacheSessao
+from exportacao_utils import baixar_exportacao, exportacao_http_ativa
 from psycopg2.extras import execute_values
+from copy_utils import copiar_dataframe
+from db_utils import obter_engine
+from esquemas import ITENS_PEDIDOS
+from leitura_utils import LeitorExcel
+from parquet_utils import ZonaParquet
 
 # Configuração do sistema de logging
 
@@ -86,67 +94,44 @@ ciclos_2024 = [
 ]
 
 class TratarDados():
-    def __init__(self):
-        # Caminhos portáveis: primeiro busca na pasta 'downloads' do projeto, depois em 'Downloads' do usuário
-        base_dir = r"C:\Users\Administrator\Desktop"
-        projeto_downloads = os.path.join(base_dir, 'download_path_databse')
-        usuario_downloads = os.path.join(os.path.expanduser('~'), 'download_path_databse')
-
-        padroes = [
-            os.path.join(projeto_downloads, '*.xlsx'),
-            os.path.join(usuario_downloads, '*.xlsx'),
-        ]
+    def __init__(self, arquivo=None):
+        if arquivo:
+            # Arquivo exato (ex.: baixado por exportar_relatorios.py), sem buscar o mais recente
+            self.file = arquivo
+        else:
+            # Caminhos portáveis: primeiro busca na pasta 'downloads' do projeto, depois em 'Downloads' do usuário
+            base_dir = r"C:\Users\Administrator\Desktop"
+            projeto_downloads = os.path.join(base_dir, 'download_path_databse')
+            usuario_downloads = os.path.join(os.path.expanduser('~'), 'download_path_databse')
+
+            padroes = [
+                os.path.join(projeto_downloads, '*.xlsx'),
+                os.path.join(usuario_downloads, '*.xlsx'),
+            ]
 
-        list_of_files = []
-        for padrao in padroes:
-            arquivos = glob.glob(padrao)
-            if arquivos:
-                list_of_files.extend(arquivos)
+            list_of_files = []
+            for padrao in padroes:
+                arquivos = glob.glob(padrao)
+                if arquivos:
+                    list_of_files.extend(arquivos)
 
-        if not list_of_files:
-            raise FileNotFoundError("Nenhum arquivo XLSX encontrado nas pastas padrão ('downloads' do projeto ou 'Downloads' do usuário).")
+            if not list_of_files:
+                raise FileNotFoundError("Nenhum arquivo XLSX encontrado nas pastas padrão ('downloads' do projeto ou 'Downloads' do usuário).")
 
-        self.file = max(list_of_files, key=os.path.getctime)
+            self.file = max(list_of_files, key=os.path.getctime)
+        self.zona = ZonaParquet()
         
 
     def processar_arquivo_itens_pedidos(self):
         try:
             logger.info(f"Iniciando processamento do arquivo: {self.file}")
-            df = pd.read_excel(self.file, dtype=str)
+            # Só as colunas mapeadas do export são lidas
+            leitor = LeitorExcel(self.file, colunas=list(ITENS_PEDIDOS.mapeamento))
+            df = self.zona.carregar('itens_pedidos', self.file, leitor.ler)
             logger.info(f"Arquivo lido com sucesso. Total de linhas: {len(df)}")
 
-            # Mapeamento de colunas para os novos dados
-            mapeamento_colunas = {
-                'Código Pedido': 'CodigoPedido',
-                'Código Produto': 'CodigoProduto',
-                'Produto': 'Produto',
-                'Data captação pedido': 'DataCaptacao',
-                'Ciclo captação pedido': 'CicloCaptacao',
-                'Data faturamento': 'DataFaturamento',
-                'Ciclo faturamento': 'CicloFaturamento',
-                'Código Revendedor': 'Pessoa',
-                'Revendedor': 'NomePessoa',
-                'Papel': 'Papel',
-                'Situação Fiscal': 'SituacaoFiscal',
-                'Nota Fiscal': 'NotaFiscal',
-                'Meio de captação': 'MeioCaptacao',
-                'Código plano pagamento': 'CodPlanoPagamento',
-                'Plano de pagamento': 'PlanoPagamento',
-                'Tipo de Entrega': 'TipoEntrega',
-                'Código usuário criação': 'CodUsuarioCriacao',
-                'Usuário criação': 'UsuarioCriacao',
-                'Código usuário finalização': 'CodUsuarioFinalizacao',
-                'Usuário finalização': 'UsuarioFinalizacao',
-                'Código CD': 'CodCD',
-                'Canal de distribuição': 'CanalDistribuicao',
-                'Qtde': 'QtdItens',
-                'Total Tabela': 'ValorTabela',
-                'Total Praticado': 'ValorPraticado',
-                'Total Líquido': 'ValorLiquido'
-            }
-
-            # Renomear colunas existentes
-            colunas_existentes = {k: v for k, v in mapeamento_colunas.items() if k in df.columns}
+            # Renomear pelo esquema (cabeçalho do export -> coluna da tabela)
+            colunas_existentes = {k: v for k, v in ITENS_PEDIDOS.mapeamento.items() if k in df.columns}
             logger.info(f"Colunas renomeadas: {list(colunas_existentes.values())}")
             df = df.rename(columns=colunas_existentes)
             
@@ -176,26 +161,11 @@ class TratarDados():
                 df['DataFaturamento'] = pd.to_datetime(df['DataFaturamento'], errors='coerce', dayfirst=True)
                 df['DataFaturamento'] = df['DataFaturamento'].dt.date
 
-            # Processar valores monetários
-            colunas_monetarias = ['ValorTabela', 'ValorPraticado', 'ValorLiquido']
-            for col in colunas_monetarias:
-                if col in df.columns:
-                    df[col] = (
-                        df[col]
-                        .astype(str)
-                        .str.replace('R\$ ', '', regex=True)  # Remove "R$ "
-                        .str.replace('.', '', regex=False)
-                        .str.replace(',', '.', regex=False)
-                    )
-                    df[col] = pd.to_numeric(df[col], errors='coerce', downcast='float')
-
-            # Processar quantidade
-            if 'QtdItens' in df.columns:
-                df['QtdItens'] = pd.to_numeric(df['QtdItens'], errors='coerce').fillna(0).astype(int)
+            # Valores monetários ('R$ 1.234,56') e quantidade, pelos tipos do esquema
+            df = ITENS_PEDIDOS.converter(df, tipos=('decimal', 'inteiro'))
 
-            # Manter apenas colunas mapeadas
-            colunas_validas = [col for col in mapeamento_colunas.values() if col in df.columns]
-            df = df[colunas_validas]
+            # Manter apenas colunas da tabela
+            df = ITENS_PEDIDOS.renomear(df)
 
             # Substituir valores NaN por None
             df = df.where(pd.notna(df), None)
@@ -210,8 +180,13 @@ class TratarDados():
             raise
 
 class Banco():
+    # Quantidade de códigos de pedidos órfãos listados no log/retorno
+    AMOSTRA_ORFAOS = 20
+
+    COLUNAS_ITENS = ITENS_PEDIDOS.colunas
+
     def __init__(self):
-        self.engine = create_engine(os.getenv('DATABASE_URL')) 
+        self.engine = obter_engine('DATABASE_URL')
         try:
             conn = self.engine.connect()
             result = conn.execute(text("SELECT 1"))
@@ -228,38 +203,7 @@ class Banco():
     def criar_tabela(self):
         try:
             with self.engine.connect() as conn:
-                conn.execute(text("""
-                    CREATE TABLE IF NOT EXISTS itens_pedidos (
-                        CodigoPedido varchar(30) ,
-                        CodigoProduto varchar(30) ,
-                        Produto VARCHAR(200),
-                        DataCaptacao DATE,
-                        CicloCaptacao VARCHAR(10),
-                        DataFaturamento DATE,
-                        CicloFaturamento VARCHAR(10),
-                        Pessoa VARCHAR(30),
-                        NomePessoa VARCHAR(255),
-                        Papel VARCHAR(20),
-                        SituacaoFiscal VARCHAR(40),
-                        NotaFiscal VARCHAR(30),
-                        MeioCaptacao VARCHAR(30),
-                        CodPlanoPagamento VARCHAR(30),
-                        PlanoPagamento VARCHAR(255),
-                        TipoEntrega VARCHAR(30),
-                        CodUsuarioCriacao VARCHAR(30),
-                        UsuarioCriacao VARCHAR(255),
-                        CodUsuarioFinalizacao VARCHAR(30),
-                        UsuarioFinalizacao VARCHAR(255),
-                        CodCD VARCHAR(30),
-                        CanalDistribuicao VARCHAR(255),
-                        QtdItens INT,
-                        ValorTabela DECIMAL(10, 2),
-                        ValorPraticado DECIMAL(10, 2),
-                        ValorLiquido DECIMAL(10, 2),
-                        PRIMARY KEY (CodigoPedido, CodigoProduto),
-                        FOREIGN KEY (CodigoPedido) REFERENCES pedidos(codigopedido) ON DELETE CASCADE
-                    )
-                """))
+                conn.execute(text(ITENS_PEDIDOS.ddl))
                 conn.commit()
                 print("Tabela 'itens_pedidos' criada/verificada com sucesso!")
         except Exception as e:
@@ -267,129 +211,158 @@ class Banco():
             raise
         
 
-    def inserirItensPedidos(self, itens_pedidos):
+    def inserirItensPedidos(self, itens_pedidos, tamanho_chunk=None):
+        """
+        Sincroniza os itens com a tabela itens_pedidos via staging (COPY + delete dos
+        itens cortados + upsert), uma transação por chunk.
+
+        Args:
+            itens_pedidos: DataFrame tratado (ou lista de dicts)
+            tamanho_chunk: Linhas por transação; padrão ITENS_TAMANHO_CHUNK ou 100000.
+                Os itens de um mesmo pedido nunca são separados entre chunks.
+
+        Returns:
+            dict: Totais de itens recebidos, upsertados e órfãos
+        """
         try:
-            # Normaliza para lista de dicts
-            if hasattr(itens_pedidos, 'to_dict'):
-                itens_pedidos = itens_pedidos.to_dict('records')
-
-            colunas = [
-                'CodigoPedido','CodigoProduto','Produto','DataCaptacao','CicloCaptacao',
-                'DataFaturamento','CicloFaturamento','Pessoa','NomePessoa','Papel',
-                'SituacaoFiscal','NotaFiscal','MeioCaptacao','CodPlanoPagamento','PlanoPagamento',
-                'TipoEntrega','CodUsuarioCriacao','UsuarioCriacao','CodUsuarioFinalizacao',
-                'UsuarioFinalizacao','CodCD','CanalDistribuicao','QtdItens',
-                'ValorTabela','ValorPraticado','ValorLiquido'
-            ]
+            # Normaliza para DataFrame
+            if not hasattr(itens_pedidos, 'to_dict'):
+                itens_pedidos = pd.DataFrame(list(itens_pedidos or []))
 
-            if not itens_pedidos:
+            if len(itens_pedidos) == 0:
                 logger.info("Nenhum item recebido para processar.")
                 return
 
-            # Conexão RAW para usar execute_values
-            conn = self.engine.raw_connection()
-            cursor = conn.cursor()
-            try:
-                # 1) Garantimos que só inserimos itens cujos pedidos existem
-                cursor.execute("SELECT DISTINCT codigopedido FROM pedidos")
-                pedidos_existentes = {row[0] for row in cursor.fetchall()}
-                batch = [i for i in itens_pedidos if i.get('CodigoPedido') in pedidos_existentes]
-                if not batch:
-                    logger.warning("Nenhum item com pedido existente encontrado.")
-                    conn.rollback()
-                    return
-
-                values = [tuple(i.get(c) for c in colunas) for i in batch]
-
-                # 2) Tabela temporária para este batch
-                cursor.execute("""
-                    CREATE TEMP TABLE tmp_itens_pedidos (
-                        CodigoPedido varchar(30),
-                        CodigoProduto varchar(30),
-                        Produto VARCHAR(200),
-                        DataCaptacao DATE,
-                        CicloCaptacao VARCHAR(10),
-                        DataFaturamento DATE,
-                        CicloFaturamento VARCHAR(10),
-                        Pessoa VARCHAR(30),
-                        NomePessoa VARCHAR(255),
-                        Papel VARCHAR(20),
-                        SituacaoFiscal VARCHAR(40),
-                        NotaFiscal VARCHAR(30),
-                        MeioCaptacao VARCHAR(30),
-                        CodPlanoPagamento VARCHAR(30),
-                        PlanoPagamento VARCHAR(255),
-                        TipoEntrega VARCHAR(30),
-                        CodUsuarioCriacao VARCHAR(30),
-                        UsuarioCriacao VARCHAR(255),
-                        CodUsuarioFinalizacao VARCHAR(30),
-                        UsuarioFinalizacao VARCHAR(255),
-                        CodCD VARCHAR(30),
-                        CanalDistribuicao VARCHAR(255),
-                        QtdItens INT,
-                        ValorTabela DECIMAL(10, 2),
-                        ValorPraticado DECIMAL(10, 2),
-                        ValorLiquido DECIMAL(10, 2)
-                    ) ON COMMIT DROP
-                """)
-
-                # 3) Bulk load no staging
-                execute_values(
-                    cursor,
-                    f"INSERT INTO tmp_itens_pedidos ({', '.join(colunas)}) VALUES %s",
-                    values,
-                    page_size=1000
-                )
+            tamanho_chunk = tamanho_chunk or int(os.getenv('ITENS_TAMANHO_CHUNK', '100000'))
+            df = itens_pedidos.reindex(columns=self.COLUNAS_ITENS)
+
+            totais = {'recebidos': 0, 'upsertados': 0, 'itens_orfaos': 0, 'pedidos_orfaos': 0, 'amostra_orfaos': []}
+            chunks = list(self._dividir_por_pedido(df, tamanho_chunk))
+            for numero, chunk in enumerate(chunks, 1):
+                logger.info(f"Chunk {numero}/{len(chunks)}: {len(chunk)} itens")
+                resultado = self._sincronizar_chunk(chunk)
+                for chave in ('recebidos', 'upsertados', 'itens_orfaos', 'pedidos_orfaos'):
+                    totais[chave] += resultado[chave]
+                faltam = self.AMOSTRA_ORFAOS - len(totais['amostra_orfaos'])
+                totais['amostra_orfaos'].extend(resultado['amostra_orfaos'][:max(faltam, 0)])
+
+            logger.info(
+                f"Sincronização concluída: {totais['upsertados']} itens válidos upsertados em "
+                f"{len(chunks)} chunks; {totais['itens_orfaos']} órfãos ignorados."
+            )
+            return totais
 
-                # 4) Apagar itens cortados (somente dos pedidos presentes no batch)
-                #    Remove toda linha da tabela principal cujo (Pedido,Produto) não está no staging
-                cursor.execute("""
-                    DELETE FROM itens_pedidos ip
-                    USING (
-                        SELECT DISTINCT CodigoPedido FROM tmp_itens_pedidos
-                    ) p
-                    WHERE ip.CodigoPedido = p.CodigoPedido
-                    AND NOT EXISTS (
-                        SELECT 1
-                        FROM tmp_itens_pedidos t
-                        WHERE t.CodigoPedido = ip.CodigoPedido
-                            AND t.CodigoProduto = ip.CodigoProduto
-                    )
-                """)
+        except Exception as e:
+            logger.error(f"Erro ao inserir/atualizar itens de pedidos: {str(e)}")
+            raise
 
-                # 5) UPSERT dos válidos
-                set_clause = ', '.join(
-                    f"{c}=EXCLUDED.{c}" for c in colunas if c not in ('CodigoPedido','CodigoProduto')
+    def _dividir_por_pedido(self, df, tamanho_chunk):
+        """
+        Divide o DataFrame em chunks de ~tamanho_chunk linhas sem quebrar pedidos,
+        já que o delete dos itens cortados considera o pedido inteiro.
+        """
+        if len(df) <= tamanho_chunk:
+            yield df
+            return
+
+        # NaN recebe um código próprio e é tratado como um pedido (órfão) qualquer
+        codigos, _ = pd.factorize(df['CodigoPedido'], use_na_sentinel=False)
+        linhas_por_pedido = np.bincount(codigos)
+        # Chunk de cada pedido pelo acumulado de linhas até ele (na ordem de aparição)
+        inicio_pedido = np.cumsum(linhas_por_pedido) - linhas_por_pedido
+        chunk_linha = (inicio_pedido // tamanho_chunk)[codigos]
+
+        for numero in np.unique(chunk_linha):
+            yield df[chunk_linha == numero]
+
+    def _sincronizar_chunk(self, df):
+        """Carrega um chunk no staging via COPY e aplica delete dos cortados + upsert"""
+        colunas = self.COLUNAS_ITENS
+
+        # Conexão RAW para usar COPY
+        conn = self.engine.raw_connection()
+        cursor = conn.cursor()
+        try:
+            # 1) Tabela temporária para este chunk (todos os itens; o filtro de FK é feito no merge)
+            cursor.execute("""
+                CREATE TEMP TABLE tmp_itens_pedidos
+                (LIKE itens_pedidos INCLUDING DEFAULTS)
+                ON COMMIT DROP
+            """)
+
+            # 2) Bulk load no staging direto do buffer do DataFrame. O LIKE herda o NOT NULL
+            #    da chave: itens sem pedido ficam fora e entram na contagem de órfãos
+            sem_pedido = df['CodigoPedido'].isna()
+            itens_sem_pedido = int(sem_pedido.sum())
+            recebidos = copiar_dataframe(cursor, df[~sem_pedido], "tmp_itens_pedidos", colunas) + itens_sem_pedido
+
+            # Índice criado depois da carga (mais barato) e antes do delete/upsert
+            cursor.execute("CREATE INDEX ON tmp_itens_pedidos (CodigoPedido, CodigoProduto)")
+            cursor.execute("ANALYZE tmp_itens_pedidos")
+
+            # 3) Itens cujo pedido não existe (órfãos): contados e amostrados no próprio servidor
+            cursor.execute("""
+                SELECT COUNT(*), COUNT(DISTINCT t.CodigoPedido),
+                       (ARRAY_AGG(DISTINCT t.CodigoPedido))[1:%s]
+                FROM tmp_itens_pedidos t
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM pedidos p WHERE p.CodigoPedido = t.CodigoPedido
+                )
+            """, (self.AMOSTRA_ORFAOS,))
+            itens_orfaos, pedidos_orfaos, amostra_orfaos = cursor.fetchone()
+            itens_orfaos += itens_sem_pedido
+            amostra_orfaos = amostra_orfaos or []
+            if itens_orfaos:
+                logger.warning(
+                    f"{itens_orfaos} itens ignorados por pertencerem a {pedidos_orfaos} pedidos "
+                    f"inexistentes. Amostra: {amostra_orfaos}"
                 )
-                cursor.execute(f"""
-                    INSERT INTO itens_pedidos ({', '.join(colunas)})
-                    SELECT {', '.join(colunas)} FROM tmp_itens_pedidos
-                    ON CONFLICT (CodigoPedido, CodigoProduto)
-                    DO UPDATE SET {set_clause}
-                """)
-
-                conn.commit()
-                logger.info(f"Sincronização concluída: {len(batch)} itens válidos upsertados; itens cortados removidos.")
-            except Exception as e:
-                conn.rollback()
-                logger.error(f"Erro na sincronização de itens: {e}")
-                raise
-            finally:
-                cursor.close()
-                conn.close()
 
+            # 4) Apagar itens cortados (somente dos pedidos presentes no chunk)
+            #    Remove toda linha da tabela principal cujo (Pedido,Produto) não está no staging
+            cursor.execute("""
+                DELETE FROM itens_pedidos ip
+                USING (
+                    SELECT DISTINCT CodigoPedido FROM tmp_itens_pedidos
+                ) p
+                WHERE ip.CodigoPedido = p.CodigoPedido
+                AND NOT EXISTS (
+                    SELECT 1
+                    FROM tmp_itens_pedidos t
+                    WHERE t.CodigoPedido = ip.CodigoPedido
+                        AND t.CodigoProduto = ip.CodigoProduto
+                )
+            """)
+
+            # 5) UPSERT dos válidos (JOIN com pedidos descarta os órfãos)
+            cursor.execute(f"""
+                INSERT INTO itens_pedidos ({', '.join(colunas)})
+                SELECT {', '.join('t.' + c for c in colunas)}
+                FROM tmp_itens_pedidos t
+                JOIN pedidos p ON p.CodigoPedido = t.CodigoPedido
+                {ITENS_PEDIDOS.clausula_conflito(substituir_nulos=True)}
+            """)
+            upsertados = cursor.rowcount
+
+            conn.commit()
+            return {
+                'recebidos': recebidos,
+                'upsertados': upsertados,
+                'itens_orfaos': itens_orfaos,
+                'pedidos_orfaos': pedidos_orfaos,
+                'amostra_orfaos': amostra_orfaos
+            }
         except Exception as e:
-            logger.error(f"Erro ao inserir/atualizar itens de pedidos: {str(e)}")
+            conn.rollback()
+            logger.error(f"Erro na sincronização de itens: {e}")
             raise
+        finally:
+            cursor.close()
+            conn.close()
 
     
     def fechar(self):
-        """Método para fechar o navegador"""
-        try:
-            if self.engine:
-                self.engine.dispose()
-        except Exception as e:
-            print(f"Erro ao fechar o navegador: {e}")
+        """Nada a liberar aqui: o engine é compartilhado (db_utils) e descartado só no fim do processo"""
     
     def consulta(self):
         try:
@@ -403,14 +376,33 @@ class Banco():
 
 class PegarGoogle():
     
-    def __init__(self):
+    def __init__(self, navegador=None):
+        """
+        Args:
+            navegador: PegarGoogle já aberto por outro script (ou o NavegadorRelatorios);
+                se informado, o driver, as esperas, a sessão e a pasta de downloads
+                dele são reaproveitados e nenhum Chrome novo é aberto
+        """
         logger.info("Inicializando PegarGoogle e o driver do Chrome...")
         self.driver = None
         self.wait = None
+        self.esperas = None
+        self.sessao = CacheSessao()
         self.data_formatada = None
         self.ciclo_1 = None
         self.ciclo_2 = None
-        
+
+        if navegador is not None:
+            # Reaproveita o navegador já aberto (e logado) em vez de abrir outro Chrome
+            self.driver = navegador.driver
+            self.wait = navegador.wait
+            self.esperas = navegador.esperas
+            self.sessao = navegador.sessao
+            self.download_dir = navegador.download_dir
+            self.vars = {}
+            self.ciclo = None
+            return
+
         # Diretório de download personalizado
         base_dir = r"C:\Users\Administrator\Desktop"
         download_dir = os.path.join(base_dir, r'download_path_databse')
@@ -460,6 +452,8 @@ class PegarGoogle():
             # Configurar wait com timeout mais longo (120s)
             logger.info("Configurando WebDriverWait com timeout de 120 segundos")
             self.wait = WebDriverWait(self.driver, 120)
+            self.esperas = Esperas(self.driver, timeout=120)
+            self.esperas.instalar_monitor_rede()
             self.vars = {}
             
             # Maximizar a janela
@@ -482,18 +476,15 @@ class PegarGoogle():
         for tentativa in range(3):
             try:
                 logger.debug(f"Tentativa {tentativa + 1} de clicar no elemento: {valor}")
-                elemento = self.wait.until(
-                    EC.element_to_be_clickable((by, valor))
-                )
-                self.driver.execute_script("arguments[0].click();", elemento)
+                self.esperas.clicar(by, valor)
                 logger.info(f"Clique bem-sucedido no elemento: {valor}")
                 return True
             except Exception as e:
                 if tentativa == 2:  # última tentativa 
                     logger.error(f"Erro ao clicar no elemento {valor}: {e}")
                     raise
-                logger.warning(f"Tentativa {tentativa + 1} falhou, tentando novamente em 1 segundo... Erro: {str(e)[:100]}")
-                time.sleep(1)
+                logger.warning(f"Tentativa {tentativa + 1} falhou, tentando novamente após a página carregar... Erro: {str(e)[:100]}")
+                self.esperas.documento_pronto(timeout=10, exigir=False)
                 
     def _esperar_elemento(self, by, valor, timeout=30):
         """Função auxiliar para esperar elementos com retry"""
@@ -501,19 +492,21 @@ class PegarGoogle():
         for tentativa in range(3):
             try:
                 logger.debug(f"Tentativa {tentativa + 1} de localizar o elemento: {valor}")
-                elemento = self.wait.until(
-                    EC.presence_of_element_located((by, valor))
-                )
+                elemento = self.esperas.elemento(by, valor)
                 logger.info(f"Elemento localizado com sucesso: {valor}")
                 return elemento
             except Exception as e:
                 if tentativa == 2:  # última tentativa
                     logger.error(f"Erro ao esperar elemento {valor}: {e}")
                     raise
-                logger.warning(f"Tentativa {tentativa + 1} falhou, tentando novamente em 1 segundo... Erro: {str(e)[:100]}")
-                time.sleep(1)
+                logger.warning(f"Tentativa {tentativa + 1} falhou, tentando novamente após a página carregar... Erro: {str(e)[:100]}")
+                self.esperas.documento_pronto(timeout=10, exigir=False)
                 
     def entrar(self):
+        # Sessão salva por uma execução anterior: dispensa o login enquanto for válida
+        if self.sessao.restaurar(self.driver, self.esperas):
+            return True
+        
         try:
             self.driver.get("https://sgi.e-boticario.com.br/Paginas/Acesso/Entrar.aspx?ReturnUrl=%2f")
                 
@@ -522,7 +515,7 @@ class PegarGoogle():
             self.driver.click(r'#btnLoginExterno')
             print("entrou no site")
             
-            time.sleep(3)
+            self.esperas.elemento(By.CSS_SELECTOR, '#GoogleExchange', estado='clicavel')
             self.driver.click(r'#GoogleExchange')
             print("entrou no google")
             
@@ -533,7 +526,9 @@ class PegarGoogle():
             self.driver.type("#password > div.aCsJod.oJeWuf > div > div.Xb9hP > input", senha)
             self.driver.click("#passwordNext > div > button")
             print("Passando a senha")
-            time.sleep(10)
+            # Login concluído quando o menu do SGI estiver disponível
+            self.esperas.elemento(By.ID, 'menu-cod-1', estado='clicavel')
+            self.sessao.salvar(self.driver)
             return True
             
         except ValueError as e:
@@ -544,7 +539,7 @@ class PegarGoogle():
             logger.error(f"Erro ao fazer login: {str(e)}", exc_info=True)
             return False
             
-    def pegarItensVendas(self):
+    def pegarItensVendas(self, baixar=True):
         try:
             logger.info("Iniciando processo de busca e exportação de pedidos")
             ciclo = 1
@@ -590,8 +585,8 @@ class PegarGoogle():
             logger.info("Preenchendo data final")
             self._esperar_elemento(By.XPATH, r'//*[@id="ContentPlaceHolder1_ctlRelatorioItensPorVendedor_txtDataFinalCaptacao_Tb1"]').send_keys(fim_formatado)
             
-            logger.info("Aguardando 3 segundos para garantir que os filtros foram aplicados")
-            time.sleep(3)
+            logger.info("Aguardando a aplicação dos filtros")
+            self.esperas.postback_concluido()
 
             # Buscar e exportar
             logger.info("Iniciando busca de pedidos")
@@ -603,8 +598,12 @@ class PegarGoogle():
             logger.info("Selecionando opção de exportação")
             self._esperar_e_clicar(By.XPATH, r'//*[@id="tab-01"]/div[3]/div/div[2]/div/div[1]/span/label')
             
-            logger.info("Iniciando processo de download")
-            self.pegar_downloads()
+            # A confirmação é que agenda o export; com baixar=False a coleta fica com quem chamou (exportar_relatorios.py)
+            logger.info("Confirmando a exportação")
+            self.confirmar_exportacao()
+            if baixar:
+                logger.info("Iniciando processo de download")
+                self.pegar_downloads()
             
             logger.info("Fechando janelas secundárias")
             self.fecharJanela()
@@ -635,36 +634,44 @@ class PegarGoogle():
         except Exception as e:
             logger.error(f"Erro ao fechar janela: {e}", exc_info=True)
             
+    def confirmar_exportacao(self):
+        """Confirma o diálogo aberto pelo botão Exportar; é este passo que agenda o export no SGI"""
+        elements = [
+            '//*[@id="agendamentoExportacao_exportarPanel"]/div/div/div[2]/div[1]/div/div/div[2]/ul/li[2]/a',
+            '//*[@id="agendamentoExportacao_colunasTab"]/div[1]/div/div/label',
+            '//*[@id="agendamentoExportacao_divIncluirDadosPessoais"]/label',
+            '//*[@id="popupOkButton"]',
+            '//*[@id="agendamentoExportacao_okButton_B1"]',
+            '//*[@id="popupOkButton"]',
+        ]
+        for xpath in elements:
+            self.esperas.clicar(By.XPATH, xpath, postback=True)
+
     def pegar_downloads(self):
-        wait = WebDriverWait(self.driver, 120)
+        """Vai à fila de exportações e baixa o export mais recente (já confirmado em confirmar_exportacao)"""
+        # Modo HTTP opcional: fila e download com a sessão do navegador, sem renderizar páginas
+        if exportacao_http_ativa() and baixar_exportacao(self.driver, self.download_dir):
+            return
         
         try:
-            # Clique em vários elementos conforme necessário
+            # Menu até a fila de exportações
             elements = [
-                '//*[@id="agendamentoExportacao_exportarPanel"]/div/div/div[2]/div[1]/div/div/div[2]/ul/li[2]/a',
-                '//*[@id="agendamentoExportacao_colunasTab"]/div[1]/div/div/label',
-                '//*[@id="agendamentoExportacao_divIncluirDadosPessoais"]/label',
-                '//*[@id="popupOkButton"]',
-                '//*[@id="agendamentoExportacao_okButton_B1"]',
-                '//*[@id="popupOkButton"]',
                 '//*[@id="menu-cod-8"]/a',
                 '//*[@id="submenu-cod-8"]/div/div[1]/ul/li[10]/a',
                 '//*[@id="submenu-cod-8"]/div/div[1]/ul/li[10]/ul/li[3]/a'
             ]
             
-            
             for xpath in elements:
-                element = wait.until(EC.element_to_be_clickable((By.XPATH, xpath)))
-                self.driver.execute_script("arguments[0].click();", element)
-                time.sleep(2)  # Adicione um tempo de espera se necessário
+                self.esperas.clicar(By.XPATH, xpath, postback=True)
             
             # Código específico para clicar no botão de download com tratamento de exceção
             while True:
                 try:
-                    download_button = WebDriverWait(self.driver, 10).until(EC.element_to_be_clickable(('xpath', '//*[@id="ContentPlaceHolder1_exportacoesGrid_baixarButton_0_btn_0"]')))
-                    time.sleep(10)
+                    download_button = self.esperas.elemento(By.XPATH, '//*[@id="ContentPlaceHolder1_exportacoesGrid_baixarButton_0_btn_0"]', estado='clicavel', timeout=10)
+                    inicio_download = time.time()
                     self.driver.execute_script("arguments[0].click();", download_button)
-                    time.sleep(10)
+                    # O navegador é fechado em seguida: espera o arquivo terminar de baixar
+                    self.esperas.download_concluido(self.download_dir, inicio_download, exigir=False)
                     break  # Sai do loop se conseguir clicar no botão de download
                 except TimeoutException:
                     # Verifica se o botão de alerta está presente
@@ -673,7 +680,7 @@ class PegarGoogle():
                         if alert_button.is_displayed():
                             logger.info("Alerta detectado. Recarregando a página...")
                             self.driver.refresh()  # Recarrega a página
-                            time.sleep(5)  # Aguarda um tempo para a página recarregar
+                            self.esperas.documento_pronto()
                             continue  # Volta para o início do loop
                     except NoSuchElementException:
                         pass  # Se o alerta não for encontrado, continua com a próxima tentativa
@@ -684,19 +691,19 @@ class PegarGoogle():
 
                 # Tentar clicar no botão de atualizar se o botão de download não estiver disponível
                 try:
-                    atualizar = WebDriverWait(self.driver, 10).until(EC.element_to_be_clickable(('xpath', '//*[@id="ContentPlaceHolder1_atualizarButton_btn"]')))
-                    self.driver.execute_script("arguments[0].click();", atualizar)
-                    time.sleep(5)  # Adiciona um pequeno tempo de espera para o botão ser clicado
+                    self.esperas.clicar(By.XPATH, '//*[@id="ContentPlaceHolder1_atualizarButton_btn"]', timeout=10, postback=True)
                 except TimeoutException:
                     pass
         except StaleElementReferenceException:
             logger.info("Elemento foi atualizado ou não está mais na página. Recarregando...")
             self.driver.refresh()  # Recarrega a página
-            time.sleep(5)
+            self.esperas.documento_pronto()
             self.pegar_downloads()  # Tenta novamente
             
     def fechar(self):
         """Método para fechar o navegador"""
+        if self.esperas:
+            self.esperas.resumo()
         try:
             if self.driver:
                 self.driver.quit()
@@ -716,7 +723,6 @@ if __name__ == "__main__":
     logger.info("Execução principal finalizada")
     banco = Banco()
     banco.criar_tabela()
-    banco.fechar()
     
     tratar = TratarDados()
     df = tratar.processar_arquivo_itens_pedidos()
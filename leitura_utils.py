@@ -0,0 +1,516 @@
+import bisect
+import contextlib
+import csv
+import io
+import logging
+import os
+import re
+import sys
+import threading
+from collections import defaultdict
+from datetime import date, datetime, time
+
+import numpy as np
+import pandas as pd
+from pandas._libs.parsers import STR_NA_VALUES
+
+logger = logging.getLogger(__name__)
+
+# Backends de leitura de Excel, em ordem de preferência (EXCEL_BACKEND força um deles)
+BACKENDS_EXCEL = ('calamine', 'openpyxl', 'pandas')
+
+# Textos que o read_excel trata como NaN por padrão (keep_default_na=True)
+_NULOS_EXCEL = frozenset(STR_NA_VALUES)
+
+# Idem no read_csv(dtype=str), que também trata o campo vazio como NaN
+_NULOS_CSV = _NULOS_EXCEL | {''}
+
+# Tamanho dos blocos que o pyarrow lê do arquivo de texto por vez
+_BLOCO_BYTES_CSV = 16 * 1024 * 1024
+
+# Aviso da engine C (on_bad_lines='warn'), escrito no stderr a cada linha descartada
+_LINHA_DESCARTADA_C = re.compile(r'Skipping line (\d+): expected (\d+) fields, saw (\d+)\n?')
+
+
+def engine_csv_disponivel(preferida='pyarrow'):
+    """Retorna 'pyarrow' se o pacote estiver instalado (e for o preferido), senão a engine C do pandas."""
+    if preferida == 'pyarrow':
+        try:
+            import pyarrow  # noqa: F401
+            return 'pyarrow'
+        except ImportError:
+            pass
+    return 'c'
+
+
+class LeitorCSV:
+    """
+    Leitor de exports delimitados (pipe) numa única passada do parser nativo.
+
+    Com pyarrow o arquivo é lido em streaming pelo pyarrow.csv, e é o próprio
+    parser que informa as linhas com quantidade de campos diferente do cabeçalho
+    (invalid_row_handler), já respeitando aspas e quebras de linha dentro de
+    campos. O resultado é o mesmo do read_csv(on_bad_lines='skip') da engine
+    python: linhas com campos a mais são descartadas e contadas em
+    `linhas_descartadas`; linhas com campos a menos entram completadas com NaN,
+    na posição original. Sem pyarrow, a leitura cai na engine C do pandas, que
+    descarta as linhas com campos a mais e as reporta ("Skipping line N: ...");
+    os descartes são contados por essas mensagens (nela as linhas com campos a
+    menos não são reportadas pelo parser). A engine python continua disponível
+    com engine='python'.
+
+    A validação de layout acontece na mesma passada: com `campos_esperados`, as
+    linhas com outra quantidade de campos são contadas em `linhas_invalidas`
+    (guardando só as `amostra_invalidas` primeiras para o log) e, com
+    `limite_invalidas`, a leitura termina em ValueError se a fração de linhas
+    inválidas passar do limite.
+    """
+
+    def __init__(self, caminho, sep='|', encoding='utf-8', dtype=None, engine=None,
+                 campos_esperados=None, limite_invalidas=None, amostra_invalidas=5):
+        self.caminho = caminho
+        self.sep = sep
+        self.encoding = encoding
+        self.dtype = dtype or str
+        self.engine = engine or engine_csv_disponivel()
+        self.campos_esperados = campos_esperados
+        self.limite_invalidas = limite_invalidas
+        self.amostra_invalidas = amostra_invalidas
+        self._lock = threading.Lock()
+        self._reiniciar()
+
+    def _reiniciar(self):
+        self.linhas_descartadas = 0
+        self.linhas_lidas = 0
+        self.linhas_total = 0
+        self.linhas_invalidas = 0
+        self.amostras = []
+        # Registros fora dos lotes do parser: números ordenados e linhas curtas a reinserir
+        self._puladas = []
+        self._curtas = []
+        self._validas = 0
+        self._cabecalho_divergente = False
+
+    def _validar_linha(self, numero, linha, campos):
+        """Conta a linha como inválida se o número de campos não for o esperado (amostra limitada)."""
+        if self.campos_esperados is None or campos == self.campos_esperados:
+            return
+        self.linhas_invalidas += 1
+        if len(self.amostras) < self.amostra_invalidas:
+            self.amostras.append((numero, campos, linha.strip()[:100]))
+
+    def _relatar_invalidas(self):
+        """Loga o resumo da validação e aplica o limite de linhas inválidas."""
+        if self.campos_esperados is None:
+            return
+        if not self.linhas_invalidas:
+            logger.info("Nenhuma linha inválida encontrada no arquivo.")
+            return
+
+        percentual = self.linhas_invalidas / self.linhas_total * 100
+        if self.limite_invalidas is not None and percentual > self.limite_invalidas * 100:
+            erro_msg = (
+                f"Muitas linhas inválidas encontradas: {self.linhas_invalidas} "
+                f"de {self.linhas_total} ({percentual:.2f}%)"
+            )
+            logger.error(erro_msg)
+            raise ValueError(erro_msg)
+
+        logger.warning(f"{self.linhas_invalidas} linhas inválidas encontradas ({percentual:.2f}% do total)")
+        for i, (numero, campos, conteudo) in enumerate(self.amostras, 1):
+            logger.warning(f"Linha inválida #{i}: Número: {numero}, Colunas: {campos}, Início: {conteudo}...")
+        if self.linhas_invalidas > len(self.amostras):
+            logger.warning(f"... e mais {self.linhas_invalidas - len(self.amostras)} linhas com problemas")
+
+    def _cabecalho(self):
+        """Nomes das colunas como no read_csv (repetidos ganham '.1', '.2'...); só a 1ª linha é lida."""
+        with open(self.caminho, 'r', encoding=self.encoding, newline='') as f:
+            campos = next(csv.reader(f, delimiter=self.sep), [])
+        if campos:
+            campos[0] = campos[0].lstrip('\ufeff')
+        return _nomes_colunas(campos) if campos else []
+
+    def _dtype_coluna(self, coluna):
+        return self.dtype.get(coluna, str) if isinstance(self.dtype, dict) else self.dtype
+
+    # --- pyarrow ------------------------------------------------------------
+
+    def _linha_invalida(self, linha):
+        """invalid_row_handler do pyarrow: registra a linha e a tira do lote."""
+        with self._lock:
+            if not linha.text.strip():
+                # Linha só com espaços: as engines do pandas a ignoram como linha em branco
+                bisect.insort(self._puladas, linha.number)
+                return 'skip'
+            self.linhas_total += 1
+            self._validar_linha(linha.number, linha.text, linha.actual_columns)
+            bisect.insort(self._puladas, linha.number)
+            if linha.actual_columns > linha.expected_columns:
+                self.linhas_descartadas += 1
+            else:
+                bisect.insort(self._curtas, (linha.number, linha.text))
+        return 'skip'
+
+    def _completar_curta(self, texto, largura):
+        """Linha com campos a menos -> campos completados com NaN, como na engine python."""
+        campos = next(csv.reader(io.StringIO(texto), delimiter=self.sep), [])
+        return [np.nan if c in _NULOS_CSV else c for c in campos] + [np.nan] * (largura - len(campos))
+
+    def _reinserir_curtas(self, df, final):
+        """Devolve ao bloco as linhas curtas que ficam entre as linhas dele."""
+        inicio, fim = self._validas, self._validas + len(df)
+        with self._lock:
+            posicoes = []
+            for numero, texto in self._curtas:
+                # Registros válidos antes deste: o número (1 = cabeçalho) menos os que saíram dos lotes
+                anteriores = numero - 2 - bisect.bisect_left(self._puladas, numero)
+                if anteriores > fim and not final:
+                    break
+                posicoes.append((anteriores - inicio, texto))
+            del self._curtas[:len(posicoes)]
+        self._validas = fim
+        if not posicoes:
+            return df
+
+        partes, corte = [], 0
+        for posicao, texto in posicoes:
+            partes.append(df.iloc[corte:posicao])
+            partes.append(pd.DataFrame([self._completar_curta(texto, len(df.columns))], columns=df.columns))
+            corte = posicao
+        partes.append(df.iloc[corte:])
+        return pd.concat(partes, ignore_index=True)
+
+    def _para_dataframe(self, tabela, nomes, final):
+        com_nulos = [i for i, coluna in enumerate(tabela.columns) if coluna.null_count]
+        df = tabela.to_pandas()
+        # read_csv(dtype=str) devolve NaN, não None, nos campos nulos
+        for i in com_nulos:
+            df.isetitem(i, df.iloc[:, i].fillna(np.nan))
+        with self._lock:
+            self.linhas_total += len(df)
+            if self._cabecalho_divergente:
+                # Linhas no formato do cabeçalho não têm a quantidade esperada de campos
+                self.linhas_invalidas += len(df)
+        df = self._reinserir_curtas(df, final)
+        for i, nome in enumerate(nomes):
+            dtype = self._dtype_coluna(nome)
+            if dtype not in (str, object):
+                df.isetitem(i, df.iloc[:, i].astype(dtype))
+        # Índice contínuo entre blocos, como no chunksize do pandas
+        df.index = pd.RangeIndex(self.linhas_lidas, self.linhas_lidas + len(df))
+        self.linhas_lidas += len(df)
+        return df
+
+    def _iterar_pyarrow(self, nomes, tamanho_bloco):
+        import pyarrow as pa
+        import pyarrow.csv as pacsv
+
+        leitor = pacsv.open_csv(
+            self.caminho,
+            read_options=pacsv.ReadOptions(encoding=self.encoding, block_size=_BLOCO_BYTES_CSV,
+                                           column_names=nomes, skip_rows=1),
+            parse_options=pacsv.ParseOptions(delimiter=self.sep, newlines_in_values=True,
+                                             invalid_row_handler=self._linha_invalida),
+            convert_options=pacsv.ConvertOptions(
+                column_types={nome: pa.string() for nome in nomes},
+                null_values=list(_NULOS_CSV), strings_can_be_null=True, quoted_strings_can_be_null=True,
+            ),
+        )
+        lotes, linhas = [], 0
+        try:
+            for lote in leitor:
+                lotes.append(lote)
+                linhas += lote.num_rows
+                while tamanho_bloco and linhas >= tamanho_bloco:
+                    tabela = pa.Table.from_batches(lotes)
+                    yield self._para_dataframe(tabela.slice(0, tamanho_bloco), nomes, final=False)
+                    lotes = tabela.slice(tamanho_bloco).to_batches()
+                    linhas -= tamanho_bloco
+        finally:
+            # Sem close, a thread de leitura antecipada do pyarrow pode abortar o processo na saída
+            leitor.close()
+
+        if lotes or not self.linhas_lidas or self._curtas:
+            tabela = pa.Table.from_batches(lotes, schema=pa.schema([(nome, pa.string()) for nome in nomes]))
+            yield self._para_dataframe(tabela, nomes, final=True)
+
+    # --- engine C (sem pyarrow) ---------------------------------------------
+
+    def _iterar_c(self, tamanho_bloco):
+        # Colunas fora do mapa ficam como texto, igual à leitura via pyarrow
+        dtype = defaultdict(lambda: str, self.dtype) if isinstance(self.dtype, dict) else self.dtype
+        # Sem chunksize: na engine C (pandas 2.1) a primeira linha de cada chunk não
+        # passa pela checagem de campos, e uma linha longa ali seria truncada em vez
+        # de descartada. O arquivo é lido numa passada e fatiado nos blocos depois.
+        mensagens = io.StringIO()
+        with contextlib.redirect_stderr(mensagens):
+            df = pd.read_csv(self.caminho, sep=self.sep, encoding=self.encoding, dtype=dtype,
+                             engine='c', on_bad_lines='warn')
+        outras = _LINHA_DESCARTADA_C.sub('', mensagens.getvalue()).strip()
+        if outras:
+            sys.stderr.write(outras + '\n')
+        for numero, esperados, campos in _LINHA_DESCARTADA_C.findall(mensagens.getvalue()):
+            self.linhas_total += 1
+            self.linhas_descartadas += 1
+            self._validar_linha(int(numero), '', int(campos))
+
+        self.linhas_total += len(df)
+        if self._cabecalho_divergente:
+            self.linhas_invalidas += len(df)
+        self.linhas_lidas = len(df)
+        if tamanho_bloco is None or len(df) <= tamanho_bloco:
+            yield df
+            return
+        for inicio in range(0, len(df), tamanho_bloco):
+            yield df.iloc[inicio:inicio + tamanho_bloco]
+
+    # --- engine python ------------------------------------------------------
+
+    def _iterar_pandas(self, tamanho_bloco):
+        def descartar(campos):
+            self.linhas_total += 1
+            self.linhas_descartadas += 1
+            self._validar_linha('?', self.sep.join(campos), len(campos))
+            return None
+
+        # Colunas fora do mapa ficam como texto, igual à leitura via pyarrow
+        dtype = defaultdict(lambda: str, self.dtype) if isinstance(self.dtype, dict) else self.dtype
+        blocos = pd.read_csv(self.caminho, sep=self.sep, encoding=self.encoding, dtype=dtype,
+                             engine='python', on_bad_lines=descartar,
+                             chunksize=tamanho_bloco)
+        for df in ([blocos] if tamanho_bloco is None else blocos):
+            if df.empty and self.linhas_lidas:
+                continue
+            self.linhas_total += len(df)
+            if self._cabecalho_divergente:
+                self.linhas_invalidas += len(df)
+            df.index = pd.RangeIndex(self.linhas_lidas, self.linhas_lidas + len(df))
+            self.linhas_lidas += len(df)
+            yield df
+
+    def iterar(self, tamanho_bloco=None):
+        """
+        Gera DataFrames de até `tamanho_bloco` linhas (None = arquivo inteiro em um bloco).
+        """
+        self._reiniciar()
+        nomes = self._cabecalho()
+        if not nomes:
+            return
+        self.linhas_total = 1
+        self._cabecalho_divergente = self.campos_esperados is not None and len(nomes) != self.campos_esperados
+        self._validar_linha(1, self.sep.join(map(str, nomes)), len(nomes))
+
+        if self.engine == 'pyarrow':
+            yield from self._iterar_pyarrow(nomes, tamanho_bloco)
+        elif self.engine == 'c':
+            yield from self._iterar_c(tamanho_bloco)
+        else:
+            yield from self._iterar_pandas(tamanho_bloco)
+
+        if self.linhas_descartadas:
+            logger.warning(f"{self.linhas_descartadas} linhas inválidas descartadas em {self.caminho}")
+        self._relatar_invalidas()
+
+    def ler(self):
+        """Lê o arquivo inteiro e retorna um único DataFrame."""
+        # Consome o gerador até o fim para que o resumo e o limite de inválidas sejam aplicados
+        blocos = list(self.iterar(tamanho_bloco=None))
+        return blocos[0] if blocos else pd.DataFrame()
+
+
+def _importavel(modulo):
+    try:
+        __import__(modulo)
+        return True
+    except ImportError:
+        return False
+
+
+def backend_excel_disponivel(caminho, preferido=None):
+    """
+    Escolhe o backend de leitura para a planilha.
+
+    Retorna 'calamine' se o python-calamine estiver instalado, senão 'openpyxl'
+    (só .xlsx/.xlsm), senão 'pandas' (read_excel com o engine padrão). Um backend
+    informado (ou em EXCEL_BACKEND) que não sirva para o arquivo cai no próximo.
+    """
+    preferido = preferido or os.getenv('EXCEL_BACKEND')
+    extensao = os.path.splitext(caminho)[-1].lower()
+    candidatos = BACKENDS_EXCEL
+    if preferido in BACKENDS_EXCEL:
+        candidatos = BACKENDS_EXCEL[BACKENDS_EXCEL.index(preferido):]
+
+    for backend in candidatos:
+        if backend == 'calamine' and _importavel('python_calamine'):
+            return 'calamine'
+        if backend == 'openpyxl' and extensao in ('.xlsx', '.xlsm') and _importavel('openpyxl'):
+            return 'openpyxl'
+    return 'pandas'
+
+
+def _nomes_colunas(cabecalho):
+    """Nomes das colunas como no read_excel: vazios viram 'Unnamed: i' e repetidos ganham '.1', '.2'..."""
+    nomes = []
+    for i, valor in enumerate(cabecalho):
+        if valor is None or valor == '':
+            nomes.append(f"Unnamed: {i}")
+        elif isinstance(valor, float) and valor.is_integer():
+            nomes.append(int(valor))
+        else:
+            nomes.append(valor)
+
+    contagem = defaultdict(int)
+    for i, nome in enumerate(nomes):
+        atual = contagem[nome]
+        while atual > 0:
+            contagem[nome] = atual + 1
+            nome = f"{nome}.{atual}"
+            atual = contagem[nome]
+        nomes[i] = nome
+        contagem[nome] = atual + 1
+    return nomes
+
+
+def _celula_para_texto(valor):
+    """Converte uma célula não textual como o read_excel(dtype=str): 12.0 -> '12', data -> '2024-01-31 00:00:00'."""
+    if valor is None:
+        return np.nan
+    if isinstance(valor, str):
+        return np.nan if valor in _NULOS_EXCEL else valor
+    if isinstance(valor, float):
+        if valor != valor:
+            return np.nan
+        return str(int(valor)) if valor.is_integer() else str(valor)
+    if isinstance(valor, date) and not isinstance(valor, datetime):
+        # calamine devolve date para células só com data; openpyxl/pandas devolvem datetime
+        valor = datetime.combine(valor, time())
+    return str(valor)
+
+
+def _coluna_texto(valores):
+    """Coluna de células -> Series object com str e NaN (caminho vetorizado quando já é só texto)."""
+    if pd.api.types.infer_dtype(valores, skipna=True) in ('string', 'empty'):
+        serie = pd.Series(valores, dtype=object)
+        return serie.where(serie.notna() & ~serie.isin(_NULOS_EXCEL), np.nan)
+    return pd.Series([_celula_para_texto(v) for v in valores], dtype=object)
+
+
+class LeitorExcel:
+    """
+    Leitor de planilhas com backend plugável, equivalente a pd.read_excel(dtype=str).
+
+    - calamine: parser nativo (Rust) para .xls/.xlsx, quando o python-calamine existe;
+    - openpyxl: iterador read-only com values_only, sem criar objetos de célula;
+    - pandas: o próprio read_excel, para os casos que os anteriores não atendem.
+
+    Nos dois primeiros as linhas são lidas em streaming e convertidas em blocos
+    (arrays por coluna), mantendo o tratamento do cabeçalho do read_excel
+    (primeira linha, 'Unnamed: i', nomes repetidos), o descarte das linhas
+    vazias do fim da aba e os textos nulos padrão. Com `colunas`, só as colunas
+    informadas (pelo cabeçalho do arquivo) são convertidas e devolvidas.
+    """
+
+    def __init__(self, caminho, colunas=None, backend=None, aba=0, tamanho_bloco=50000):
+        self.caminho = caminho
+        self.colunas = list(colunas) if colunas is not None else None
+        self.backend = backend_excel_disponivel(caminho, backend)
+        self.aba = aba
+        self.tamanho_bloco = tamanho_bloco
+        self.linhas_lidas = 0
+
+    def _linhas(self):
+        """Gera as linhas da aba como sequências de valores (cabeçalho incluso)."""
+        if self.backend == 'calamine':
+            from python_calamine import CalamineWorkbook
+
+            livro = CalamineWorkbook.from_path(self.caminho)
+            try:
+                aba = (livro.get_sheet_by_index(self.aba) if isinstance(self.aba, int)
+                       else livro.get_sheet_by_name(self.aba))
+                yield from aba.iter_rows()
+            finally:
+                livro.close()
+        else:
+            from openpyxl import load_workbook
+
+            livro = load_workbook(self.caminho, read_only=True, data_only=True, keep_links=False)
+            try:
+                aba = livro.worksheets[self.aba] if isinstance(self.aba, int) else livro[self.aba]
+                # Dimensões gravadas por alguns exportadores são erradas; o pandas faz o mesmo
+                aba.reset_dimensions()
+                yield from aba.iter_rows(values_only=True)
+            finally:
+                livro.close()
+
+    def _montar_bloco(self, nomes, indices, bloco):
+        """
+        Linhas (já do tamanho do cabeçalho) -> (DataFrame de texto, linhas vazias do fim).
+
+        Linhas vazias no fim do bloco são devolvidas à parte: o read_excel descarta
+        só as do fim da planilha, então elas voltam no começo do próximo bloco.
+        """
+        matriz = np.empty((len(bloco), len(nomes)), dtype=object)
+        if bloco:
+            matriz[:] = bloco
+        preenchidas = np.flatnonzero(~((matriz == None) | (matriz == '')).all(axis=1))  # noqa: E711
+        fim = preenchidas[-1] + 1 if len(preenchidas) else 0
+
+        df = pd.DataFrame({nomes[i]: _coluna_texto(matriz[:fim, i]) for i in indices})
+        df.index = pd.RangeIndex(self.linhas_lidas, self.linhas_lidas + len(df))
+        self.linhas_lidas += len(df)
+        return df, bloco[fim:]
+
+    def iterar(self, tamanho_bloco=None):
+        """Gera DataFrames de até `tamanho_bloco` linhas (padrão: o do construtor)."""
+        self.linhas_lidas = 0
+        if self.backend == 'pandas':
+            usecols = None if self.colunas is None else (lambda col: col in set(self.colunas))
+            df = pd.read_excel(self.caminho, dtype=str, sheet_name=self.aba, usecols=usecols)
+            self.linhas_lidas = len(df)
+            yield df
+            return
+
+        tamanho_bloco = tamanho_bloco or self.tamanho_bloco
+        linhas = self._linhas()
+        cabecalho = list(next(linhas, None) or ())
+        # Células vazias no fim do cabeçalho não geram colunas (como no read_excel)
+        while cabecalho and (cabecalho[-1] is None or cabecalho[-1] == ''):
+            cabecalho.pop()
+        if not cabecalho:
+            yield pd.DataFrame()
+            return
+
+        nomes = _nomes_colunas(cabecalho)
+        largura = len(nomes)
+        if self.colunas is None:
+            indices = range(largura)
+        else:
+            desejadas = set(self.colunas)
+            indices = [i for i, nome in enumerate(nomes) if nome in desejadas]
+
+        bloco = []
+        limite = tamanho_bloco
+        enviou = False
+        for linha in linhas:
+            if len(linha) != largura:
+                linha = tuple(linha[:largura]) + (None,) * (largura - len(linha))
+            bloco.append(linha)
+            if len(bloco) >= limite:
+                df, bloco = self._montar_bloco(nomes, indices, bloco)
+                limite = len(bloco) + tamanho_bloco
+                if len(df):
+                    enviou = True
+                    yield df
+
+        df, _ = self._montar_bloco(nomes, indices, bloco)
+        if len(df) or not enviou:
+            yield df
+
+    def ler(self):
+        """Lê a aba inteira e retorna um único DataFrame."""
+        inicio = datetime.now()
+        blocos = list(self.iterar())
+        df = blocos[0] if len(blocos) == 1 else pd.concat(blocos)
+        logger.info(f"Planilha lida com backend {self.backend}: {len(df)} linhas em "
+                    f"{(datetime.now() - inicio).total_seconds():.2f}s")
+        return df
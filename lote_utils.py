@@ -0,0 +1,102 @@
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+class ControladorLotes:
+    """
+    Ajusta o tamanho do lote e a cadência de commits pela latência medida.
+
+    A cada lote registra o tempo por linha (média móvel exponencial) e
+    recalcula o tamanho para que um lote leve ~`tempo_alvo_lote` segundos,
+    crescendo/encolhendo no máximo 2x por passo. O commit acontece quando a
+    transação aberta acumula ~`tempo_alvo_commit` segundos. A pausa entre lotes
+    só é aplicada quando a latência por linha degrada em relação à melhor
+    observada (backpressure), em vez de um sleep fixo.
+    """
+
+    def __init__(self, tamanho_inicial=100, tamanho_min=20, tamanho_max=5000,
+                 tempo_alvo_lote=0.5, tempo_alvo_commit=3.0, pausa_max=2.0,
+                 limiar_degradacao=2.0, suavizacao=0.3):
+        self.tamanho_min = tamanho_min
+        self.tamanho_max = max(tamanho_max, tamanho_min)
+        self.tamanho = min(max(tamanho_inicial, self.tamanho_min), self.tamanho_max)
+        self.tempo_alvo_lote = tempo_alvo_lote
+        self.tempo_alvo_commit = tempo_alvo_commit
+        self.pausa_max = pausa_max
+        self.limiar_degradacao = limiar_degradacao
+        self.suavizacao = suavizacao
+
+        self.seg_por_linha = None
+        self.melhor_seg_por_linha = None
+        self.ultimo_seg_por_linha = None
+        self.tempo_transacao = 0.0
+        self.linhas = 0
+        self.afetados = 0
+
+    @classmethod
+    def do_ambiente(cls, prefixo, **padroes):
+        """
+        Cria o controlador lendo `<prefixo>_LOTE_INICIAL`, `_LOTE_MIN`, `_LOTE_MAX`,
+        `_LOTE_TEMPO_ALVO`, `_COMMIT_TEMPO_ALVO` e `_PAUSA_MAX`, com `padroes` como fallback.
+        """
+        variaveis = {
+            'tamanho_inicial': ('LOTE_INICIAL', int),
+            'tamanho_min': ('LOTE_MIN', int),
+            'tamanho_max': ('LOTE_MAX', int),
+            'tempo_alvo_lote': ('LOTE_TEMPO_ALVO', float),
+            'tempo_alvo_commit': ('COMMIT_TEMPO_ALVO', float),
+            'pausa_max': ('PAUSA_MAX', float),
+        }
+        config = dict(padroes)
+        for parametro, (sufixo, tipo) in variaveis.items():
+            valor = os.getenv(f"{prefixo}_{sufixo}")
+            if valor:
+                config[parametro] = tipo(valor)
+        return cls(**config)
+
+    def registrar(self, linhas, duracao, afetados=0):
+        """Registra um lote executado e recalcula o tamanho do próximo."""
+        if linhas <= 0:
+            return
+        self.linhas += linhas
+        self.afetados += max(afetados or 0, 0)
+        self.tempo_transacao += duracao
+
+        atual = duracao / linhas
+        self.ultimo_seg_por_linha = atual
+        if self.seg_por_linha is None:
+            self.seg_por_linha = atual
+        else:
+            self.seg_por_linha = self.suavizacao * atual + (1 - self.suavizacao) * self.seg_por_linha
+        if self.melhor_seg_por_linha is None or atual < self.melhor_seg_por_linha:
+            self.melhor_seg_por_linha = atual
+
+        if self.seg_por_linha > 0:
+            ideal = self.tempo_alvo_lote / self.seg_por_linha
+            ideal = min(max(ideal, self.tamanho / 2), self.tamanho * 2)
+            self.tamanho = int(min(max(ideal, self.tamanho_min), self.tamanho_max))
+
+    def deve_commitar(self):
+        """True quando a transação aberta já acumulou o tempo alvo."""
+        return self.tempo_transacao >= self.tempo_alvo_commit
+
+    def commitado(self):
+        self.tempo_transacao = 0.0
+
+    def pausa(self):
+        """Segundos de pausa antes do próximo lote (0 se a latência está saudável)."""
+        if not self.ultimo_seg_por_linha or not self.melhor_seg_por_linha:
+            return 0.0
+        degradacao = self.ultimo_seg_por_linha / self.melhor_seg_por_linha
+        if degradacao < self.limiar_degradacao:
+            return 0.0
+        # Proporcional ao quanto o lote passou do tempo alvo
+        excesso = self.ultimo_seg_por_linha * self.tamanho - self.tempo_alvo_lote
+        return min(max(excesso, 0.0), self.pausa_max)
+
+    def resumo(self):
+        return (f"lote atual {self.tamanho}, "
+                f"{(self.seg_por_linha or 0) * 1000:.2f}ms/linha, "
+                f"{self.afetados}/{self.linhas} linhas afetadas")
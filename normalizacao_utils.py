@@ -0,0 +1,148 @@
+import logging
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    _TEXTO_ARROW = pd.ArrowDtype(pa.string())
+except ImportError:
+    _TEXTO_ARROW = None
+
+logger = logging.getLogger(__name__)
+
+# Textos tratados como NULL na carga (comparados depois do strip)
+VALORES_NULOS = ('', 'None', 'null')
+
+
+def normalizar_texto(df, limites=None, limite_padrao=None, aparar=True, valores_nulos=VALORES_NULOS):
+    """
+    Normaliza as colunas de texto em uma passada vetorizada por coluna: strip,
+    vazios/"None"/"null" viram None e truncamento pelo tamanho da coluna no banco.
+
+    Colunas tipadas (números, Int32, boolean) são mantidas como estão; colunas
+    object com outros objetos (ex.: date) só têm NaN trocado por None.
+
+    Args:
+        df: DataFrame tratado
+        limites: {coluna: tamanho máximo}, normalmente o `limites` do Esquema
+        limite_padrao: Tamanho usado para colunas de texto fora de `limites` (None = sem limite)
+        aparar: Remove espaços nas pontas
+        valores_nulos: Textos que viram None
+
+    Returns:
+        pd.DataFrame: O próprio DataFrame, com `attrs['normalizado'] = True`
+    """
+    limites = limites or {}
+    truncados = {}
+
+    for col in df.columns:
+        serie = df[col]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            serie = serie.astype(object)
+        if serie.dtype != object and not pd.api.types.is_string_dtype(serie):
+            continue
+
+        if pd.api.types.infer_dtype(serie, skipna=True) not in ('string', 'empty'):
+            df[col] = serie.where(serie.notna(), None)
+            continue
+
+        texto = serie.str.strip() if aparar else serie
+        nulo = texto.isna() | texto.isin(valores_nulos)
+        if not aparar:
+            nulo |= texto.str.strip().eq('').fillna(False)
+
+        limite = limites.get(col, limite_padrao)
+        if limite:
+            longos = (texto.str.len() > limite).fillna(False)
+            if longos.any():
+                truncados[col] = int(longos.sum())
+                texto = texto.str.slice(0, limite)
+
+        valores = texto.to_numpy(dtype=object, na_value=None)
+        valores[nulo.to_numpy(dtype=bool)] = None
+        df[col] = pd.Series(valores, index=df.index, dtype=object)
+
+    if truncados:
+        logger.warning(f"Valores truncados pelo tamanho da coluna: {truncados}")
+
+    df.attrs['normalizado'] = True
+    return df
+
+
+def _como_texto(serie):
+    """
+    Série como texto, com os nulos preservados e os outros valores convertidos por str().
+
+    Com pyarrow o resultado usa o tipo string do Arrow, em que strip/slice/replace/len
+    rodam em C sobre a coluna inteira; sem ele, fica em object (métodos .str do pandas).
+    """
+    if serie.dtype != object or pd.api.types.infer_dtype(serie, skipna=True) not in ('string', 'empty'):
+        serie = serie.astype(object)
+        serie = serie.where(serie.isna(), serie.astype(str))
+    if _TEXTO_ARROW is not None:
+        return serie.astype(_TEXTO_ARROW)
+    return serie
+
+
+def _para_objeto(texto, index):
+    """Texto -> coluna object com None nos nulos e nos vazios (como `... or None` por célula)."""
+    if isinstance(texto.dtype, pd.ArrowDtype):
+        # Vazios viram nulos ainda no Arrow; o to_pandas cria os objetos str de uma vez
+        valores = pa.array(texto)
+        valores = pc.if_else(pc.equal(valores, ''), pa.scalar(None, valores.type), valores)
+        valores = valores.to_pandas().to_numpy()
+    else:
+        valores = texto.to_numpy(dtype=object, na_value=None)
+        valores[texto.fillna('').eq('').to_numpy(dtype=bool)] = None
+    return pd.Series(valores, index=index, dtype=object)
+
+
+def truncar_colunas(df, limites):
+    """
+    Strip e truncamento das colunas em `limites`, uma operação vetorizada por coluna;
+    nulos e textos vazios viram None.
+
+    Args:
+        df: DataFrame tratado
+        limites: {coluna: tamanho máximo} (colunas ausentes no DataFrame são ignoradas)
+    """
+    for col, limite in limites.items():
+        if col in df.columns:
+            texto = _como_texto(df[col]).str.strip().str.slice(0, limite)
+            df[col] = _para_objeto(texto, df.index)
+    return df
+
+
+def remover_pontos(df, colunas, limites=None):
+    """Remove os pontos de colunas de código ('1.234' -> '1234') e trunca pelo limite; vazios viram None."""
+    limites = limites or {}
+    for col in colunas:
+        if col in df.columns:
+            texto = _como_texto(df[col]).str.replace('.', '', regex=False)
+            if limites.get(col):
+                texto = texto.str.slice(0, limites[col])
+            df[col] = _para_objeto(texto, df.index)
+    return df
+
+
+def contar_excedentes(df, limites):
+    """
+    Conta os valores mais longos que o limite de cada coluna (nulos não contam).
+
+    Returns:
+        dict: {coluna: quantidade} só para as colunas com algum valor excedente
+    """
+    excedentes = {}
+    for col, limite in limites.items():
+        if col in df.columns:
+            quantidade = int((_como_texto(df[col]).str.len() > limite).sum())
+            if quantidade:
+                excedentes[col] = quantidade
+    return excedentes
+
+
+def valores_para_carga(df):
+    """Converte o DataFrame em tuplas com tipos nativos do Python e None nos nulos (para execute_values)."""
+    objetos = df.astype(object)
+    return list(objetos.where(df.notna(), None).itertuples(index=False, name=None))
@@ -0,0 +1,295 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Pasta da landing zone (um Parquet por relatório/janela + manifesto.json)
+PASTA_LANDING = os.getenv('PASTA_LANDING', 'landing')
+
+# Bytes do início do arquivo usados na impressão digital (junto com tamanho e mtime)
+_AMOSTRA_DIGITAL = 1024 * 1024
+
+_LOCK = threading.Lock()
+
+
+def parquet_disponivel():
+    """True se o pyarrow estiver instalado e a landing zone não tiver sido desligada (LANDING_PARQUET=0)."""
+    if os.getenv('LANDING_PARQUET', '1') == '0':
+        return False
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def impressao_digital(caminho):
+    """Identifica um download pelo tamanho, mtime e SHA-1 do primeiro MiB (sem ler o arquivo inteiro)."""
+    info = os.stat(caminho)
+    sha1 = hashlib.sha1()
+    with open(caminho, 'rb') as f:
+        sha1.update(f.read(_AMOSTRA_DIGITAL))
+    return {'tamanho': info.st_size, 'modificado': info.st_mtime_ns, 'sha1_inicio': sha1.hexdigest()}
+
+
+def _esquema_arrow(df):
+    """
+    Esquema fixo para os blocos: category vira dictionary<int32, string> e o resto
+    texto, para que todos os row groups tenham o mesmo tipo e a releitura devolva
+    os mesmos dtypes da leitura original (category/object).
+    """
+    import pyarrow as pa
+
+    campos = []
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            campos.append(pa.field(str(col), pa.dictionary(pa.int32(), pa.string())))
+        elif df[col].dtype == object:
+            campos.append(pa.field(str(col), pa.string()))
+        else:
+            campos.append(pa.field(str(col), pa.Array.from_pandas(df[col]).type))
+    return pa.schema(campos)
+
+
+def _para_pandas(tabela):
+    """Arrow -> pandas com nulos de texto como NaN, igual ao read_csv/read_excel(dtype=str)."""
+    df = tabela.to_pandas()
+    texto = [col for col in df.columns if df[col].dtype == object]
+    if texto:
+        df[texto] = df[texto].fillna(np.nan)
+    return df
+
+
+def aplicar_filtros(df, filtros):
+    """
+    Aplica em memória os mesmos filtros aceitos na leitura do Parquet (lista de
+    tuplas (coluna, operador, valor) combinadas com AND), para que a primeira
+    leitura, feita do arquivo bruto, devolva o mesmo que as releituras.
+    """
+    if not filtros:
+        return df
+    operadores = {
+        '==': lambda s, v: s == v, '=': lambda s, v: s == v, '!=': lambda s, v: s != v,
+        '<': lambda s, v: s < v, '<=': lambda s, v: s <= v, '>': lambda s, v: s > v, '>=': lambda s, v: s >= v,
+        'in': lambda s, v: s.isin(list(v)), 'not in': lambda s, v: ~s.isin(list(v)),
+    }
+    mascara = pd.Series(True, index=df.index)
+    for coluna, operador, valor in filtros:
+        mascara &= operadores[operador](df[coluna], valor).fillna(False).astype(bool)
+    return df[mascara]
+
+
+class GravadorParquet:
+    """Grava um export em blocos (um row group por bloco) e só publica no manifesto ao concluir."""
+
+    def __init__(self, zona, relatorio, origem, janela):
+        self.zona = zona
+        self.relatorio = relatorio
+        self.origem = origem
+        self.janela = janela
+        self.caminho = zona._caminho(relatorio, janela)
+        self.temporario = f"{self.caminho}.tmp"
+        self.linhas = 0
+        self._writer = None
+        self._esquema = None
+
+    def escrever(self, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self._writer is None:
+            os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+            self._esquema = _esquema_arrow(df)
+            self._writer = pq.ParquetWriter(self.temporario, self._esquema, compression=self.zona.compressao)
+        tabela = pa.Table.from_pandas(df, schema=self._esquema, preserve_index=False)
+        self._writer.write_table(tabela)
+        self.linhas += len(df)
+
+    def concluir(self, **extras):
+        """
+        Fecha o arquivo e registra no manifesto (com `extras`, ex.: linhas descartadas).
+        Retorna a entrada (None se nada foi escrito).
+        """
+        if self._writer is None:
+            return None
+        self._writer.close()
+        self._writer = None
+        os.replace(self.temporario, self.caminho)
+        return self.zona._registrar(self.relatorio, self.origem, self.janela, self.caminho,
+                                    self.linhas, [f.name for f in self._esquema], **extras)
+
+    def descartar(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if os.path.exists(self.temporario):
+            os.remove(self.temporario)
+
+
+class ZonaParquet:
+    """
+    Landing zone em Parquet dos exports baixados do SGI.
+
+    Cada download é convertido uma vez em Parquet comprimido, identificado por
+    tipo de relatório e janela (a informada pelo chamador ou, por padrão, o dia
+    do download mais a impressão digital), e registrado em `manifesto.json` com a
+    impressão digital do arquivo de origem. Reprocessar o mesmo export (re-runs,
+    backfills, depuração) lê o Parquet com projeção de colunas e filtros
+    aplicados na leitura, em vez de refazer o parse de CSV/Excel.
+
+    Sem pyarrow (ou com LANDING_PARQUET=0) a zona fica inativa e `carregar`
+    apenas chama o leitor original.
+    """
+
+    def __init__(self, pasta=None, compressao='zstd'):
+        self.pasta = pasta or PASTA_LANDING
+        self.compressao = compressao
+        self.ativa = parquet_disponivel()
+        self.manifesto_caminho = os.path.join(self.pasta, 'manifesto.json')
+        if not self.ativa:
+            logger.info("Landing zone Parquet inativa (pyarrow ausente ou LANDING_PARQUET=0)")
+
+    @staticmethod
+    def janela_padrao(origem, digital=None):
+        """
+        Janela usada quando o chamador não informa: dia de modificação do download
+        seguido de um resumo da impressão digital. Só o dia não basta: dois exports
+        baixados no mesmo dia (outro filtro, outro ciclo) ocupariam a mesma entrada
+        e um seria lido no lugar do outro.
+        """
+        digital = digital or impressao_digital(origem)
+        resumo = hashlib.sha1(json.dumps(digital, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+        dia = datetime.fromtimestamp(digital['modificado'] / 1e9).strftime('%Y%m%d')
+        return f"{dia}_{resumo}"
+
+    def _caminho(self, relatorio, janela):
+        return os.path.join(self.pasta, relatorio, f"{janela}.parquet")
+
+    def _ler_manifesto(self):
+        if not os.path.exists(self.manifesto_caminho):
+            return {}
+        with open(self.manifesto_caminho, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _registrar(self, relatorio, origem, janela, caminho, linhas, colunas, **extras):
+        entrada = {
+            'relatorio': relatorio,
+            'janela': janela,
+            'parquet': caminho,
+            'origem': os.path.abspath(origem),
+            'digital': impressao_digital(origem),
+            'linhas': linhas,
+            'colunas': colunas,
+            'criado_em': datetime.now().isoformat(timespec='seconds'),
+            **extras,
+        }
+        with _LOCK:
+            manifesto = self._ler_manifesto()
+            manifesto[f"{relatorio}/{janela}"] = entrada
+            os.makedirs(self.pasta, exist_ok=True)
+            temporario = f"{self.manifesto_caminho}.tmp"
+            with open(temporario, 'w', encoding='utf-8') as f:
+                json.dump(manifesto, f, ensure_ascii=False, indent=2)
+            os.replace(temporario, self.manifesto_caminho)
+        logger.info(f"Landing zone: {relatorio}/{janela} gravado ({linhas} linhas) em {caminho}")
+        return entrada
+
+    def procurar(self, relatorio, origem=None, janela=None):
+        """
+        Entrada do manifesto para o export, ou None.
+
+        Com `origem`, só vale se a impressão digital do arquivo bater (o mesmo
+        download); sem `origem` (backfill sem o bruto), basta relatório + janela.
+        """
+        if not self.ativa:
+            return None
+        digital = impressao_digital(origem) if origem is not None else None
+        if janela is None:
+            if origem is None:
+                return None
+            janela = self.janela_padrao(origem, digital)
+        entrada = self._ler_manifesto().get(f"{relatorio}/{janela}")
+        if not entrada or not os.path.exists(entrada['parquet']):
+            return None
+        if digital is not None and entrada['digital'] != digital:
+            return None
+        return entrada
+
+    def ler(self, entrada, colunas=None, filtros=None):
+        """
+        Lê o Parquet de uma entrada.
+
+        Args:
+            colunas: Projeção (colunas ausentes no arquivo são ignoradas)
+            filtros: Filtros no formato do pandas/pyarrow, ex.: [('Situação', '==', 'Cancelado')]
+        """
+        import pyarrow.parquet as pq
+
+        tabela = pq.read_table(entrada['parquet'], columns=self._projecao(entrada, colunas), filters=filtros)
+        return _para_pandas(tabela)
+
+    def iterar(self, entrada, tamanho_bloco, colunas=None, filtros=None):
+        """Gera DataFrames de até `tamanho_bloco` linhas a partir do Parquet, com índice contínuo."""
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+
+        conjunto = ds.dataset(entrada['parquet'], format='parquet')
+        expressao = pq.filters_to_expression(filtros) if filtros else None
+        lidas = 0
+        for lote in conjunto.to_batches(columns=self._projecao(entrada, colunas), filter=expressao,
+                                        batch_size=tamanho_bloco):
+            if lote.num_rows == 0:
+                continue
+            df = _para_pandas(lote)
+            df.index = pd.RangeIndex(lidas, lidas + len(df))
+            lidas += len(df)
+            yield df
+
+    def _projecao(self, entrada, colunas):
+        if colunas is None:
+            return None
+        return [c for c in colunas if c in entrada['colunas']]
+
+    def gravador(self, relatorio, origem, janela=None):
+        """GravadorParquet para escrever o export em blocos (None se a zona estiver inativa)."""
+        if not self.ativa:
+            return None
+        return GravadorParquet(self, relatorio, origem, janela or self.janela_padrao(origem))
+
+    def carregar(self, relatorio, origem, leitor, janela=None, colunas=None, filtros=None):
+        """
+        Lê o export pela landing zone: se o mesmo download já foi convertido, lê o
+        Parquet; senão chama `leitor()` (parse original), grava o Parquet e devolve
+        o resultado com a mesma projeção/filtros.
+        """
+        if not self.ativa:
+            return leitor()
+
+        entrada = self.procurar(relatorio, origem, janela)
+        if entrada:
+            logger.info(f"Landing zone: lendo {relatorio}/{entrada['janela']} do Parquet ({entrada['linhas']} linhas)")
+            return self.ler(entrada, colunas=colunas, filtros=filtros)
+
+        df = leitor()
+        gravador = self.gravador(relatorio, origem, janela)
+        try:
+            gravador.escrever(df)
+            entrada = gravador.concluir()
+        except Exception as e:
+            # A landing zone é um acelerador: falhar aqui não pode impedir o processamento
+            gravador.descartar()
+            logger.warning(f"Não foi possível gravar {relatorio} na landing zone: {e}")
+            return df
+
+        df = aplicar_filtros(df, filtros)
+        if colunas is not None:
+            df = df[[c for c in colunas if c in df.columns]]
+        return df
@@ -0,0 +1,193 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Marcador de fim de fluxo colocado na fila de saída de cada etapa
+_FIM = object()
+
+
+class PipelineETL:
+    """
+    Executor de etapas encadeadas por filas limitadas (uma thread por etapa).
+
+    Cada etapa consome a fila da anterior assim que há um item disponível, de
+    modo que leitura, tratamento e carga se sobrepõem. O tamanho das filas
+    limita a memória: uma etapa rápida fica bloqueada até a seguinte consumir.
+    Se uma etapa falhar, as demais são interrompidas e o erro é relançado em
+    `aguardar()`.
+    """
+
+    def __init__(self, tamanho_fila=4, max_tarefas=4):
+        self.tamanho_fila = tamanho_fila
+        self.tempos = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        self._erros = []
+        self._abortar = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=max_tarefas, thread_name_prefix='pipeline')
+        self._inicio = time.perf_counter()
+
+    # ----------------------------------------------------------------- tempos
+    def _registrar(self, nome, tempo_ativo, itens=0, tempo_total=None):
+        with self._lock:
+            etapa = self.tempos.setdefault(nome, {'tempo_ativo': 0.0, 'tempo_total': 0.0, 'itens': 0})
+            etapa['tempo_ativo'] += tempo_ativo
+            etapa['tempo_total'] += tempo_total if tempo_total is not None else tempo_ativo
+            etapa['itens'] += itens
+
+    @contextmanager
+    def medir(self, nome, itens=0):
+        """Mede um trecho executado fora das filas (ex.: download no navegador)."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._registrar(nome, time.perf_counter() - inicio, itens)
+
+    def em_segundo_plano(self, nome, funcao, *args, **kwargs):
+        """Executa `funcao` em outra thread, medindo o tempo. Retorna um Future."""
+        def _executar():
+            with self.medir(nome):
+                return funcao(*args, **kwargs)
+        return self._executor.submit(_executar)
+
+    # ------------------------------------------------------------------ filas
+    def _colocar(self, fila, item):
+        """Put bloqueante que desiste se o pipeline foi abortado."""
+        while not self._abortar.is_set():
+            try:
+                fila.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _retirar(self, fila):
+        """Get bloqueante que devolve _FIM se o pipeline foi abortado."""
+        while True:
+            try:
+                return fila.get(timeout=0.5)
+            except queue.Empty:
+                if self._abortar.is_set():
+                    return _FIM
+
+    def _falhar(self, nome, erro):
+        logger.error(f"Etapa '{nome}' falhou: {erro}")
+        with self._lock:
+            self._erros.append(erro)
+        self._abortar.set()
+
+    def _iniciar(self, nome, alvo):
+        thread = threading.Thread(target=alvo, name=f"pipeline-{nome}", daemon=True)
+        self._threads.append(thread)
+        thread.start()
+
+    # ---------------------------------------------------------------- etapas
+    def fonte(self, nome, iteravel):
+        """
+        Primeira etapa: consome um iterável (ex.: blocos lidos do arquivo) e
+        publica cada item numa fila limitada.
+
+        Returns:
+            queue.Queue: Fila de saída da etapa
+        """
+        saida = queue.Queue(maxsize=self.tamanho_fila)
+
+        def _executar():
+            inicio_etapa = time.perf_counter()
+            ativo = 0.0
+            itens = 0
+            try:
+                iterador = iter(iteravel)
+                while not self._abortar.is_set():
+                    inicio = time.perf_counter()
+                    try:
+                        item = next(iterador)
+                    except StopIteration:
+                        break
+                    finally:
+                        ativo += time.perf_counter() - inicio
+                    itens += 1
+                    if not self._colocar(saida, item):
+                        break
+            except Exception as e:
+                self._falhar(nome, e)
+            finally:
+                self._registrar(nome, ativo, itens, time.perf_counter() - inicio_etapa)
+                self._colocar(saida, _FIM)
+
+        self._iniciar(nome, _executar)
+        return saida
+
+    def etapa(self, nome, entrada, funcao, saidas=1):
+        """
+        Etapa intermediária ou final: aplica `funcao` a cada item da fila de entrada.
+
+        Args:
+            nome: Nome usado no log e nos tempos
+            entrada: Fila de saída de uma etapa anterior
+            funcao: Função aplicada a cada item
+            saidas: 0 descarta o retorno (etapa final); 1 publica o retorno;
+                n > 1 espera uma tupla de n elementos e publica cada um na sua fila
+                (elementos None são ignorados)
+
+        Returns:
+            None, uma fila ou uma lista de filas, conforme `saidas`
+        """
+        filas = [queue.Queue(maxsize=self.tamanho_fila) for _ in range(saidas)]
+
+        def _executar():
+            inicio_etapa = time.perf_counter()
+            ativo = 0.0
+            itens = 0
+            try:
+                while True:
+                    item = self._retirar(entrada)
+                    if item is _FIM:
+                        break
+                    inicio = time.perf_counter()
+                    resultado = funcao(item)
+                    ativo += time.perf_counter() - inicio
+                    itens += 1
+
+                    if saidas == 1:
+                        resultado = (resultado,)
+                    for fila, valor in zip(filas, resultado if saidas else ()):
+                        if valor is not None and not self._colocar(fila, valor):
+                            return
+            except Exception as e:
+                self._falhar(nome, e)
+            finally:
+                self._registrar(nome, ativo, itens, time.perf_counter() - inicio_etapa)
+                for fila in filas:
+                    self._colocar(fila, _FIM)
+
+        self._iniciar(nome, _executar)
+        if saidas == 0:
+            return None
+        return filas[0] if saidas == 1 else filas
+
+    # -------------------------------------------------------------- execução
+    def aguardar(self):
+        """Aguarda todas as etapas, relança o primeiro erro e retorna os tempos."""
+        for thread in self._threads:
+            thread.join()
+        self._executor.shutdown(wait=True)
+        if self._erros:
+            raise self._erros[0]
+        return self.tempos
+
+    def resumo(self):
+        """Registra no log o tempo de cada etapa e o tempo total do pipeline."""
+        logger.info("=== TEMPOS POR ETAPA ===")
+        for nome, etapa in self.tempos.items():
+            logger.info(
+                f"{nome}: ativo {etapa['tempo_ativo']:.2f}s | "
+                f"total {etapa['tempo_total']:.2f}s | itens {etapa['itens']}"
+            )
+        logger.info(f"Tempo total do pipeline: {time.perf_counter() - self._inicio:.2f}s")
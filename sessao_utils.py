@@ -0,0 +1,209 @@
+import json
+import logging
+import os
+import time
+
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.common.by import By
+
+logger = logging.getLogger(__name__)
+
+URL_SGI = 'https://sgi.e-boticario.com.br/'
+
+# Sessão autenticada compartilhada entre as execuções (e entre os scripts que
+# rodam em sequência). SESSAO_CACHE=0 desliga; SESSAO_VALIDADE_HORAS limita a idade.
+ARQUIVO_SESSAO = os.getenv('ARQUIVO_SESSAO', os.path.join('sessao', 'sgi.sessao'))
+ARQUIVO_CHAVE_SESSAO = os.getenv('ARQUIVO_CHAVE_SESSAO',
+                                 os.path.join(os.path.expanduser('~'), '.sgi_sessao.chave'))
+
+# Campos aceitos por Network.setCookies (o getAllCookies devolve outros só informativos)
+_CAMPOS_COOKIE = ('name', 'value', 'domain', 'path', 'secure', 'httpOnly', 'sameSite',
+                  'expires', 'priority', 'sourceScheme', 'sourcePort')
+
+_LER_STORAGE = """
+var copiar = function (s) {
+    var r = {};
+    for (var i = 0; i < s.length; i++) { var k = s.key(i); r[k] = s.getItem(k); }
+    return r;
+};
+return [location.origin, copiar(window.localStorage), copiar(window.sessionStorage)];
+"""
+
+_GRAVAR_STORAGE = """
+var dados = arguments[0];
+Object.keys(dados.local).forEach(function (k) { window.localStorage.setItem(k, dados.local[k]); });
+Object.keys(dados.sessao).forEach(function (k) { window.sessionStorage.setItem(k, dados.sessao[k]); });
+"""
+
+
+def cache_sessao_disponivel():
+    """True se o cryptography estiver instalado e o cache não tiver sido desligado (SESSAO_CACHE=0)."""
+    if os.getenv('SESSAO_CACHE', '1') == '0':
+        return False
+    try:
+        from cryptography.fernet import Fernet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class CacheSessao:
+    """
+    Cookies e storage da sessão logada no SGI, salvos criptografados em disco.
+
+    Na partida, `restaurar` injeta os cookies (todos os domínios, via CDP, inclusive
+    os do login Google), abre uma página do SGI como sonda e confirma a sessão pelo
+    menu principal; só se ela tiver expirado o script faz o login completo e chama
+    `salvar`. Assim, rodando Pedidos, itens_pedidos e VendasCortes em sequência,
+    só o primeiro paga o login.
+
+    O arquivo é criptografado com Fernet (AES + HMAC); a chave vem de CHAVE_SESSAO
+    ou de um arquivo de chave fora da pasta do projeto, criado na primeira vez.
+    Sem cryptography (ou com SESSAO_CACHE=0) o cache fica inativo.
+
+    Args:
+        arquivo: Arquivo do cache (None = ARQUIVO_SESSAO)
+        validade_horas: Idade máxima do cache (None = SESSAO_VALIDADE_HORAS, padrão 12)
+    """
+
+    def __init__(self, arquivo=None, validade_horas=None):
+        self.arquivo = arquivo or ARQUIVO_SESSAO
+        self.validade = float(validade_horas or os.getenv('SESSAO_VALIDADE_HORAS', '12')) * 3600
+        self.ativo = cache_sessao_disponivel()
+
+    # --- criptografia -------------------------------------------------------
+
+    def _fernet(self):
+        from cryptography.fernet import Fernet
+
+        chave = os.getenv('CHAVE_SESSAO')
+        if chave:
+            return Fernet(chave.encode())
+        try:
+            with open(ARQUIVO_CHAVE_SESSAO, 'rb') as f:
+                return Fernet(f.read().strip())
+        except FileNotFoundError:
+            pass
+        chave = Fernet.generate_key()
+        try:
+            # O_EXCL: se outro script criar a chave ao mesmo tempo, usa a dele
+            descritor = os.open(ARQUIVO_CHAVE_SESSAO, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(descritor, 'wb') as f:
+                f.write(chave)
+            logger.info(f"Chave do cache de sessão criada em {ARQUIVO_CHAVE_SESSAO}")
+        except FileExistsError:
+            with open(ARQUIVO_CHAVE_SESSAO, 'rb') as f:
+                chave = f.read().strip()
+        return Fernet(chave)
+
+    def _ler(self):
+        from cryptography.fernet import InvalidToken
+
+        try:
+            with open(self.arquivo, 'rb') as f:
+                token = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            # O ttl do Fernet usa o horário gravado no token: descarta caches antigos
+            return json.loads(self._fernet().decrypt(token, ttl=int(self.validade)))
+        except (InvalidToken, ValueError):
+            logger.info("Cache de sessão expirado ou ilegível; será feito login completo")
+            self.descartar()
+            return None
+
+    def _gravar(self, estado):
+        os.makedirs(os.path.dirname(self.arquivo) or '.', exist_ok=True)
+        temporario = f"{self.arquivo}.tmp"
+        descritor = os.open(temporario, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(descritor, 'wb') as f:
+            f.write(self._fernet().encrypt(json.dumps(estado).encode('utf-8')))
+        os.replace(temporario, self.arquivo)
+
+    def descartar(self):
+        if os.path.exists(self.arquivo):
+            os.remove(self.arquivo)
+
+    # --- navegador ----------------------------------------------------------
+
+    @staticmethod
+    def _cookies(driver):
+        try:
+            return driver.execute_cdp_cmd('Network.getAllCookies', {})['cookies']
+        except (WebDriverException, AttributeError, KeyError):
+            # Sem CDP: só os cookies do domínio atual
+            return driver.get_cookies()
+
+    def salvar(self, driver):
+        """Salva os cookies e o storage da página atual do SGI. Falhas só geram aviso."""
+        if not self.ativo:
+            return False
+        try:
+            estado = {'cookies': self._cookies(driver), 'origem': None, 'local': {}, 'sessao': {}}
+            if driver.current_url.startswith(URL_SGI):
+                estado['origem'], estado['local'], estado['sessao'] = driver.execute_script(_LER_STORAGE)
+            self._gravar(estado)
+            logger.info(f"Sessão salva em {self.arquivo} ({len(estado['cookies'])} cookies)")
+            return True
+        except Exception as e:
+            logger.warning(f"Não foi possível salvar a sessão: {str(e)[:200]}")
+            return False
+
+    def _injetar_cookies(self, driver, cookies):
+        try:
+            parametros = []
+            for cookie in cookies:
+                if 'expiry' in cookie:
+                    # Formato do Selenium (fallback sem CDP na hora de salvar)
+                    cookie = {**cookie, 'expires': cookie['expiry']}
+                parametro = {campo: cookie[campo] for campo in _CAMPOS_COOKIE if campo in cookie}
+                if cookie.get('session') or parametro.get('expires', 0) < 0:
+                    parametro.pop('expires', None)
+                parametros.append(parametro)
+            driver.execute_cdp_cmd('Network.setCookies', {'cookies': parametros})
+        except (WebDriverException, AttributeError):
+            # Sem CDP: add_cookie exige estar no domínio do cookie
+            driver.get(URL_SGI)
+            for cookie in cookies:
+                if URL_SGI.split('/')[2].endswith(cookie.get('domain', '').lstrip('.')):
+                    driver.add_cookie({campo: cookie[campo] for campo in ('name', 'value', 'path', 'secure')
+                                       if campo in cookie})
+
+    def restaurar(self, driver, esperas, timeout=15):
+        """
+        Restaura a sessão salva e confirma com uma sonda na página inicial do SGI.
+
+        Returns:
+            bool: True se o navegador já está logado (não precisa do login completo)
+        """
+        if not self.ativo:
+            return False
+        estado = self._ler()
+        if not estado:
+            return False
+
+        inicio = time.perf_counter()
+        try:
+            self._injetar_cookies(driver, estado['cookies'])
+            driver.get(URL_SGI)
+            valida = esperas.ate(
+                lambda d: 'Entrar.aspx' in d.current_url or bool(d.find_elements(By.ID, 'menu-cod-1')),
+                'sonda da sessão salva', timeout=timeout, exigir=False,
+            ) and 'Entrar.aspx' not in driver.current_url
+            if valida and estado.get('origem') and driver.current_url.startswith(estado['origem']):
+                driver.execute_script(_GRAVAR_STORAGE, {'local': estado['local'], 'sessao': estado['sessao']})
+        except Exception as e:
+            logger.warning(f"Falha ao restaurar a sessão salva: {str(e)[:200]}")
+            valida = False
+
+        if valida:
+            logger.info(f"Sessão restaurada do cache em {time.perf_counter() - inicio:.1f}s; login dispensado")
+            return True
+
+        logger.info("Sessão salva não é mais válida; será feito login completo")
+        self.descartar()
+        try:
+            driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+        except (WebDriverException, AttributeError):
+            driver.delete_all_cookies()
+        return False
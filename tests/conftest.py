@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Os scripts ficam na raiz do repositório (sem pacote): torna-os importáveis nos testes
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,82 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from coercao_utils import converter_booleanos, converter_colunas_inteiras, converter_inteiros
+
+AMOSTRAS_INTEIROS = np.array(['0', '1', '12', '345', '', '1.5', '-3', ' 7', 'abc', None], dtype=object)
+AMOSTRAS_BOOLEANOS = np.array(['Sim', 'Não', 'sim ', 'TRUE', '1', '0', '', None, 'false'], dtype=object)
+
+
+def inteiro_legado(serie):
+    """Conversão célula a célula original do Pedidos.py (referência de equivalência)."""
+    serie = serie.fillna(0)
+    serie = serie.apply(lambda x: None if (isinstance(x, str) and not x.isdigit()) else x)
+    serie = pd.to_numeric(serie, errors='coerce')
+    return serie.apply(lambda x: int(x) if pd.notna(x) and isinstance(x, (int, float)) else 0)
+
+
+def booleano_legado(serie):
+    return serie.map(lambda x: True if str(x).strip().lower() in ['sim', 'true', '1'] else False)
+
+
+def gerar_frame(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'QtdeItens': AMOSTRAS_INTEIROS[rng.integers(0, len(AMOSTRAS_INTEIROS), n)],
+        'CaptacaoRestrita': AMOSTRAS_BOOLEANOS[rng.integers(0, len(AMOSTRAS_BOOLEANOS), n)],
+    })
+
+
+def test_inteiros_equivalentes_ao_legado():
+    serie = pd.Series(AMOSTRAS_INTEIROS)
+    obtido = converter_inteiros(serie, estrito=True)
+    assert str(obtido.dtype) == 'Int32'
+    assert obtido.astype('int64').tolist() == inteiro_legado(serie).tolist()
+
+
+def test_booleanos_equivalentes_ao_legado():
+    serie = pd.Series(AMOSTRAS_BOOLEANOS)
+    obtido = converter_booleanos(serie)
+    assert str(obtido.dtype) == 'boolean'
+    assert obtido.astype(bool).tolist() == booleano_legado(serie).tolist()
+
+
+def test_inteiros_nao_estritos_truncam_e_mantem_nulos():
+    serie = pd.Series(['1.9', '-3', ' 7', 'abc', None], dtype=object)
+    obtido = converter_inteiros(serie, padrao=None)
+    assert obtido.tolist()[:3] == [1, -3, 7]
+    assert obtido.iloc[3:].isna().all()
+
+
+def test_inteiros_fora_do_int32_viram_int64():
+    obtido = converter_inteiros(pd.Series(['1', str(2 ** 40)], dtype=object))
+    assert str(obtido.dtype) == 'Int64'
+    assert obtido.tolist() == [1, 2 ** 40]
+
+
+def test_colunas_ausentes_sao_ignoradas():
+    df = converter_colunas_inteiras(pd.DataFrame({'QtdeItens': ['1', '']}), ['QtdeItens', 'Volume'])
+    assert df['QtdeItens'].tolist() == [1, 0]
+    assert 'Volume' not in df.columns
+
+
+def test_benchmark_500k_linhas():
+    df = gerar_frame(500_000)
+
+    inicio = time.perf_counter()
+    esperado_int = inteiro_legado(df['QtdeItens'])
+    esperado_bool = booleano_legado(df['CaptacaoRestrita'])
+    tempo_legado = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    obtido_int = converter_inteiros(df['QtdeItens'], estrito=True)
+    obtido_bool = converter_booleanos(df['CaptacaoRestrita'])
+    tempo_vetorizado = time.perf_counter() - inicio
+
+    print(f"{len(df)} linhas | Legado: {tempo_legado:.2f}s | Vetorizado: {tempo_vetorizado:.2f}s | "
+          f"Speedup: {tempo_legado / tempo_vetorizado:.1f}x")
+    assert (esperado_int == obtido_int.astype('int64')).all()
+    assert (esperado_bool == obtido_bool.astype(bool)).all()
+    assert tempo_vetorizado < tempo_legado
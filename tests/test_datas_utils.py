@@ -0,0 +1,89 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from datas_utils import FORMATOS_DATA_PADRAO, _CACHE_FORMATOS, converter_coluna_datas
+
+# O fallback automático do conversor legado avisa sobre dayfirst a cada célula
+pytestmark = pytest.mark.filterwarnings('ignore:Parsing dates:UserWarning')
+
+
+def converter_data_legado(valor):
+    """Conversor célula a célula original do Pedidos.py (referência de equivalência)."""
+    if pd.isna(valor) or valor == '':
+        return None
+
+    for formato in FORMATOS_DATA_PADRAO:
+        try:
+            return pd.to_datetime(valor, format=formato).date()
+        except Exception:
+            continue
+
+    # Se nenhum formato funcionar, tenta conversão automática
+    try:
+        return pd.to_datetime(valor).date()
+    except Exception:
+        return None
+
+
+def gerar_corpus(n=5000, seed=0):
+    """Valores parecidos com os dos exports (vários formatos, vazios e lixo)."""
+    rng = np.random.default_rng(seed)
+    base = pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 900, n), unit='D')
+    modelos = [
+        lambda d: d.strftime('%Y-%m-%d'),
+        lambda d: d.strftime('%d/%m/%Y'),
+        lambda d: d.strftime('%d-%m-%Y'),
+        lambda d: d.strftime('%Y/%m/%d'),
+        lambda d: d.strftime('%d/%m/%Y %H:%M'),
+        lambda d: d.strftime('%Y-%m-%d %H:%M:%S'),
+        lambda d: '',
+        lambda d: None,
+        lambda d: 'sem data',
+        lambda d: ' ' + d.strftime('%Y-%m-%d'),
+    ]
+    escolhas = rng.integers(0, len(modelos), n)
+    return pd.Series([modelos[e](d) for e, d in zip(escolhas, base)], dtype=object)
+
+
+def test_equivalente_ao_conversor_legado():
+    corpus = gerar_corpus()
+    esperado = corpus.apply(converter_data_legado)
+    obtido = converter_coluna_datas(corpus)
+    assert obtido.index.equals(corpus.index)
+    assert (esperado.astype(str) == obtido.astype(str)).all()
+
+
+def test_cache_do_formato_vencedor_nao_altera_resultado():
+    corpus = gerar_corpus(seed=1)
+    chave = ('corpus', 'Data')
+    _CACHE_FORMATOS.pop(chave, None)
+    primeira = converter_coluna_datas(corpus, chave_cache=chave)
+    assert chave in _CACHE_FORMATOS
+    segunda = converter_coluna_datas(corpus, chave_cache=chave)
+    assert (primeira.astype(str) == segunda.astype(str)).all()
+
+
+def test_datetime64_quando_como_data_falso():
+    serie = pd.Series(['2024-03-01', '01/03/2024', '', None, 'sem data'], dtype=object)
+    obtido = converter_coluna_datas(serie, como_data=False)
+    assert obtido.dtype == 'datetime64[ns]'
+    assert obtido.iloc[0] == obtido.iloc[1] == pd.Timestamp('2024-03-01')
+    assert obtido.iloc[2:].isna().all()
+
+
+def test_benchmark_mais_rapido_que_o_legado():
+    corpus = gerar_corpus()
+
+    inicio = time.perf_counter()
+    corpus.apply(converter_data_legado)
+    tempo_legado = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    converter_coluna_datas(corpus)
+    tempo_vetorizado = time.perf_counter() - inicio
+
+    print(f"{len(corpus)} valores | Legado: {tempo_legado:.2f}s | Vetorizado: {tempo_vetorizado:.2f}s")
+    assert tempo_vetorizado < tempo_legado
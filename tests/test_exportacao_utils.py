@@ -0,0 +1,141 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+
+from exportacao_utils import ALERTA, BOTAO_ATUALIZAR, BOTAO_DOWNLOAD, ClienteExportacoes, baixar_exportacao
+
+CONTEUDO = ('Pedido;Item;Quantidade\n' + ''.join(f'{i};SKU{i};{i % 7}\n' for i in range(200_000))).encode('latin-1')
+NOME_ARQUIVO = 'BuscarPedidosItensAnalitico_teste.csv'
+COOKIE = 'ASP.NET_SessionId=abc'
+
+
+class Fila(BaseHTTPRequestHandler):
+    """Imita a fila de exportações do SGI: grade com botões ASP.NET, postbacks e o download."""
+
+    estado = None
+
+    def log_message(self, *args):
+        pass
+
+    def _grade(self):
+        self.estado['consultas'] += 1
+        botao = ''
+        if self.estado['consultas'] > self.estado['pronto_apos']:
+            botao = (f'<a id="{BOTAO_DOWNLOAD}" '
+                     'href="javascript:__doPostBack(&#39;ctl00$ContentPlaceHolder1$exportacoesGrid&#39;,'
+                     '&#39;baixar$0&#39;)">Baixar</a>')
+        corpo = (
+            '<html><body><form method="post" action="./Exportacoes.aspx">'
+            f'<input type="hidden" name="__VIEWSTATE" value="vs{self.estado["consultas"]}" />'
+            '<input type="hidden" name="__EVENTVALIDATION" value="ev" />'
+            f'<input type="submit" id="{BOTAO_ATUALIZAR}" name="ctl00$ContentPlaceHolder1$atualizarButton" '
+            'value="Atualizar" />'
+            f'<div id="{ALERTA}" style="display:none"></div>{botao}</form></body></html>'
+        ).encode('utf-8')
+        self._responder(corpo, 'text/html; charset=utf-8')
+
+    def _responder(self, corpo, tipo, extras=None):
+        self.send_response(200)
+        self.send_header('Content-Type', tipo)
+        self.send_header('Content-Length', str(len(corpo)))
+        for nome, valor in (extras or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def do_GET(self):
+        if 'Entrar.aspx' in self.path:
+            self._responder(b'<html><body>Login</body></html>', 'text/html')
+            return
+        if self.headers.get('Cookie') != COOKIE:
+            self.send_response(302)
+            self.send_header('Location', '/Paginas/Acesso/Entrar.aspx')
+            self.end_headers()
+            return
+        self._grade()
+
+    def do_POST(self):
+        dados = parse_qs(self.rfile.read(int(self.headers['Content-Length'])).decode())
+        self.estado['posts'].append(dados)
+        if dados.get('__EVENTARGUMENT') == ['baixar$0']:
+            self._responder(CONTEUDO, 'application/octet-stream',
+                            {'Content-Disposition': f'attachment; filename="{NOME_ARQUIVO}"'})
+        else:
+            self._grade()
+
+
+class NavegadorFalso:
+    def get_cookies(self):
+        return [{'name': 'ASP.NET_SessionId', 'value': 'abc', 'domain': '127.0.0.1', 'path': '/'}]
+
+    def execute_script(self, script):
+        return 'Mozilla/5.0 (teste)'
+
+
+@pytest.fixture
+def fila():
+    estado = {'consultas': 0, 'pronto_apos': 3, 'posts': []}
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), type('FilaTeste', (Fila,), {'estado': estado}))
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{servidor.server_port}/Paginas/Exportacoes.aspx', estado
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def test_baixa_para_disco_depois_de_atualizar_a_fila(fila, tmp_path):
+    url, estado = fila
+    with ClienteExportacoes.do_navegador(NavegadorFalso(), url, intervalo=0.01) as cliente:
+        caminho = cliente.baixar(str(tmp_path))
+
+    assert caminho == str(tmp_path / NOME_ARQUIVO)
+    assert open(caminho, 'rb').read() == CONTEUDO
+    assert not list(tmp_path.glob('*.part'))
+    # Consultou a grade até o botão aparecer, reenviando o postback do "Atualizar" com o viewstate da página
+    atualizacoes = [p for p in estado['posts'] if 'ctl00$ContentPlaceHolder1$atualizarButton' in p]
+    assert len(atualizacoes) == estado['pronto_apos']
+    assert atualizacoes[0]['__VIEWSTATE'] == ['vs1']
+
+
+def test_baixa_para_memoria(fila):
+    url, _ = fila
+    with ClienteExportacoes.do_navegador(NavegadorFalso(), url, intervalo=0.01) as cliente:
+        nome, conteudo = cliente.baixar()
+    assert nome == NOME_ARQUIVO
+    assert conteudo.read() == CONTEUDO
+
+
+def test_nome_repetido_ganha_numero(fila, tmp_path):
+    url, estado = fila
+    (tmp_path / NOME_ARQUIVO).write_bytes(b'anterior')
+    estado['pronto_apos'] = 0
+    with ClienteExportacoes.do_navegador(NavegadorFalso(), url, intervalo=0.01) as cliente:
+        caminho = cliente.baixar(str(tmp_path))
+    assert caminho == str(tmp_path / 'BuscarPedidosItensAnalitico_teste (1).csv')
+    assert (tmp_path / NOME_ARQUIVO).read_bytes() == b'anterior'
+
+
+def test_sessao_expirada(fila):
+    url, _ = fila
+    with pytest.raises(ValueError, match='Sessão do SGI expirada'):
+        ClienteExportacoes(url).consultar()
+
+
+def test_tempo_limite_da_fila(fila):
+    url, estado = fila
+    estado['pronto_apos'] = 10 ** 6
+    with ClienteExportacoes.do_navegador(NavegadorFalso(), url, intervalo=0.01) as cliente:
+        with pytest.raises(TimeoutError):
+            cliente.aguardar_arquivo(timeout=0.05)
+
+
+def test_baixar_exportacao_sem_url_ou_com_falha_devolve_none(fila, tmp_path):
+    url, _ = fila
+    assert baixar_exportacao(NavegadorFalso(), str(tmp_path), url_fila=None) is None
+
+    class SemSessao(NavegadorFalso):
+        def get_cookies(self):
+            return []
+
+    assert baixar_exportacao(SemSessao(), str(tmp_path), url_fila=url) is None
@@ -0,0 +1,194 @@
+import random
+import time
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from leitura_utils import LeitorCSV, LeitorExcel, backend_excel_disponivel
+
+
+def gerar_export_texto(caminho, n=3000, seed=1):
+    """Export em pipe com campos vazios, 'NA', aspas, quebras de linha em campos e linhas curtas/longas."""
+    aleatorio = random.Random(seed)
+
+    def campo(i):
+        sorteio = aleatorio.random()
+        if sorteio < 0.05:
+            return ''
+        if sorteio < 0.08:
+            return 'NA'
+        if sorteio < 0.10:
+            return '"x|y"'
+        if sorteio < 0.12:
+            return '"linha\nquebrada"'
+        return f"v{i}"
+
+    linhas = ['Cod|Nome|Situacao|Valor|']
+    for i in range(n):
+        sorteio = aleatorio.random()
+        if sorteio < 0.02:
+            campos = 6
+        elif sorteio < 0.04:
+            campos = 3
+        elif sorteio < 0.05:
+            linhas.append('')
+            continue
+        else:
+            campos = 5
+        linhas.append('|'.join([str(i)] + [campo(i) for _ in range(campos - 1)]))
+    with open(caminho, 'w', encoding='utf-8') as f:
+        f.write('\ufeff' + '\n'.join(linhas) + '\n')
+    return caminho
+
+
+def leitura_legada(caminho):
+    """Leitura original dos scripts: engine python, linhas com campos a mais descartadas."""
+    return pd.read_csv(caminho, sep='|', encoding='utf-8', engine='python', on_bad_lines='skip', dtype=str)
+
+
+def _normalizar(df):
+    # A engine python completa as linhas curtas com None; o LeitorCSV, com NaN
+    return df.astype(object).fillna('<nulo>')
+
+
+@pytest.fixture(scope='module')
+def export_texto(tmp_path_factory):
+    return gerar_export_texto(tmp_path_factory.mktemp('exports') / 'export.txt')
+
+
+@pytest.mark.parametrize('engine', ['pyarrow', 'c', 'python'])
+@pytest.mark.parametrize('tamanho_bloco', [None, 1, 7, 500])
+def test_equivalente_a_leitura_legada(export_texto, engine, tamanho_bloco):
+    leitor = LeitorCSV(export_texto, engine=engine, dtype={'Situacao': 'category'})
+    blocos = list(leitor.iterar(tamanho_bloco=tamanho_bloco))
+    df = pd.concat(blocos) if len(blocos) > 1 else blocos[0]
+
+    esperado = leitura_legada(export_texto)
+    assert list(df.columns) == list(esperado.columns)
+    assert df.index.equals(pd.RangeIndex(len(esperado)))
+    assert _normalizar(df).equals(_normalizar(esperado))
+    assert leitor.linhas_descartadas == 58
+
+
+def test_contagem_de_invalidas_vem_do_parser(export_texto):
+    leitor = LeitorCSV(export_texto, engine='pyarrow', campos_esperados=5)
+    df = leitor.ler()
+    # Cabeçalho + linhas lidas (inclusive as curtas) + descartadas
+    assert leitor.linhas_total == 1 + len(df) + leitor.linhas_descartadas
+    assert leitor.linhas_invalidas == 116
+    assert len(leitor.amostras) == 5
+
+
+def test_quebra_de_linha_entre_aspas_nao_e_invalida(tmp_path):
+    caminho = tmp_path / 'aspas.txt'
+    caminho.write_text('a|b|c\n1|"x\ny"|3\n4|5|6\n', encoding='utf-8')
+
+    leitor = LeitorCSV(caminho, campos_esperados=3, limite_invalidas=0.10)
+    df = leitor.ler()
+    assert df['b'].tolist() == ['x\ny', '5']
+    assert leitor.linhas_invalidas == 0
+    assert leitor.linhas_descartadas == 0
+
+
+def test_engine_c_conta_descartes(export_texto):
+    leitor = LeitorCSV(export_texto, engine='c', campos_esperados=5)
+    df = leitor.ler()
+    assert leitor.linhas_descartadas == 58
+    assert leitor.linhas_total == 1 + len(df) + leitor.linhas_descartadas
+    assert leitor.amostras[0][1] == 6
+
+
+def test_limite_de_invalidas(tmp_path):
+    caminho = tmp_path / 'invalido.txt'
+    caminho.write_text('a|b|c\n1|2|3\n4|5|6|7\n8|9|10|11\n', encoding='utf-8')
+
+    with pytest.raises(ValueError, match='Muitas linhas inválidas'):
+        LeitorCSV(caminho, campos_esperados=3, limite_invalidas=0.10).ler()
+
+
+def test_arquivo_so_com_cabecalho(tmp_path):
+    caminho = tmp_path / 'vazio.txt'
+    caminho.write_text('a|b|c\n', encoding='utf-8')
+
+    df = LeitorCSV(caminho).ler()
+    assert df.empty
+    assert list(df.columns) == ['a', 'b', 'c']
+
+
+# --- Excel ------------------------------------------------------------------
+
+SELECAO_EXCEL = ['Código Pedido', 'Código Produto', 'Qtde', 'Total Praticado']
+
+
+def gerar_planilha(caminho, n):
+    """Planilha no formato do relatório de itens (texto, códigos, valores e datas)."""
+    from openpyxl import Workbook
+
+    livro = Workbook(write_only=True)
+    aba = livro.create_sheet()
+    aba.append(['Código Pedido', 'Código Produto', 'Produto', 'Data captação pedido', 'Código Revendedor',
+                'Revendedor', 'Situação Fiscal', 'Nota Fiscal', 'Qtde', 'Total Tabela', 'Total Praticado',
+                'Observação'])
+    base = datetime(2024, 1, 1)
+    for i in range(n):
+        aba.append([f"{1_000_000 + i}", 50_000 + i % 997, f"Produto {i % 997}", base, 700_000 + i % 5003,
+                    f"Revendedor {i % 5003}", 'Autorizada' if i % 7 else 'Cancelada', i % 90_000,
+                    i % 12 + 1, f"R$ {i % 300},90", 12.5 + i % 40, None])
+    livro.save(caminho)
+    return caminho
+
+
+@pytest.fixture(scope='module')
+def planilha(tmp_path_factory):
+    pytest.importorskip('openpyxl')
+    return gerar_planilha(str(tmp_path_factory.mktemp('excel') / 'itens.xlsx'), 5_000)
+
+
+def _backend(caminho, backend):
+    if backend_excel_disponivel(caminho, backend) != backend:
+        pytest.skip(f"backend {backend} indisponível")
+    return backend
+
+
+@pytest.mark.parametrize('backend', ['openpyxl', 'calamine'])
+def test_excel_equivalente_ao_read_excel(planilha, backend):
+    _backend(planilha, backend)
+    referencia = pd.read_excel(planilha, dtype=str)
+    pd.testing.assert_frame_equal(LeitorExcel(planilha, backend=backend).ler(), referencia)
+
+
+@pytest.mark.parametrize('backend', ['openpyxl', 'calamine'])
+def test_excel_selecao_de_colunas(planilha, backend):
+    _backend(planilha, backend)
+    referencia = pd.read_excel(planilha, dtype=str, usecols=SELECAO_EXCEL)
+    obtido = LeitorExcel(planilha, colunas=SELECAO_EXCEL, backend=backend).ler()
+    pd.testing.assert_frame_equal(obtido[SELECAO_EXCEL], referencia[SELECAO_EXCEL])
+
+
+@pytest.mark.parametrize('backend', ['openpyxl', 'calamine'])
+def test_excel_em_blocos_igual_a_leitura_inteira(planilha, backend):
+    _backend(planilha, backend)
+    inteira = LeitorExcel(planilha, backend=backend).ler()
+    blocos = list(LeitorExcel(planilha, backend=backend).iterar(tamanho_bloco=2_000))
+    assert [len(b) for b in blocos] == [2_000, 2_000, 1_000]
+    pd.testing.assert_frame_equal(pd.concat(blocos), inteira)
+
+
+def test_benchmark_excel(planilha):
+    inicio = time.perf_counter()
+    pd.read_excel(planilha, dtype=str)
+    tempos = {'read_excel': time.perf_counter() - inicio}
+    for backend in ('openpyxl', 'calamine'):
+        if backend_excel_disponivel(planilha, backend) != backend:
+            continue
+        inicio = time.perf_counter()
+        LeitorExcel(planilha, backend=backend).ler()
+        tempos[backend] = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        LeitorExcel(planilha, colunas=SELECAO_EXCEL, backend=backend).ler()
+        tempos[f"{backend} ({len(SELECAO_EXCEL)} colunas)"] = time.perf_counter() - inicio
+
+    print(" | ".join(f"{nome}: {t:.2f}s" for nome, t in tempos.items()))
+    if 'calamine' in tempos:
+        assert tempos['calamine'] < tempos['read_excel']
@@ -0,0 +1,69 @@
+import pytest
+
+from lote_utils import ControladorLotes
+
+
+def simular(controlador, passos, custo_linha, custo_fixo=0.02):
+    """Executa `passos` lotes com duração custo_fixo + linhas * custo_linha(passo); devolve as pausas."""
+    pausas = []
+    for passo in range(passos):
+        linhas = controlador.tamanho
+        controlador.registrar(linhas, custo_fixo + linhas * custo_linha(passo), linhas)
+        if controlador.deve_commitar():
+            controlador.commitado()
+        pausas.append(controlador.pausa())
+    return pausas
+
+
+def test_lote_converge_para_o_tempo_alvo():
+    controlador = ControladorLotes(tamanho_inicial=100, tamanho_max=100_000, tempo_alvo_lote=0.5)
+    simular(controlador, 30, lambda passo: 0.0004)
+    # ~0.5s por lote com 0.4ms/linha (o custo fixo puxa um pouco para baixo)
+    assert 1_000 <= controlador.tamanho <= 1_250
+    assert controlador.pausa() == 0.0
+
+
+def test_tamanho_muda_no_maximo_2x_por_lote():
+    controlador = ControladorLotes(tamanho_inicial=100, tamanho_max=100_000)
+    controlador.registrar(100, 0.001)
+    assert controlador.tamanho == 200
+    controlador.registrar(200, 100.0)
+    assert controlador.tamanho == 100
+
+
+def test_limites_de_tamanho():
+    controlador = ControladorLotes(tamanho_inicial=10, tamanho_min=20, tamanho_max=50)
+    assert controlador.tamanho == 20
+    simular(controlador, 10, lambda passo: 0.000001)
+    assert controlador.tamanho == 50
+    simular(controlador, 10, lambda passo: 10.0)
+    assert controlador.tamanho == 20
+
+
+def test_pausa_so_quando_a_latencia_degrada():
+    controlador = ControladorLotes(tamanho_inicial=500, tamanho_max=100_000, pausa_max=2.0)
+    pausas = simular(controlador, 40, lambda passo: 0.003 if 15 <= passo < 22 else 0.0004)
+    assert all(p == 0.0 for p in pausas[:15])
+    assert all(0.0 < p <= 2.0 for p in pausas[15:22])
+    assert pausas[-1] == 0.0
+
+
+def test_commit_pelo_tempo_acumulado():
+    controlador = ControladorLotes(tempo_alvo_commit=3.0)
+    controlador.registrar(100, 1.0)
+    controlador.registrar(100, 1.5)
+    assert not controlador.deve_commitar()
+    controlador.registrar(100, 0.6)
+    assert controlador.deve_commitar()
+    controlador.commitado()
+    assert not controlador.deve_commitar()
+
+
+def test_do_ambiente(monkeypatch):
+    monkeypatch.setenv('CANCELADOS_LOTE_INICIAL', '300')
+    monkeypatch.setenv('CANCELADOS_COMMIT_TEMPO_ALVO', '1.5')
+    monkeypatch.delenv('CANCELADOS_LOTE_MAX', raising=False)
+    controlador = ControladorLotes.do_ambiente('CANCELADOS', tamanho_inicial=200, tamanho_max=1000)
+    assert controlador.tamanho == 300
+    assert controlador.tempo_alvo_commit == pytest.approx(1.5)
+    assert controlador.tamanho_max == 1000
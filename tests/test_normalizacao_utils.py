@@ -0,0 +1,125 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import normalizacao_utils
+from normalizacao_utils import contar_excedentes, normalizar_texto, remover_pontos, truncar_colunas
+
+AMOSTRAS = np.array(['Maria da Silva', '  ', '', 'None', 'null', 'x' * 300, ' João ', None], dtype=object)
+
+# Layout do VendasCortes/Estoque: coluna do export -> (coluna da tabela, tamanho máximo)
+COLUNAS_ESPERADAS = {
+    'Código Produto': ('CodigoProduto', 10), 'Nome Produto': ('NomeProduto', 50),
+    'Código Pedido': ('CodigoPedido', 20), 'Código Pessoa': ('CodigoPessoa', 20),
+    'Nome Pessoa': ('NomePessoa', 50), 'Quantidade': ('Quantidade', None),
+}
+LIMITES = {novo: limite for novo, limite in COLUNAS_ESPERADAS.values() if limite}
+CODIGOS = ['CodigoPedido', 'CodigoProduto', 'CodigoPessoa']
+
+
+def gerar_base(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'CodigoProduto': AMOSTRAS[rng.integers(0, len(AMOSTRAS), n)],
+        'NomeProduto': AMOSTRAS[rng.integers(0, len(AMOSTRAS), n)],
+        'CodigoPedido': np.array(['1.234.567', '', None, '89.012'], dtype=object)[rng.integers(0, 4, n)],
+        'CodigoPessoa': np.array(['12.345', '678', None], dtype=object)[rng.integers(0, 3, n)],
+        'NomePessoa': AMOSTRAS[rng.integers(0, len(AMOSTRAS), n)],
+        'Quantidade': rng.integers(0, 10, n),
+    })
+
+
+def truncar_legado(df):
+    """Truncamento + remoção de pontos célula a célula, como nos scripts originais."""
+    df = df.copy()
+    for col in df.columns:
+        if col in LIMITES:
+            limite = LIMITES[col]
+            df[col] = df[col].fillna('').apply(
+                lambda x: str(x).strip()[:limite] if x is not None else '').replace('', None)
+    for col in CODIGOS:
+        df[col] = df[col].fillna('').apply(lambda x: x.replace('.', '')[:LIMITES[col]] if x else '').replace('', None)
+    return df
+
+
+def excedentes_legado(df):
+    contagem = {col: int(df[col].dropna().apply(lambda x: len(str(x)) > LIMITES[col]).sum())
+                for col in LIMITES if col in df.columns}
+    return {col: quantidade for col, quantidade in contagem.items() if quantidade}
+
+
+@pytest.fixture(params=['arrow', 'object'])
+def tipo_texto(request, monkeypatch):
+    if request.param == 'arrow':
+        pytest.importorskip('pyarrow')
+    else:
+        monkeypatch.setattr(normalizacao_utils, '_TEXTO_ARROW', None)
+    return request.param
+
+
+def test_truncar_e_remover_pontos_equivalentes_ao_legado(tipo_texto):
+    base = gerar_base(20_000)
+    obtido = remover_pontos(truncar_colunas(base.copy(), LIMITES), CODIGOS, LIMITES)
+    assert obtido.equals(truncar_legado(base))
+
+
+def test_contar_excedentes_equivalente_ao_legado(tipo_texto):
+    base = gerar_base(20_000)
+    assert contar_excedentes(base, LIMITES) == excedentes_legado(base) != {}
+
+
+def test_valores_nao_textuais(tipo_texto):
+    df = pd.DataFrame({'Codigo': pd.Series([1234, None, 5.5], dtype=object),
+                       'Situacao': pd.Categorical(['Autorizada', None, ' Cancelada '])})
+    truncar_colunas(df, {'Codigo': 3, 'Situacao': 20})
+    assert df['Codigo'].tolist() == ['123', None, '5.5']
+    assert df['Situacao'].tolist() == ['Autorizada', None, 'Cancelada']
+    assert remover_pontos(df, ['Codigo'])['Codigo'].tolist() == ['123', None, '55']
+    assert contar_excedentes(pd.DataFrame({'Valor': pd.Series([12345, None, 7], dtype=object)}), {'Valor': 2}) == {'Valor': 1}
+
+
+def test_benchmark_500k_linhas():
+    base = gerar_base(500_000)
+
+    inicio = time.perf_counter()
+    legado = truncar_legado(base)
+    excedentes_legado(legado)
+    tempo_legado = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    vetorizado = remover_pontos(truncar_colunas(base.copy(), LIMITES), CODIGOS, LIMITES)
+    contar_excedentes(vetorizado, LIMITES)
+    tempo_vetorizado = time.perf_counter() - inicio
+
+    print(f"{len(base)} linhas x {len(LIMITES)} colunas limitadas | Legado: {tempo_legado:.2f}s | "
+          f"Vetorizado: {tempo_vetorizado:.2f}s")
+    assert vetorizado.equals(legado)
+    assert tempo_vetorizado < tempo_legado
+
+
+def test_normalizar_texto_benchmark():
+    rng = np.random.default_rng(0)
+    n = 500_000
+    df = pd.DataFrame({f'Texto{i}': AMOSTRAS[rng.integers(0, len(AMOSTRAS), n)] for i in range(5)})
+
+    inicio = time.perf_counter()
+    legado = df.copy()
+    for col in legado.columns:
+        legado[col] = legado[col].apply(lambda x: x[:100] if isinstance(x, str) else x)
+    legado = legado.where(pd.notna(legado), None)
+    registros = [[None if v in ("", "None", "null") or (isinstance(v, str) and v.strip() == "") else v
+                  for v in registro.values()] for registro in legado.to_dict('records')]
+    tempo_legado = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    normalizado = normalizar_texto(df.copy(), limite_padrao=100)
+    tempo_vetorizado = time.perf_counter() - inicio
+
+    print(f"{n} linhas x 5 colunas | Legado: {tempo_legado:.2f}s | Vetorizado: {tempo_vetorizado:.2f}s")
+    # O legado não aplicava strip: só as células que ele já devolvia iguais são comparadas
+    sem_espacos = ~df.apply(lambda s: s.str.strip().ne(s).fillna(False)).to_numpy()
+    esperado = pd.DataFrame(registros, columns=df.columns).to_numpy()
+    assert (normalizado.to_numpy()[sem_espacos] == esperado[sem_espacos]).all()
+    assert tempo_vetorizado < tempo_legado
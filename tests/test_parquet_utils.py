@@ -0,0 +1,52 @@
+import os
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from parquet_utils import ZonaParquet
+
+
+def _export(pasta, nome, linhas):
+    caminho = os.path.join(pasta, nome)
+    pd.DataFrame({'Pedido': [str(i) for i in range(linhas)]}).to_csv(caminho, index=False)
+    return caminho
+
+
+def _ler(caminho):
+    return pd.read_csv(caminho, dtype=str)
+
+
+def test_mesmo_download_relido_do_parquet(tmp_path):
+    zona = ZonaParquet(pasta=str(tmp_path / 'landing'))
+    origem = _export(tmp_path, 'a.csv', 10)
+
+    primeira = zona.carregar('relatorio', origem, lambda: _ler(origem))
+    entrada = zona.procurar('relatorio', origem)
+    assert entrada is not None
+    relida = zona.carregar('relatorio', origem, lambda: pytest.fail('deveria ler o Parquet'))
+    pd.testing.assert_frame_equal(primeira, relida)
+
+
+def test_exports_do_mesmo_dia_nao_colidem(tmp_path):
+    zona = ZonaParquet(pasta=str(tmp_path / 'landing'))
+    primeiro = _export(tmp_path, 'a.csv', 10)
+    segundo = _export(tmp_path, 'b.csv', 20)
+    instante = os.path.getmtime(primeiro)
+    os.utime(segundo, (instante, instante))
+
+    assert zona.janela_padrao(primeiro) != zona.janela_padrao(segundo)
+    assert len(zona.carregar('relatorio', primeiro, lambda: _ler(primeiro))) == 10
+    assert len(zona.carregar('relatorio', segundo, lambda: _ler(segundo))) == 20
+    # O primeiro continua na landing zone (não foi sobrescrito pelo segundo)
+    assert zona.procurar('relatorio', primeiro)['linhas'] == 10
+
+
+def test_janela_informada_pelo_chamador(tmp_path):
+    zona = ZonaParquet(pasta=str(tmp_path / 'landing'))
+    origem = _export(tmp_path, 'a.csv', 5)
+    zona.carregar('relatorio', origem, lambda: _ler(origem), janela='20240101_20240131')
+
+    assert zona.procurar('relatorio', janela='20240101_20240131')['linhas'] == 5
+    assert zona.procurar('relatorio', origem) is None